@@ -0,0 +1,99 @@
+import argparse
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from .checks import checks
+from .config import Context, use_context
+from .models import File
+from .utils.cache import get_cached_result, store_result
+
+# the NetCDF and HDF5 libraries are usually not thread-safe, so only one thread reads a file at a time
+netcdf_lock = threading.RLock()
+
+
+class Result(NamedTuple):
+    path: str            # relative to UNCHECKED_PATH
+    status: str          # 'unmatched', 'matched', 'checked', 'critical' or 'unreadable'
+    matched: bool
+    clean: bool          # checked without any warnings, errors or critical issues
+    specifiers: dict
+    records: list        # (level, message) tuples in the order they were reported
+
+
+def create_context(schema_path, handler=None, **options):
+    '''
+    Create the context for checking files for schema_path. The options are named like the settings of
+    the command line (e.g. unchecked_path, minmax or protocol_locations) and can be given as strings like
+    on the command line. All other options use the defaults of the command line, but unlike the command
+    line, config files and environment variables are not read. The messages of every file are also sent
+    to the logging handler, if one is given.
+    '''
+    from .main import get_parser
+
+    parser = get_parser(prog='isimip-qc', description='')
+    actions = {action.dest: action for action in parser._actions}
+
+    # use the parser of the standard library, which does not read config files or environment variables
+    values = vars(argparse.ArgumentParser.parse_args(parser, [str(schema_path)]))
+
+    for key, value in options.items():
+        action = actions.get(key)
+        if action is None or key in ('help', 'version', 'schema_path'):
+            raise TypeError(f'create_context() got an unexpected option "{key}"')
+
+        if isinstance(value, str) and action.type is not None:
+            value = action.type(value)
+
+        values[key] = value
+
+    return Context({**values, 'handler': handler})
+
+
+def check_file(path, context):
+    '''
+    Check one file using the protocol and the options of the context, and return the Result. The path is
+    relative to the UNCHECKED_PATH of the context, or absolute below it. Different contexts can be used at
+    the same time in different threads or asyncio tasks. Like on the command line, the result of unchanged
+    files is replayed from the cache. Files are not fixed, copied or moved.
+    '''
+    with use_context(context):
+        base_path = Path(context.UNCHECKED_PATH).expanduser()
+        file_path = Path(os.path.normpath(base_path / Path(path).expanduser()))
+        # symbolic links below UNCHECKED_PATH must not point outside of it
+        if not file_path.resolve().is_relative_to(base_path.resolve()):
+            raise ValueError(f'{file_path} is not below UNCHECKED_PATH.')
+        if not file_path.is_file():
+            raise FileNotFoundError(f'{file_path} does not exist.')
+
+        if context.CHECK:
+            checks_to_run = [c for c in checks if c.__name__ == context.CHECK]
+        else:
+            checks_to_run = list(checks)
+
+        from .main import run_checks
+
+        file = File(file_path)
+        if context.HANDLER is not None:
+            file.open_log(console_handler=context.HANDLER)
+
+        try:
+            # replay the result of an unchanged file from the cache or perform the checks
+            status = get_cached_result(file)
+            if status is None:
+                status = run_checks(file, checks_to_run, netcdf_lock)
+                store_result(file, status)
+        finally:
+            with netcdf_lock:
+                file.close_dataset()
+            file.close_log()
+
+        return Result(
+            path=str(file.path),
+            status=status,
+            matched=file.matched,
+            clean=status == 'checked' and file.is_clean,
+            specifiers=file.specifiers,
+            records=[(level, message) for level, message, _ in file.records]
+        )
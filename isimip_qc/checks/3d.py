@@ -22,7 +22,7 @@ def check_3d(file):
     file.variable_name = '-'.join(parts)
 
     # Defensively retrieve the variable and its dimensions.
-    variable = file.dataset.variables.get(file.variable_name)
+    variable = file.snapshot.variables.get(file.variable_name)
     if variable is None:
         raise FileCritical(
             file,
@@ -4,18 +4,79 @@ from pathlib import Path
 
 checks_dir = Path(__file__).parent
 
-# gather functions from the python files in this directory
-checks = []
-
-# gather all check functions from all python filesin this directory
-for path in sorted(checks_dir.rglob('*.py')):
-    if path.name == '__init__.py':
-        continue
-    parts = path.relative_to(checks_dir).with_suffix('').parts
-    module_name = 'isimip_qc.checks.{}'.format('.'.join(parts))
-    module = importlib.import_module(module_name)
-    checks += [
-        func
-        for _, func in inspect.getmembers(module, inspect.isfunction)
-        if func.__name__.startswith('check_')
-    ]
+# all check functions in the order in which they are performed (python files in this
+# directory sorted by path, functions sorted by name), kept in sync by the tests
+CHECKS = (
+    ('3d', 'check_3d'),
+    ('attributes', 'check_contact'),
+    ('attributes', 'check_history'),
+    ('attributes', 'check_institution'),
+    ('attributes', 'check_isimip_id'),
+    ('attributes', 'check_isimip_protocol_version'),
+    ('attributes', 'check_isimip_qc_date'),
+    ('attributes', 'check_isimip_qc_version'),
+    ('dataset', 'check_chunk_layout'),
+    ('dataset', 'check_data_model'),
+    ('dataset', 'check_lower_case'),
+    ('dataset', 'check_zip'),
+    ('dimensions', 'check_depth_dimension'),
+    ('dimensions', 'check_dimensions'),
+    ('dimensions', 'check_lat_dimension'),
+    ('dimensions', 'check_lon_dimension'),
+    ('dimensions', 'check_time_dimension'),
+    ('experiments', 'check_experiment'),
+    ('variables.latlon', 'check_latlon_variable'),
+    ('variables.time', 'check_time_span_periods'),
+    ('variables.time', 'check_time_variable'),
+    ('variables.time_resolution', 'check_time_resolution'),
+    ('variables.var', 'check_variable'),
+    ('variables.var', 'check_variable_distribution'),
+    ('variables.var', 'check_variable_mask'),
+    ('variables.var', 'check_variable_values'),
+    ('variables.var3d', 'check_3d_variable'),
+)
+
+
+class Check:
+    '''
+    A check function which is imported only when it is called for the first time, so that
+    the check modules (and numpy or netCDF4) are not loaded when no file is checked.
+    '''
+
+    def __init__(self, module_name, name):
+        self.module_name = module_name
+        self.__name__ = name
+
+    def __repr__(self):
+        return f'Check({self.module_name}.{self.__name__})'
+
+    def __call__(self, file):
+        return self.func(file)
+
+    def __reduce__(self):
+        # pickle only the names, e.g. when the checks are sent to worker processes
+        return (Check, (self.module_name, self.__name__))
+
+    @property
+    def func(self):
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.__name__)
+
+
+def discover_checks():
+    # gather all check functions from all python files in this directory
+    discovered = []
+    for path in sorted(checks_dir.rglob('*.py')):
+        if path.name == '__init__.py':
+            continue
+        parts = path.relative_to(checks_dir).with_suffix('').parts
+        module = importlib.import_module('isimip_qc.checks.{}'.format('.'.join(parts)))
+        discovered += [
+            ('.'.join(parts), func.__name__)
+            for _, func in inspect.getmembers(module, inspect.isfunction)
+            if func.__name__.startswith('check_')
+        ]
+    return discovered
+
+
+checks = [Check(f'isimip_qc.checks.{module}', name) for module, name in CHECKS]
@@ -8,8 +8,8 @@ from ..utils.contact import match_addrs, match_contact
 
 
 def check_isimip_id(file):
-    if 'isimip_id' in file.dataset.ncattrs():
-        isimip_id = file.dataset.getncattr('isimip_id')
+    if 'isimip_id' in file.snapshot.attrs:
+        isimip_id = file.snapshot.attrs['isimip_id']
         file.info('Global attribute "isimip_id" found (%s).', isimip_id)
     else:
         file.info('Global attribute "isimip_id" not yet set.', fix={
@@ -19,8 +19,8 @@ def check_isimip_id(file):
 
 
 def check_isimip_qc_version(file):
-    if 'isimip_qc_version' in file.dataset.ncattrs():
-        version = file.dataset.getncattr('isimip_qc_version')
+    if 'isimip_qc_version' in file.snapshot.attrs:
+        version = file.snapshot.attrs['isimip_qc_version']
         if version == __version__:
             file.info('Global attribute "isimip_qc_version" matches current tool version (%s).', version)
         else:
@@ -40,8 +40,8 @@ def check_isimip_qc_version(file):
 def check_isimip_protocol_version(file):
     protocol_version = settings.DEFINITIONS['commit']
 
-    if 'isimip_protocol_version' in file.dataset.ncattrs():
-        version = file.dataset.getncattr('isimip_protocol_version')
+    if 'isimip_protocol_version' in file.snapshot.attrs:
+        version = file.snapshot.attrs['isimip_protocol_version']
         if version == protocol_version:
             file.info('Global attribute "isimip_protocol_version" matches current protocol version (%s).',
                       version)
@@ -62,13 +62,13 @@ def check_isimip_protocol_version(file):
 
 
 def check_institution(file):
-    if 'institution' not in file.dataset.ncattrs():
+    if 'institution' not in file.snapshot.attrs:
         file.error('Global attribute "institution" is missing.')
 
 
 def check_contact(file):
-    if 'contact' in file.dataset.ncattrs():
-        contact = file.dataset.getncattr('contact')
+    if 'contact' in file.snapshot.attrs:
+        contact = file.snapshot.attrs['contact']
 
         if match_contact(contact):
             file.info('Global attribute "contact" looks good. (%s)', contact)
@@ -83,8 +83,8 @@ def check_contact(file):
 def check_isimip_qc_date(file):
     datetime_now = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
 
-    if 'isimip_qc_pass_date' in file.dataset.ncattrs():
-        date = file.dataset.getncattr('isimip_qc_pass_date')
+    if 'isimip_qc_pass_date' in file.snapshot.attrs:
+        date = file.snapshot.attrs['isimip_qc_pass_date']
         if date is not None:
             file.info('Global attribute "isimip_qc_pass_date" is set to "%s".',
                       date, fix={
@@ -100,7 +100,7 @@ def check_isimip_qc_date(file):
 
 
 def check_history(file):
-    if 'history' in file.dataset.ncattrs():
+    if 'history' in file.snapshot.attrs:
         file.warning('Global attribute "history" is set and will get removed.',
                   fix={
                       'func': fix_remove_global_attr,
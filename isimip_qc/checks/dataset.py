@@ -1,4 +1,6 @@
+from ..config import settings
 from ..fixes import fix_remove_variable_attr, fix_rename_dimension, fix_rename_variable, fix_rename_variable_attr
+from ..utils.layout import analyze_layout, time_reads
 
 # Attributes allowed by the protocol (kept as a set for fast membership tests)
 _ALLOWED_VARIABLE_ATTRS = {
@@ -25,14 +27,60 @@ _IGNORED_VARIABLE_ATTRS = {
 }
 
 
+def check_chunk_layout(file):
+    '''
+    Report the chunk layout of the data variable and the estimated cost of reading it, when using --analyze-layout.
+    '''
+    if not settings.ANALYZE_LAYOUT:
+        return
+
+    variable = file.snapshot.variables.get(file.variable_name)
+    if variable is None or file.is_time_fixed or len(variable.shape) < 3:
+        return
+
+    if variable.chunking is None:
+        file.info('Chunk layout can only be analyzed for NetCDF4 files.')
+        return
+    elif variable.chunking == 'contiguous':
+        file.info('Variable "%s" is not chunked: one time step is read without overhead, but the time series of'
+                  ' one grid cell needs one read per time step.', file.variable_name)
+        return
+
+    layout = analyze_layout(file.abs_path, file.variable_name, variable.shape, variable.chunking,
+                            variable.dtype.itemsize)
+
+    file.info('Variable "%s" is stored in %i chunks of shape %s (%.1f KiB uncompressed).',
+              file.variable_name, layout.chunk_count, list(layout.chunk_shape), layout.chunk_size / 1024)
+
+    if layout.stored_sizes:
+        sizes = sorted(layout.stored_sizes)
+        file.info('%i chunks are stored with %.1f KiB (%.1f to %.1f KiB per chunk, median %.1f KiB),'
+                  ' the compression ratio is %.1f.', len(sizes), sum(sizes) / 1024, sizes[0] / 1024,
+                  sizes[-1] / 1024, sizes[len(sizes) // 2] / 1024, layout.compression_ratio)
+    else:
+        file.info('The compressed size of the chunks is only read if h5py is installed.')
+
+    for access, label in ((layout.time_slice, 'one time step'), (layout.time_series, 'the time series of one cell')):
+        if access.stored is None:
+            file.info('Reading %s touches %i chunks and decompresses %.1f times the values needed.',
+                      label, access.chunks, access.amplification)
+        else:
+            file.info('Reading %s touches %i chunks (%.1f KiB stored) and decompresses %.1f times the values'
+                      ' needed.', label, access.chunks, access.stored / 1024, access.amplification)
+
+    time_slice, time_series = time_reads(file.abs_path, file.variable_name, variable.shape)
+    file.info('Reading one time step took %.1f ms, the time series of one cell %.1f ms.',
+              1000 * time_slice, 1000 * time_series)
+
+
 def check_data_model(file):
     '''
     File must use the NetCDF4 classic data model
     '''
-    if file.dataset.data_model != 'NETCDF4_CLASSIC':
-        file.warning('Data model is %s (not NETCDF4_CLASSIC).', file.dataset.data_model, fix_datamodel=True)
+    if file.snapshot.data_model != 'NETCDF4_CLASSIC':
+        file.warning('Data model is %s (not NETCDF4_CLASSIC).', file.snapshot.data_model, fix_datamodel=True)
     else:
-        file.info('Data model looks good (%s).', file.dataset.data_model)
+        file.info('Data model looks good (%s).', file.snapshot.data_model)
 
 
 def check_zip(file):
@@ -40,15 +88,12 @@ def check_zip(file):
     Data variables must be compressed with at least compression level 4. Skip check for dimension variables.
     '''
 
-    variable = file.dataset.variables.get(file.variable_name)
+    variable = file.snapshot.variables.get(file.variable_name)
     if variable is None:
         file.warning('Variable "%s" not found for compression check.', file.variable_name)
         return
 
-    try:
-        filters = variable.filters()
-    except AttributeError:
-        filters = None
+    filters = variable.filters
 
     if not filters or not filters.get('zlib'):
         file.warning('Variable "%s" is not compressed.', file.variable_name, fix_datamodel=True)
@@ -67,28 +112,21 @@ def check_lower_case(file):
     Internal names of dimensions and variables are lowercase.
     '''
 
-    for dimension_name in file.dataset.dimensions:
+    for dimension_name in file.snapshot.dimensions:
         if not dimension_name.islower():
             file.warning('Dimension "%s" is not lower case.', dimension_name, fix={
                 'func': fix_rename_dimension,
                 'args': (file, dimension_name, dimension_name.lower())
             })
 
-    for variable_name, variable in file.dataset.variables.items():
+    for variable_name, variable in file.snapshot.variables.items():
         if not variable_name.islower():
             file.warning('Variable "%s" is not lower case.', variable_name, fix={
                 'func': fix_rename_variable,
                 'args': (file, variable_name, variable_name.lower())
             })
 
-        # Use NetCDF4's ncattrs() to get user-defined attribute names reliably
-        try:
-            attrs = variable.ncattrs()
-        except AttributeError:
-            # Fallback to __dict__ if ncattrs isn't available
-            attrs = list(variable.__dict__.keys())
-
-        for attr in attrs:
+        for attr in variable.attrs:
             if attr in _IGNORED_VARIABLE_ATTRS:
                 continue
 
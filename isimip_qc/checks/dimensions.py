@@ -3,9 +3,9 @@ from ..utils.grid import update_grid_value
 
 
 def check_lon_dimension(file):
-    # get dimension from the dataset
-    lon_dim = file.dataset.dimensions.get('lon')
-    if lon_dim is None:
+    # get dimension size from the dataset
+    actual = file.snapshot.dimensions.get('lon')
+    if actual is None:
         file.error('Longitude dimension "lon" is missing.')
         return
 
@@ -15,7 +15,6 @@ def check_lon_dimension(file):
     # overwrite for special cases defined in the protocol
     lon_size = update_grid_value(file, 'lon', 'size', lon_size)
 
-    actual = lon_dim.size
     if lon_size != actual:
         file.warning('Unexpected number of longitudes found (%s). Should be %s', actual, lon_size)
     else:
@@ -23,9 +22,9 @@ def check_lon_dimension(file):
 
 
 def check_lat_dimension(file):
-    # get dimension from the dataset
-    lat_dim = file.dataset.dimensions.get('lat')
-    if lat_dim is None:
+    # get dimension size from the dataset
+    actual = file.snapshot.dimensions.get('lat')
+    if actual is None:
         file.error('Latitude dimension "lat" is missing.')
         return
 
@@ -35,7 +34,6 @@ def check_lat_dimension(file):
     # overwrite for special cases defined in the protocol
     lat_size = update_grid_value(file, 'lat', 'size', lat_size)
 
-    actual = lat_dim.size
     if lat_size != actual:
         file.warning('Unexpected number of latitudes found (%s). Should be %s', actual, lat_size)
     else:
@@ -44,20 +42,20 @@ def check_lat_dimension(file):
 
 def check_time_dimension(file):
     if not file.is_time_fixed:
-        if file.dataset.dimensions.get('time') is None:
+        if file.snapshot.dimensions.get('time') is None:
             file.error('Dimension "time" is missing.')
 
 
 def check_depth_dimension(file):
     if file.is_3d:
-        if file.dataset.dimensions.get(file.dim_vertical) is None:
+        if file.snapshot.dimensions.get(file.dim_vertical) is None:
             file.error('Valid 4th dimension is missing. Should be of of [depth, bins]. Found "%s" instead.',
                        file.dim_vertical)
 
 
 def check_dimensions(file):
     # check dimension order
-    variable = file.dataset.variables.get(file.variable_name)
+    variable = file.snapshot.variables.get(file.variable_name)
     dims = variable.dimensions
 
     if file.is_time_fixed:
@@ -75,7 +73,7 @@ def check_dimensions(file):
     else:
         file.info('Dimensions for variable "%s" look good: %s.', file.variable_name, dims)
 
-    for dimension_name, dimension in file.dataset.dimensions.items():
+    for dimension_name, dimension_size in file.snapshot.dimensions.items():
         dimension_definition = settings.DEFINITIONS['dimensions'].get(dimension_name)
 
         if not dimension_definition:
@@ -87,5 +85,5 @@ def check_dimensions(file):
             continue
 
         size = dimension_definition.get('size')
-        if size and dimension.size != size:
-            file.error('Size of "%s" dimension is %s. Must be %s.', dimension_name, dimension.size, size)
+        if size and dimension_size != size:
+            file.error('Size of "%s" dimension is %s. Must be %s.', dimension_name, dimension_size, size)
@@ -6,8 +6,7 @@ from isimip_qc.utils.grid import update_grid_value
 
 
 def check_latlon_variable(file):
-    ds = file.dataset
-    variables = ds.variables
+    variables = file.snapshot.variables
 
     for variable in ('lat', 'lon'):
         var = variables.get(variable)
@@ -27,7 +26,7 @@ def check_latlon_variable(file):
 
         # check axis
         axis = var_definition.get('axis')
-        cur_axis = getattr(var, 'axis', None)
+        cur_axis = var.attrs.get('axis')
         if cur_axis != axis:
             file.warning('"axis" attribute of "%s" is %s. Should be "%s".', variable, cur_axis, axis, fix={
                 'func': fix_set_variable_attr,
@@ -36,7 +35,7 @@ def check_latlon_variable(file):
 
         # check standard_name
         standard_name = var_definition.get('standard_name')
-        cur_std = getattr(var, 'standard_name', None)
+        cur_std = var.attrs.get('standard_name')
         if cur_std != standard_name:
             file.warning('"standard_name" attribute of "%s" is "%s". Should be "%s".',
                       variable, cur_std, standard_name, fix={
@@ -47,7 +46,7 @@ def check_latlon_variable(file):
         # check long_name
         long_names = var_definition.get('long_names', [])
         if long_names:
-            cur_long = getattr(var, 'long_name', None)
+            cur_long = var.attrs.get('long_name')
             default_long = long_names[0]
             if cur_long not in long_names:
                 file.warning('"long_name" attribute of "%s" is %s. Should be in %s.',
@@ -58,7 +57,7 @@ def check_latlon_variable(file):
 
         # check units
         units = var_definition.get('units')
-        cur_units = getattr(var, 'units', None)
+        cur_units = var.attrs.get('units')
         if cur_units != units:
             file.warning('"units" attribute for "%s" is "%s". Should be "%s".',
                       variable, cur_units, units, fix={
@@ -79,12 +78,13 @@ def check_latlon_variable(file):
             return
 
         # use first and last element which is sufficient for monotonic lat/lon
+        values = file.dataset.variables[variable]
         try:
-            first_val = var[0].item()
-            last_val = var[-1].item()
+            first_val = values[0].item()
+            last_val = values[-1].item()
         except AttributeError:
             # fallback to full-array min/max if needed
-            arr = np.asarray(var[:])
+            arr = np.asarray(values[:])
             first_val = float(np.min(arr))
             last_val = float(np.max(arr))
 
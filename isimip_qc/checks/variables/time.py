@@ -7,9 +7,7 @@ from isimip_qc.fixes import fix_set_variable_attr
 def check_time_variable(file):
     if file.is_time_fixed:
         return
-    ds = file.dataset
-    variables = ds.variables
-    time = variables.get('time')
+    time = file.snapshot.variables.get('time')
     time_definition = settings.DEFINITIONS['dimensions'].get('time')
 
     if time is None:
@@ -26,7 +24,7 @@ def check_time_variable(file):
 
     # check axis
     axis = time_definition.get('axis')
-    cur_axis = getattr(time, 'axis', None)
+    cur_axis = time.attrs.get('axis')
     if cur_axis != axis:
         file.warning('"axis" attribute of "time" is %s. Should be "%s".', cur_axis, axis, fix={
             'func': fix_set_variable_attr,
@@ -35,7 +33,7 @@ def check_time_variable(file):
 
     # check standard_name
     standard_name = time_definition.get('standard_name')
-    cur_std = getattr(time, 'standard_name', None)
+    cur_std = time.attrs.get('standard_name')
     if cur_std != standard_name:
         file.warning('"standard_name" attribute of "time" is "%s". Should be "%s".', cur_std, standard_name, fix={
             'func': fix_set_variable_attr,
@@ -45,7 +43,7 @@ def check_time_variable(file):
     # check long_name
     long_names = time_definition.get('long_names', [])
     if long_names:
-        cur_long = getattr(time, 'long_name', None)
+        cur_long = time.attrs.get('long_name')
         default_long = long_names[2] if len(long_names) > 2 else long_names[0]
         if cur_long not in long_names:
             file.warning('"long_name" attribute of "time" is %s. Should be in %s.', cur_long, long_names, fix={
@@ -65,7 +63,7 @@ def check_time_variable(file):
         f"{increment} since {minimum}-1-1 00:00:00",
     )
 
-    cur_units = getattr(time, 'units', None)
+    cur_units = time.attrs.get('units')
     if cur_units not in units:
         file.error('"units" attribute for "time" is "%s". Should be one of "%s".', cur_units, units)
     else:
@@ -73,7 +71,7 @@ def check_time_variable(file):
 
     # check calendars
     calendars = time_definition.get('calendars_daily')
-    cur_cal = getattr(time, 'calendar', None)
+    cur_cal = time.attrs.get('calendar')
     if cur_cal not in calendars:
         file.error('"calendar" attribute for "time" is "%s". Must be one of "%s".', cur_cal, calendars)
     else:
@@ -1,15 +1,18 @@
-import netCDF4
+import cftime
+import numpy as np
 
 from isimip_qc.config import settings
+from isimip_qc.utils.timeaxis import get_time_bounds, validate_time_axis
+
+# tolerance (in days) for the position of daily values within their day
+DAILY_OFFSET_TOLERANCE = 1e-3
 
 
 def check_time_resolution(file):
     if file.is_time_fixed:
         return
 
-    ds = file.dataset
-    variables = ds.variables
-    time = variables.get('time')
+    time = file.snapshot.variables.get('time')
     time_definition = settings.DEFINITIONS['dimensions'].get('time')
     time_resolution = file.specifiers.get('time_step')
     time_resolution_definition = settings.DEFINITIONS['time_step'].get(time_resolution)
@@ -19,12 +22,12 @@ def check_time_resolution(file):
         return
 
     # get attributes defensively without exception-driven control flow
-    time_units = getattr(time, 'units', None)
+    time_units = time.attrs.get('units') if time is not None else None
     if time_units is None:
         file.warning("Can't check for number of time steps because of missing time.units attribute")
         return
 
-    time_calendar = getattr(time, 'calendar', None)
+    time_calendar = time.attrs.get('calendar')
     if time_calendar is None:
         file.warning("Can't check for number of time steps because of missing time.calendar attribute")
         return
@@ -39,88 +42,149 @@ def check_time_resolution(file):
                    ' (time.unit to be like "days since ...".')
         return
 
-    if ds.data_model in ('NETCDF4', 'NETCDF4_CLASSIC'):
+    if file.snapshot.data_model in ('NETCDF4', 'NETCDF4_CLASSIC'):
 
         if not (time and time_definition and time_resolution and time_units and time_calendar):
             return
-            # first and last year from file name specifiers must match those from internal time axis
-            # number of time steps must match those expected from the time axis
-            time_steps = time.shape[0]
-
-            if time_resolution in ('daily', 'monthly', 'annual'):
-                if settings.SECTOR == 'agriculture' and time_resolution == 'annual':
-                    # time values are offsets from a reference year in this special case
-                    parts = time_units.split()
-                    # defensive parsing: look for a token containing '-' (date)
-                    ref_year = None
-                    for tok in parts:
-                        if '-' in tok:
-                            try:
-                                ref_year = int(tok.split('-')[0])
-                                break
-                            except AttributeError:
-                                continue
-                    if ref_year is None:
-                        file.error('Could not determine reference year from time.units: %s', time_units)
-                        return
-                    startyear_nc = ref_year + int(time[0])
-                    endyear_nc = ref_year + int(time[-1])
-                else:
-                    firstdate_nc = netCDF4.num2date(time[0], time_units, time_calendar)
-                    lastdate_nc = netCDF4.num2date(time[time_steps - 1], time_units, time_calendar)
-                    startyear_nc = firstdate_nc.year
-                    endyear_nc = lastdate_nc.year
-
-            startyear_file = int(file.specifiers.get('start_year'))
-            endyear_file = int(file.specifiers.get('end_year'))
-            nyears_file = endyear_file - startyear_file + 1
-
-            if startyear_nc != startyear_file or endyear_nc != endyear_file:
-                file.error('Start and/or end year of NetCDF time axis (%s-%s) doesn\'t'
-                           ' match period defined in file name (%s-%s)',
-                           startyear_nc, endyear_nc, startyear_file, endyear_file)
+
+        # first and last year from file name specifiers must match those from internal time axis
+        # number of time steps must match those expected from the time axis
+        time_steps = time.shape[0]
+        if time_steps == 0:
+            file.error('Time axis is empty.')
+            return
+
+        # the expected time steps are only known for these time resolutions
+        if time_resolution not in ('daily', 'monthly', 'annual'):
+            file.info('Skip the check of the time axis for the time step "%s".', time_resolution)
+            return
+
+        time_values = np.ma.getdata(file.dataset.variables['time'][:]).astype('f8')
+
+        startyear_file = int(file.specifiers.get('start_year'))
+        endyear_file = int(file.specifiers.get('end_year'))
+        nyears_file = endyear_file - startyear_file + 1
+
+        # time values are offsets from a reference year in this special case
+        year_offsets = settings.SECTOR == 'agriculture' and time_resolution == 'annual'
+
+        if year_offsets:
+            parts = time_units.split()
+            # defensive parsing: look for a token containing '-' (date)
+            ref_year = None
+            for tok in parts:
+                if '-' in tok:
+                    try:
+                        ref_year = int(tok.split('-')[0])
+                        break
+                    except ValueError:
+                        continue
+            if ref_year is None:
+                file.error('Could not determine reference year from time.units: %s', time_units)
+                return
+            startyear_nc = ref_year + int(time_values[0])
+            endyear_nc = ref_year + int(time_values[-1])
+        else:
+            try:
+                # the bounds of the expected time steps, shared by all files with the same layout
+                time_bounds = get_time_bounds(time_calendar, time_units, startyear_file, endyear_file,
+                                              time_resolution)
+                firstdate_nc, lastdate_nc = cftime.num2date(time_values[[0, -1]], time_units, time_calendar)
+            except ValueError as e:
+                file.error('Could not interpret the time axis with the units "%s" and the calendar "%s": %s',
+                           time_units, time_calendar, e)
+                return
+
+            startyear_nc = firstdate_nc.year
+            endyear_nc = lastdate_nc.year
+
+            # used to check the continuity with the other files of the dataset
+            file.time_axis = {
+                'calendar': time_calendar,
+                'first': [firstdate_nc.year, firstdate_nc.month, firstdate_nc.day],
+                'last': [lastdate_nc.year, lastdate_nc.month, lastdate_nc.day]
+            }
+
+        years_match = startyear_nc == startyear_file and endyear_nc == endyear_file
+        if not years_match:
+            file.error('Start and/or end year of NetCDF time axis (%s-%s) doesn\'t'
+                       ' match period defined in file name (%s-%s)',
+                       startyear_nc, endyear_nc, startyear_file, endyear_file)
+        else:
+            file.info('Time period covered by this file matches the internal time axis (%s-%s)',
+                      startyear_nc, endyear_nc)
+
+        if time_resolution == 'daily':
+            time_days = len(time_bounds) - 1
+            if time_days != time_steps:
+                file.error('Number of internal time steps (%s) does not match the expected'
+                           ' number from the file name specifiers (%s). ("%s" calendar found)',
+                           time_steps, time_days, time_calendar)
+            else:
+                file.info('Correct number of time steps (%s) given the defined calendar (%s)',
+                          time_steps, time_calendar)
+        elif time_resolution == 'monthly':
+            time_months = nyears_file * 12
+            if time_months != time_steps:
+                file.error('Number of internal time steps (%s) does not match the expected'
+                           ' number from the file name specifiers (%s).', time_steps, time_months)
             else:
-                file.info('Time period covered by this file matches the internal time axis (%s-%s)',
-                          startyear_nc, endyear_nc)
-
-            if time_resolution == 'daily':
-                # compute number of days in period efficiently
-                if time_calendar in ('proleptic_gregorian', 'standard'):
-                    # count leap years between start and end inclusive using arithmetic
-                    a = startyear_file
-                    b = endyear_file
-                    def leaps(u):
-                        return u // 4 - u // 100 + u // 400
-
-                    leap_count = leaps(b) - leaps(a - 1)
-                    time_days = (nyears_file * 365) + leap_count
-                elif time_calendar == '366_day':
-                    time_days = nyears_file * 366
-                elif time_calendar in ('365_day', 'noleap'):
-                    time_days = nyears_file * 365
-                elif time_calendar == '360_day':
-                    time_days = nyears_file * 360
-
-                if time_days != time_steps:
-                    file.error('Number of internal time steps (%s) does not match the expected'
-                               ' number from the file name specifiers (%s). ("%s" calendar found)',
-                               time_steps, time_days, time_calendar)
-                else:
-                    file.info('Correct number of time steps (%s) given the defined calendar (%s)',
-                              time_steps, time_calendar)
-            elif time_resolution == 'monthly':
-                time_months = nyears_file * 12
-                if time_months != time_steps:
-                    file.error('Number of internal time steps (%s) does not match the expected'
-                               ' number from the file name specifiers (%s).', time_steps, time_months)
-                else:
-                    file.info('Correct number of time steps (%s).', time_steps)
-            elif time_resolution == 'annual':
-                if nyears_file != time_steps:
-                    file.error('Number of internal time steps (%s) does not match the expected'
-                               ' number from the file name specifiers (%s).', time_steps, nyears_file)
-                else:
-                    file.info('Correct number of time steps (%s).', time_steps)
+                file.info('Correct number of time steps (%s).', time_steps)
+        elif time_resolution == 'annual':
+            if nyears_file != time_steps:
+                file.error('Number of internal time steps (%s) does not match the expected'
+                           ' number from the file name specifiers (%s).', time_steps, nyears_file)
+            else:
+                file.info('Correct number of time steps (%s).', time_steps)
+
+        if not year_offsets:
+            report_time_axis(file, time_values, time_bounds, time_units, time_calendar, time_resolution,
+                             years_match)
     else:
         file.warning('Could not check for the correct number of time steps because of wrong'
-                  ' data model (%s). Has to be NETCDF4_CLASSIC.', file.dataset.data_model)
+                  ' data model (%s). Has to be NETCDF4_CLASSIC.', file.snapshot.data_model)
+
+
+def report_time_axis(file, time_values, time_bounds, time_units, time_calendar, time_resolution, years_match):
+    problems = validate_time_axis(time_values, time_bounds)
+
+    def get_date(value):
+        return cftime.num2date(value, time_units, time_calendar).strftime('%Y-%m-%d')
+
+    valid = True
+    if problems.decreasing.size:
+        i = problems.decreasing[0]
+        file.error('Time axis is not monotonically increasing: %s decreasing step(s), first at index %s (%s -> %s).',
+                   problems.decreasing.size, i, time_values[i], time_values[i + 1])
+        valid = False
+
+    if problems.duplicates.size:
+        i = problems.duplicates[0]
+        file.error('Time axis contains %s duplicate value(s), first at index %s (%s).',
+                   problems.duplicates.size, i + 1, time_values[i])
+        valid = False
+
+    if problems.multiple.size:
+        file.error('Time axis contains more than one value in %s %s time step(s), first in the one starting %s.',
+                   problems.multiple.size, time_resolution, get_date(time_bounds[problems.multiple[0]]))
+        valid = False
+
+    # values outside of the period and missing time steps follow from a wrong period, which is reported above
+    if years_match:
+        if problems.outside.size:
+            i = problems.outside[0]
+            file.error('Time axis contains %s value(s) outside of the period defined in file name,'
+                       ' first at index %s (%s).', problems.outside.size, i, time_values[i])
+            valid = False
+
+        if problems.missing.size:
+            file.error('Time axis is missing %s %s time step(s), first the one starting %s.',
+                       problems.missing.size, time_resolution, get_date(time_bounds[problems.missing[0]]))
+            valid = False
+
+    if time_resolution == 'daily' and problems.offset_spread > DAILY_OFFSET_TOLERANCE:
+        file.warning('Time values are not at the same time of the day in all time steps'
+                     ' (spread of %.3f days).', problems.offset_spread)
+
+    if valid and years_match:
+        file.info('Time axis is increasing with exactly one value per %s time step.', time_resolution)
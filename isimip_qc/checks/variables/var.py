@@ -1,4 +1,3 @@
-import heapq
 import math
 
 import netCDF4
@@ -6,13 +5,13 @@ import numpy as np
 
 from isimip_qc.config import settings
 from isimip_qc.fixes import fix_set_variable_attr
+from isimip_qc.utils.distributions import PERCENTILES, REFERENCE_FACTOR
 from isimip_qc.utils.grid import update_grid_value
+from isimip_qc.utils.masks import get_grid, get_mask
 
 
 def check_variable(file):
-    ds = file.dataset
-    variables = ds.variables
-    variable = variables.get(file.variable_name)
+    variable = file.snapshot.variables.get(file.variable_name)
     definition = settings.DEFINITIONS.get('variable', {}).get(file.specifiers.get('variable'))
 
     if not variable:
@@ -31,7 +30,7 @@ def check_variable(file):
                          file.variable_name, variable.dtype, fix_datamodel=True)
 
         # check chunking
-        chunking = variable.chunking()
+        chunking = variable.chunking
 
         if chunking:
             # get sizes from the protocol
@@ -45,19 +44,19 @@ def check_variable(file):
             if file.is_2d:
                 if chunking[0] != 1 or chunking[1] != lat_size or chunking[2] != lon_size:
                     file.warning('%s.chunking=%s should be [1, %s, %s] (with proper dependency order).',
-                                 file.variable_name, chunking, lat_size, lon_size, fix_datamodel=True)
+                                 file.variable_name, list(chunking), lat_size, lon_size, fix_datamodel=True)
                 else:
                     file.info('Variable properly chunked [1, %s, %s].', lat_size, lon_size)
 
             if file.is_3d:
-                var3d_size = ds.dimensions.get(file.dim_vertical).size
+                var3d_size = file.snapshot.dimensions.get(file.dim_vertical)
                 if (chunking[0] != 1
                     or (chunking[1] != 1 and chunking[1] != var3d_size)
                     or chunking[2] != lat_size
                     or chunking[3] != lon_size):
                     file.warning('%s.chunking=%s. Should be [1, %s, %s, %s] or [1, 1, %s, %s]'
                                  ' (with proper dependency order).',
-                                 file.variable_name, chunking, var3d_size, lat_size, lon_size,
+                                 file.variable_name, list(chunking), var3d_size, lat_size, lon_size,
                                  lat_size, lon_size, fix_datamodel=True)
                 else:
                     file.info('Variable properly chunked [1, %s, %s, %s].', var3d_size, lat_size, lon_size)
@@ -86,7 +85,7 @@ def check_variable(file):
         # check standard_name
         standard_name = definition.get('standard_name')
         if standard_name:
-            cur = getattr(variable, 'standard_name', None)
+            cur = variable.attrs.get('standard_name')
             if cur != standard_name:
                 file.warning(
                     'Attribute standard_name="%s" for variable "%s". Should be "%s".',
@@ -99,7 +98,7 @@ def check_variable(file):
         # check long_name
         long_name = definition.get('long_name')
         if long_name:
-            cur = getattr(variable, 'long_name', None)
+            cur = variable.attrs.get('long_name')
             if cur != long_name:
                 file.warning(
                     'Attribute long_name="%s" for variable "%s". Should be "%s".',
@@ -112,7 +111,7 @@ def check_variable(file):
         # check variable units
         units = definition.get('units')
         if units is not None:
-            cur = getattr(variable, 'units', None)
+            cur = variable.attrs.get('units')
             if cur is None:
                 file.warning(
                     'Variable "%s" units attribute is missing. Should be "%s".',
@@ -129,16 +128,10 @@ def check_variable(file):
         else:
             file.warning('No units information for variable "%s" in definition.', file.variable_name)
 
-        # check _FillValue and missing_value using ncattrs to avoid exceptions
-        ncattrs = []
-        try:
-            ncattrs = variable.ncattrs()
-        except AttributeError:
-            ncattrs = list(variable.__dict__.keys())
-
+        # check _FillValue and missing_value
         for name in ['_FillValue', 'missing_value']:
-            if name in ncattrs:
-                attr = variable.getncattr(name)
+            if name in variable.attrs:
+                attr = variable.attrs[name]
                 try:
                     attr_dtype = np.asarray(attr).dtype
                 except AttributeError:
@@ -190,17 +183,15 @@ def check_variable(file):
             if (valid_min is not None) and (valid_max is not None):
                 file.info('Checking values for valid minimum and maximum range defined in'
                           ' the protocol. This could take some time...')
-                time_var = file.dataset.variables.get('time')
+                time_var = file.snapshot.variables.get('time')
 
-                try:
-                    time_units = time_var.units
-                except AttributeError:
+                time_units = time_var.attrs.get('units') if time_var is not None else None
+                if time_units is None:
                     file.warning('Can\'t check for valid ranges because of missing units attribute in time variable')
                     return
 
-                try:
-                    time_calendar = time_var.calendar
-                except AttributeError:
+                time_calendar = time_var.attrs.get('calendar')
+                if time_calendar is None:
                     file.warning('Can\'t check for valid ranges because of missing calendar attribute in time variable')
                     return
 
@@ -216,69 +207,13 @@ def check_variable(file):
                     lat_vals = None
                     lon_vals = None
 
-                nt = time_var.size
-
-                # Heaps to keep top N extremes while scanning
+                # the data is read once for all value based checks
                 n_keep = int(settings.MINMAX)
-                low_heap = []  # max-heap via storing (-value, index_tuple)
-                high_heap = []  # min-heap storing (value, index_tuple)
-                count_low = 0
-                count_high = 0
+                valid_range = file.scan_data()['range']
+                low, high = valid_range.low, valid_range.high
 
-                # iterate over time slices to limit memory usage
-                for t in range(nt):
-                    try:
-                        slice_arr = variable[t]
-                    except AttributeError:
-                        # If time is not first dim, attempt generic slicing
-                        slice_arr = variable[(t, ...)]
-
-                    ma = np.ma.asarray(slice_arr)
-                    data = ma.data
-                    mask = np.ma.getmaskarray(ma)
-                    valid_mask = ~mask
-
-                    if file.is_2d:
-                        # data shape: (lat, lon)
-                        cond_low = (data < valid_min) & valid_mask
-                        cond_high = (data > valid_max) & valid_mask
-                        low_idx = np.argwhere(cond_low)
-                        high_idx = np.argwhere(cond_high)
-                        for idx in low_idx:
-                            count_low += 1
-                            full_idx = (t, idx[0], idx[1])
-                            val = float(data[idx[0], idx[1]])
-                            heapq.heappush(low_heap, (-val, full_idx))
-                            if len(low_heap) > n_keep:
-                                heapq.heappop(low_heap)
-                        for idx in high_idx:
-                            count_high += 1
-                            full_idx = (t, idx[0], idx[1])
-                            val = float(data[idx[0], idx[1]])
-                            heapq.heappush(high_heap, (val, full_idx))
-                            if len(high_heap) > n_keep:
-                                heapq.heappop(high_heap)
-
-                    elif file.is_3d:
-                        # data shape: (level, lat, lon)
-                        cond_low = (data < valid_min) & valid_mask
-                        cond_high = (data > valid_max) & valid_mask
-                        low_idx = np.argwhere(cond_low)
-                        high_idx = np.argwhere(cond_high)
-                        for idx in low_idx:
-                            count_low += 1
-                            full_idx = (t, idx[0], idx[1], idx[2])
-                            val = float(data[idx[0], idx[1], idx[2]])
-                            heapq.heappush(low_heap, (-val, full_idx))
-                            if len(low_heap) > n_keep:
-                                heapq.heappop(low_heap)
-                        for idx in high_idx:
-                            count_high += 1
-                            full_idx = (t, idx[0], idx[1], idx[2])
-                            val = float(data[idx[0], idx[1], idx[2]])
-                            heapq.heappush(high_heap, (val, full_idx))
-                            if len(high_heap) > n_keep:
-                                heapq.heappop(high_heap)
+                count_low = low.count
+                count_high = high.count
 
                 # reporting
                 if count_low:
@@ -288,70 +223,191 @@ def check_variable(file):
                     file.warning('%i values are higher than the valid maximum (%.2E %s).',
                                  count_high, valid_max, units)
 
-                if count_low:
-                    file.warning('%i lowest values are :', min(n_keep, count_low))
-                    # low_heap stores negatives; convert and sort ascending
-                    low_items = [(-v, idx) for v, idx in low_heap]
-                    low_items.sort(key=lambda x: x[0])
-                    for v, idx in low_items[:n_keep]:
-                        date = netCDF4.num2date(time_var[idx[0]], time_units, time_calendar)
-                        if file.is_2d:
-                            lat_val = (
-                                lat_vals[idx[-2]]
-                                if lat_vals is not None else file.dataset.variables.get('lat')[idx[-2]]
-                            )
-                            lon_val = (
-                                lon_vals[idx[-1]]
-                                if lon_vals is not None else file.dataset.variables.get('lon')[idx[-1]]
-                            )
-                            file.warning('date: %s, lat/lon: %4.2f/%4.2f, value: %E %s',
-                                         date, lat_val, lon_val, v, units)
-                        else:
-                            lat_val = (
-                                lat_vals[idx[-2]]
-                                if lat_vals is not None else file.dataset.variables.get('lat')[idx[-2]]
-                            )
-                            lon_val = (
-                                lon_vals[idx[-1]]
-                                if lon_vals is not None else file.dataset.variables.get('lon')[idx[-1]]
-                            )
-                            level = idx[-3] + 1
-                            file.warning('date: %s, lat/lon: %4.2f/%4.2f, level: %s, value: %E %s',
-                                         date, lat_val, lon_val, level, v, units)
+                time_vals = file.dataset.variables['time'][:] if (count_low or count_high) else None
 
-                if count_high:
-                    file.warning('%i highest values are :', min(n_keep, count_high))
-                    high_items = [(v, idx) for v, idx in high_heap]
-                    high_items.sort(key=lambda x: x[0], reverse=True)
-                    for v, idx in high_items[:n_keep]:
-                        date = netCDF4.num2date(time_var[idx[0]], time_units, time_calendar)
+                for outliers, label in ((low, 'lowest'), (high, 'highest')):
+                    if not outliers.count:
+                        continue
+
+                    file.warning('%i %s values are :', min(n_keep, outliers.count), label)
+
+                    values, indices = outliers.sorted()
+                    if not values.size:
+                        continue
+
+                    # convert all dates at once
+                    dates = netCDF4.num2date(time_vals[indices[:, 0]], time_units, time_calendar)
+
+                    for value, index, date in zip(values.tolist(), indices.tolist(), dates, strict=True):
+                        lat_val = lat_vals[index[-2]] if lat_vals is not None else lat_var[index[-2]]
+                        lon_val = lon_vals[index[-1]] if lon_vals is not None else lon_var[index[-1]]
                         if file.is_2d:
-                            lat_val = (
-                                lat_vals[idx[-2]]
-                                if lat_vals is not None else file.dataset.variables.get('lat')[idx[-2]]
-                            )
-                            lon_val = (
-                                lon_vals[idx[-1]]
-                                if lon_vals is not None else file.dataset.variables.get('lon')[idx[-1]]
-                            )
                             file.warning('date: %s, lat/lon: %4.2f/%4.2f, value: %E %s',
-                                         date, lat_val, lon_val, v, units)
+                                         date, lat_val, lon_val, value, units)
                         else:
-                            lat_val = (
-                                lat_vals[idx[-2]]
-                                if lat_vals is not None else file.dataset.variables.get('lat')[idx[-2]]
-                            )
-                            lon_val = (
-                                lon_vals[idx[-1]]
-                                if lon_vals is not None else file.dataset.variables.get('lon')[idx[-1]]
-                            )
-                            level = idx[-3] + 1
+                            level = index[-3] + 1
                             file.warning('date: %s, lat/lon: %4.2f/%4.2f, level: %s, value: %E %s',
-                                         date, lat_val, lon_val, level, v, units)
+                                         date, lat_val, lon_val, level, value, units)
 
-                if not count_low and not count_high:
+                if file.sampled:
+                    file.info('Values of a sample of %.0f%% of the data are within valid range (%.2E to %.2E).',
+                              100 * settings.MINMAX_SAMPLE, valid_min, valid_max)
+                elif not count_low and not count_high:
                     file.info('Values are within valid range (%.2E to %.2E).', valid_min, valid_max)
 
             else:
                 file.warning('No min and/or max definition found for variable "%s" in protocol. Skipping test.',
                              file.variable_name)
+
+
+def has_range_test(file):
+    '''
+    Return True if check_variable performs the valid range test for the file, i.e. if the data is read.
+    '''
+    if settings.MINMAX is None or settings.MINMAX < 0 or file.is_time_fixed:
+        return False
+
+    definition = settings.DEFINITIONS.get('variable', {}).get(file.specifiers.get('variable'))
+    if file.variable_name not in file.snapshot.variables or not definition:
+        return False
+
+    sector = settings.DEFINITIONS['sector'].get(settings.SECTOR, {})
+    if sector.get('valid_min') is False or sector.get('valid_max') is False:
+        return False
+
+    if definition.get('valid_min') is None or definition.get('valid_max') is None:
+        return False
+
+    time = file.snapshot.variables.get('time')
+    return time is not None and 'units' in time.attrs and 'calendar' in time.attrs
+
+
+def check_variable_distribution(file):
+    # the distribution is only computed together with the valid range test
+    if not settings.REFERENCES or not has_range_test(file):
+        return
+
+    variable = file.specifiers.get('variable')
+    reference = settings.DISTRIBUTIONS.get(variable)
+    if reference is None or reference.percentile(50) is None:
+        file.info('No reference distribution found for "%s". Skipping test.', variable)
+        return
+
+    histogram = file.scan_data()['histogram']
+    if histogram.percentile(50) is None:
+        # the values are all zero or missing
+        return
+
+    percentiles = ', '.join(f'{histogram.percentile(q):.2E}' for q in PERCENTILES)
+    reference_percentiles = ', '.join(f'{reference.percentile(q):.2E}' for q in PERCENTILES)
+
+    # values in wrong units (e.g. per day instead of per second) often stay within the valid range,
+    # but their magnitudes are shifted as a whole
+    factor = histogram.percentile(50) / reference.percentile(50)
+    if factor > REFERENCE_FACTOR or factor < 1 / REFERENCE_FACTOR:
+        file.distribution_mismatch = True
+        file.warning('The magnitudes of the values of "%s" (percentiles %s: %s) differ by a factor of %.2G from the'
+                     ' reference distribution (%s). Check if the values are matching the unit given.',
+                     file.variable_name, '/'.join(str(q) for q in PERCENTILES), percentiles, factor,
+                     reference_percentiles)
+    else:
+        file.info('Magnitudes of the values match the reference distribution (percentiles %s: %s).',
+                  '/'.join(str(q) for q in PERCENTILES), percentiles)
+
+
+def check_variable_mask(file):
+    # the missing values are only counted together with the valid range test
+    if not settings.MASK_FILES or not has_range_test(file):
+        return
+
+    variable = file.snapshot.variables.get(file.variable_name)
+    if file.is_time_fixed or variable is None or 'lat' not in file.dataset.variables:
+        return
+
+    lat_size = update_grid_value(file, 'lat', 'size', settings.DEFINITIONS['dimensions']['lat']['size'])
+    lon_size = update_grid_value(file, 'lon', 'size', settings.DEFINITIONS['dimensions']['lon']['size'])
+    if variable.shape[-2:] != (lat_size, lon_size):
+        # wrong dimensions are reported by check_variable
+        return
+
+    lat = file.dataset.variables['lat']
+    mask = get_mask(get_grid(lat_size, lon_size), bool(lat[0] > lat[-1]))
+    if mask is None:
+        file.warning('No land-sea mask found for the %s grid. Skipping test.', get_grid(lat_size, lon_size))
+        return
+
+    scan = file.scan_data()
+    if file.sampled:
+        # the missing values are only counted if all values are read
+        file.info('Only a sample of the data was read, skipping comparison with the land-sea mask.')
+        return
+
+    missing = scan['missing']
+    all_missing = missing.all_missing
+
+    land_missing = np.count_nonzero(mask & all_missing)
+    if land_missing:
+        file.warning('%i cells of the land-sea mask contain only missing values for "%s".',
+                     land_missing, file.variable_name)
+
+    sea_values = np.count_nonzero(~mask & ~all_missing)
+    if sea_values:
+        file.warning('%i cells outside of the land-sea mask contain values for "%s". Missing values'
+                     ' should be set for all cells outside of the mask.', sea_values, file.variable_name)
+
+    land_some_missing = np.count_nonzero(mask & missing.some_missing)
+    if land_some_missing:
+        file.info('%i cells of the land-sea mask contain missing values in some time steps.', land_some_missing)
+
+    if not land_missing and not sea_values:
+        file.info('Missing values match the land-sea mask.')
+
+
+def check_variable_values(file):
+    # the data is only read together with the valid range test
+    if not has_range_test(file):
+        return
+
+    scan = file.scan_data()
+    if file.sampled:
+        # the sample contains no NaN or infinite values, the statistics per time step need all values
+        file.info('Only a sample of the data was read, skipping statistics of the values.')
+        return
+
+    # NaN and infinite values are not allowed, missing values need to be set to the _FillValue
+    non_finite = scan['non_finite']
+    if non_finite.nan or non_finite.inf:
+        file.error('Variable "%s" contains %i NaN and %i infinite values. Use the _FillValue for missing values.',
+                   file.variable_name, non_finite.nan, non_finite.inf)
+
+    steps = scan['steps']
+    if not steps.count.size:
+        return
+
+    missing_steps = steps.missing_steps
+    if missing_steps.size:
+        file.warning('%i time steps of "%s" contain only missing values, the first one at %s.',
+                     missing_steps.size, file.variable_name, get_step_date(file, missing_steps[0]))
+
+    constant_steps = steps.constant_steps
+    if constant_steps.size:
+        step = constant_steps[0]
+        file.warning('%i time steps of "%s" contain the same value everywhere, the first one at %s (%s).',
+                     constant_steps.size, file.variable_name, get_step_date(file, step), steps.min[step])
+
+    masked_fraction = steps.masked_fraction
+    file.info('Missing values cover %.1f%% of the data (%.1f%% to %.1f%% per time step).',
+              100 * masked_fraction.mean(), 100 * masked_fraction.min(), 100 * masked_fraction.max())
+
+    if steps.count.any():
+        valid = steps.count > 0
+        file.info('Values range from %.2E to %.2E with a mean of %.2E.',
+                  steps.min[valid].min(), steps.max[valid].max(), steps.sum.sum() / steps.count.sum())
+
+
+def get_step_date(file, step):
+    time = file.snapshot.variables.get('time')
+    try:
+        return netCDF4.num2date(file.dataset.variables['time'][step], time.attrs['units'], time.attrs['calendar'])
+    except (AttributeError, KeyError, ValueError):
+        return f'time step {step + 1}'
@@ -6,15 +6,14 @@ from ...exceptions import FileWarning
 
 def check_3d_variable(file):
     def check_attribute(var3d, attr_type, attribute):
-        try:
-            var3d_attr = getattr(var3d, attr_type)
-        except AttributeError:
+        if attr_type not in var3d.attrs:
             file.warning('Attribute %s.%s is missing. Should be "%s".', var3d.name, attr_type, attribute, fix={
                 'func': fix_set_variable_attr,
                 'args': (file, var3d.name, attr_type, attribute)
             })
             return
 
+        var3d_attr = var3d.attrs[attr_type]
         if var3d_attr != attribute:
             file.warning('Attribute %s.%s="%s". Should be "%s".', var3d.name, attr_type, var3d_attr, attribute, fix={
                 'func': fix_set_variable_attr,
@@ -23,7 +22,7 @@ def check_3d_variable(file):
 
     if file.is_3d:
 
-        var3d = file.dataset.variables.get(file.dim_vertical)
+        var3d = file.snapshot.variables.get(file.dim_vertical)
         var3d_definition = settings.DEFINITIONS['dimensions'].get(file.dim_vertical)
 
         # check if vertical dimension ha a variable associated
@@ -59,14 +58,14 @@ def check_3d_variable(file):
                     continue
                 check_attribute(var3d, attribute, attr_definition)
 
-            # check direction of depth dimension
             # check direction of depth dimension (read only first and last value)
+            var3d_values = file.dataset.variables[file.dim_vertical]
             try:
-                depth_first = var3d[0]
-                depth_last = var3d[-1]
+                depth_first = var3d_values[0]
+                depth_last = var3d_values[-1]
             except AttributeError:
                 # fallback to reading full array if slicing fails
-                vals = var3d[:]
+                vals = var3d_values[:]
                 depth_first = vals[0]
                 depth_last = vals[-1]
 
@@ -78,7 +77,7 @@ def check_3d_variable(file):
 
             if file.dim_vertical == 'levlak' and settings.SIMULATION_ROUND not in ['ISIMIP2a', 'ISIMIP2b']:
 
-                depth_file = file.dataset.variables.get('depth')
+                depth_file = file.snapshot.variables.get('depth')
 
                 if depth_file is None:
                     file.warning(
@@ -116,12 +115,12 @@ def check_3d_variable(file):
 
             # check if vertical bounds were defined
             if file.dim_vertical in ['depth', 'levlak']:
-                try:
-                    var3d_bnds = file.dataset.variables.get('depth').bounds
-                    file.info('Vertical bounds "%s" found for "depth" variable', var3d_bnds)
-                except AttributeError:
+                depth = file.snapshot.variables.get('depth')
+                if depth is not None and 'bounds' in depth.attrs:
+                    file.info('Vertical bounds "%s" found for "depth" variable', depth.attrs['bounds'])
+                else:
                     raise FileWarning(file,
                                       'No vertical boundaries defined for "depth" variable.'
                                       ' Consider adding depth_bnds(%s, bnds). '
                                       ' See examples at https://bit.ly/ncdf-bounds', file.dim_vertical
-                                      ) from None
+                                      )
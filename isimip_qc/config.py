@@ -1,9 +1,12 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from functools import cached_property
 from pathlib import Path
 
 from isimip_utils.config import Settings as BaseSettings
-from isimip_utils.protocol import fetch_definitions, fetch_pattern, fetch_schema
+
+from .utils.protocol import load_protocol
 
 
 class Settings(BaseSettings):
@@ -25,22 +28,116 @@ class Settings(BaseSettings):
         return Path(self.SCHEMA_PATH).parts[2]
 
     @cached_property
-    def DEFINITIONS(self):
+    def PROTOCOL(self):
         if self.PROTOCOL_LOCATIONS is None:
             raise RuntimeError('PROTOCOL_LOCATIONS is not set')
-        return fetch_definitions(self.SCHEMA_PATH, self.PROTOCOL_LOCATIONS)
+
+        options = self.to_dict()
+        return load_protocol(self.SCHEMA_PATH, self.PROTOCOL_LOCATIONS,
+                             cache_path=options.get('CACHE_PATH'),
+                             ttl=options.get('PROTOCOL_TTL'),
+                             offline=options.get('OFFLINE', False))
+
+    @cached_property
+    def DEFINITIONS(self):
+        return self.PROTOCOL['definitions']
 
     @cached_property
     def PATTERN(self):
-        if self.PROTOCOL_LOCATIONS is None:
-            raise RuntimeError('PROTOCOL_LOCATIONS is not set')
-        return fetch_pattern(self.SCHEMA_PATH, self.PROTOCOL_LOCATIONS)
+        return self.PROTOCOL['pattern']
 
     @cached_property
     def SCHEMA(self):
-        if self.PROTOCOL_LOCATIONS is None:
-            raise RuntimeError('PROTOCOL_LOCATIONS is not set')
-        return fetch_schema(self.SCHEMA_PATH, self.PROTOCOL_LOCATIONS)
+        return self.PROTOCOL['schema']
+
+    @cached_property
+    def PROTOCOL_VERSION(self):
+        # local protocols have no commit, so they are identified by a hash of their content
+        commit = self.DEFINITIONS.get('commit')
+        if commit:
+            return commit
+
+        import hashlib
+        import json
+
+        content = json.dumps([self.DEFINITIONS, self.PATTERN, self.SCHEMA], sort_keys=True,
+                             default=lambda value: getattr(value, 'pattern', str(value)))
+        return 'sha256:' + hashlib.sha256(content.encode()).hexdigest()
+
+    @cached_property
+    def VALIDATOR(self):
+        # check the schema once and reuse the validator for all files
+        import jsonschema
+
+        validator_class = jsonschema.validators.validator_for(self.SCHEMA)
+        validator_class.check_schema(self.SCHEMA)
+        return validator_class(self.SCHEMA)
+
+    @cached_property
+    def DISTRIBUTIONS(self):
+        # the reference distributions of the variables are read once and compared with every file
+        from .utils.distributions import read_distributions
+
+        return read_distributions(self.REFERENCES, self.SCHEMA_PATH) if self.REFERENCES else {}
+
+
+class Context(Settings):
+    '''
+    Settings for checking files, which are used instead of the global settings of the command line
+    while a file is checked with isimip_qc.api.check_file. Unlike the global settings, a context is
+    not a singleton, so that files can be checked for different schema paths or options at once.
+    '''
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, values=None):
+        self._settings = {key.upper(): value for key, value in (values or {}).items()}
+
+    def __reduce__(self):
+        # the protocol is loaded again by other processes, and log handlers can not be pickled
+        return self.__class__, ({key: value for key, value in self._settings.items() if key != 'HANDLER'}, )
+
+
+class SettingsProxy:
+    '''
+    Forwards to the context used by the current thread or task (see use_context), or to the global
+    settings of the command line, so that the checks use the same `settings` in both cases.
+    '''
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    @property
+    def __dict__(self):
+        return get_settings().__dict__
+
+    def __repr__(self):
+        return repr(get_settings())
+
+
+_global_settings = Settings()
+_context = ContextVar('context', default=None)
+
+
+def get_settings():
+    context = _context.get()
+    return _global_settings if context is None else context
+
+
+@contextmanager
+def use_context(context):
+    # context variables are separate for every thread and asyncio task
+    token = _context.set(context)
+    try:
+        yield context
+    finally:
+        _context.reset(token)
 
 
-settings = Settings()
+settings = SettingsProxy()
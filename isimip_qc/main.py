@@ -1,29 +1,188 @@
+import json
 import logging
+import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 
 from isimip_utils.cli import ArgumentParser, parse_list, parse_locations, parse_path, setup_env, setup_logs
 from isimip_utils.exceptions import NotFound
-from isimip_utils.utils import exclude_path, include_path
 
 from . import VERSION
 from .checks import checks
 from .config import settings
 from .exceptions import FileCritical, FileError, FileWarning
 from .models import File, Summary
-from .utils.cli import parse_schema_path
-from .utils.files import walk_files
+from .parallel import check_files_parallel
+from .utils.cache import clear_cache, get_cached_result, store_result
+from .utils.cli import parse_schema_path, parse_shard
+from .utils.distributions import write_distributions
+from .utils.files import WALK_THREADS, read_files, walk_files
+from .utils.journal import finish_file, resume_files, start_action
 from .utils.logging import CHECKING
+from .utils.prefetch import prefetch_files
+from .utils.protocol import write_json
+from .utils.shard import shard_files
+from .utils.watch import POLL_INTERVAL, SETTLE, watch_files
 
 logger = logging.getLogger(__name__)
 
 
 def main():
-    parser = ArgumentParser(prog='isimip-qc', description='Check ISIMIP files for matching protocol definitions')
+    if sys.argv[1:2] == ['merge']:
+        return merge()
+    elif sys.argv[1:2] == ['watch']:
+        return watch()
+    elif sys.argv[1:2] == ['serve']:
+        return serve()
 
-    # mandatory
-    parser.add_argument('schema_path', type=parse_schema_path,
-                        help='ISIMIP schema_path, e.g. ISIMIP3a/OutputData/water_global')
+    parser = get_parser(prog='isimip-qc', description='Check ISIMIP files for matching protocol definitions')
+
+    setup_env()
+
+    args = parser.parse_args()
+
+    checks_to_run = setup(parser, args)
+
+    summary = Summary()
+
+    # read the list of files or walk over unchecked files
+    if settings.FILES_FROM:
+        file_paths = read_files(settings.FILES_FROM, settings.UNCHECKED_PATH, null=settings.FROM0,
+                                include=settings.INCLUDE, exclude=settings.EXCLUDE,
+                                suffixes=settings.PATTERN.get('suffix', []))
+    else:
+        file_paths = walk_files(settings.UNCHECKED_PATH, include=settings.INCLUDE, exclude=settings.EXCLUDE,
+                                suffixes=settings.PATTERN.get('suffix', []), threads=settings.WALK_THREADS)
+
+    # skip the files which were completed by an earlier run
+    if settings.RESUME:
+        file_paths = resume_files(file_paths, settings.UNCHECKED_PATH, settings.JOURNAL)
+
+    # only check the files of one shard
+    if settings.SHARD:
+        file_paths = shard_files(file_paths, settings.UNCHECKED_PATH, *settings.SHARD, by=settings.SHARD_BY)
+
+    # read the next files ahead, including the data scanned by the valid range test
+    if settings.PREFETCH and not settings.MATCH_ONLY:
+        readahead = settings.SCAN_MEMORY * 1024 * 1024 if settings.MINMAX else 0
+        file_paths = prefetch_files(file_paths, settings.PREFETCH, readahead)
+
+    if settings.JOBS > 1 and not settings.FIRST_FILE:
+        check_files_parallel(file_paths, checks_to_run, summary)
+    else:
+        for file_path in file_paths:
+            check_file(file_path, checks_to_run, summary)
+
+            # stop if flag is set
+            if settings.FIRST_FILE:
+                break
+
+    report(summary)
+
+
+def watch():
+    parser = get_parser(prog='isimip-qc watch',
+                        description='Watch UNCHECKED_PATH and check the files as soon as they are completely written')
+
+    parser.add_argument('--settle', dest='settle', type=float, default=SETTLE,
+                        help=f'seconds a file needs to remain unchanged before it is checked [default: {SETTLE:g}]')
+    parser.add_argument('--poll', dest='poll', action='store_true', default=False,
+                        help='look for changes by scanning UNCHECKED_PATH repeatedly instead of using inotify,'
+                        ' e.g. for network file systems')
+    parser.add_argument('--poll-interval', dest='poll_interval', type=float, default=POLL_INTERVAL,
+                        help=f'seconds between two scans of UNCHECKED_PATH using --poll [default: {POLL_INTERVAL:g}]')
+
+    setup_env()
+
+    args = parser.parse_args(sys.argv[2:])
+
+    checks_to_run = setup(parser, args)
+
+    if settings.SETTLE < 0:
+        parser.error('SETTLE needs to be a non-negative number.')
+
+    if settings.POLL_INTERVAL <= 0:
+        parser.error('POLL_INTERVAL needs to be a positive number.')
+
+    if settings.JOBS > 1:
+        parser.error('JOBS can not be used with "isimip-qc watch", the files are checked one after another.')
+
+    summary = Summary()
+
+    # the protocol is loaded once, and every file is checked as soon as it is completely written
+    file_paths = watch_files(settings.UNCHECKED_PATH, include=settings.INCLUDE, exclude=settings.EXCLUDE,
+                             suffixes=settings.PATTERN.get('suffix', []), settle=settings.SETTLE,
+                             poll=settings.POLL, interval=settings.POLL_INTERVAL)
+    try:
+        for file_path in file_paths:
+            # a file which can not be checked must not stop the watch
+            try:
+                check_file(file_path, checks_to_run, summary)
+            except Exception as e:
+                logger.exception('Could not check %s: %s', file_path, e)
+    except KeyboardInterrupt:
+        logger.info('Stop watching %s.', settings.UNCHECKED_PATH)
+    finally:
+        file_paths.close()
+
+    report(summary)
+
+
+def serve():
+    parser = get_parser(prog='isimip-qc serve', description='Run a local service which checks files on request',
+                        schema_path_help='default ISIMIP schema_path for requests without schema_path')
+
+    parser.add_argument('--host', dest='host', default='127.0.0.1',
+                        help='host name or address to listen on [default: 127.0.0.1]')
+    parser.add_argument('--allow-remote', dest='allow_remote', action='store_true', default=False,
+                        help='allow to listen on a HOST which is not a loopback address, the service has no'
+                        ' authentication and can then be used by everyone who can reach the host')
+    parser.add_argument('--port', dest='port', type=int, default=8000,
+                        help='port to listen on [default: 8000]')
+    parser.add_argument('--socket', dest='socket', type=parse_path,
+                        help='listen on this Unix socket instead of HOST and PORT')
+    parser.add_argument('--protocols', dest='protocols', type=int, default=8,
+                        help='number of schema paths whose protocols are kept loaded by each worker [default: 8]')
+
+    setup_env()
+
+    args = parser.parse_args(sys.argv[2:])
+
+    setup_logs(log_level=args.log_level, show_time=args.show_time, show_path=args.show_path)
+
+    settings.from_dict(vars(args))
+
+    if settings.UNCHECKED_PATH and not settings.UNCHECKED_PATH.exists():
+        parser.error(f'UNCHECKED_PATH does not exist: {settings.UNCHECKED_PATH}')
+
+    if settings.JOBS < 1:
+        parser.error('JOBS needs to be a positive integer.')
+
+    if settings.PROTOCOLS < 1:
+        parser.error('PROTOCOLS needs to be a positive integer.')
+
+    from .service import is_loopback, serve
+
+    if not settings.SOCKET and not settings.ALLOW_REMOTE and not is_loopback(settings.HOST):
+        parser.error(f'HOST {settings.HOST} is not a loopback address, use --allow-remote to listen on it.')
+
+    if settings.CLEAR_CACHE:
+        clear_cache()
+
+    serve(schema_path=settings.SCHEMA_PATH, host=settings.HOST, port=settings.PORT,
+          socket_path=settings.SOCKET, jobs=settings.JOBS)
+
+
+def get_parser(prog, description, schema_path_help=None):
+    parser = ArgumentParser(prog=prog, description=description)
+
+    if schema_path_help is None:
+        # mandatory
+        parser.add_argument('schema_path', type=parse_schema_path,
+                            help='ISIMIP schema_path, e.g. ISIMIP3a/OutputData/water_global')
+    else:
+        parser.add_argument('schema_path', type=parse_schema_path, nargs='?', help=schema_path_help)
 
     # optional
     parser.add_argument('-c', '--copy', dest='copy', action='store_true',
@@ -39,6 +198,10 @@ def main():
     parser.add_argument('--protocol-location', dest='protocol_locations', type=parse_locations,
                         default='https://protocol.isimip.org https://protocol2.isimip.org',
                         help='URL or file path to the protocol when different from official repository')
+    parser.add_argument('--protocol-ttl', dest='protocol_ttl', type=float, default=24,
+                        help='hours after which the cached protocol is fetched again [default: 24]')
+    parser.add_argument('--offline', dest='offline', action='store_true', default=False,
+                        help='only use the cached protocol and never fetch it from the protocol location')
     parser.add_argument('--log-level', dest='log_level', default='CHECKING', type=lambda s: s.upper(),
                         help='log level (CRITICAL, ERROR, WARN, CHECKING, INFO, or DEBUG) [default: CHECKING]')
     parser.add_argument('--show-time', dest='show_time', action='store_true', default=False,
@@ -53,6 +216,20 @@ def main():
                         help='patterns of files to include. Exclude those that don\'t match any.')
     parser.add_argument('--exclude', dest='exclude', type=parse_list,
                         help='patterns of files to exclude. Include only those that don\'t match any.')
+    parser.add_argument('--files-from', dest='files_from',
+                        help='read the files to check from this file (or from stdin for "-") instead of walking'
+                        ' UNCHECKED_PATH, one path relative to UNCHECKED_PATH per line')
+    parser.add_argument('-0', '--from0', dest='from0', action='store_true', default=False,
+                        help='the files in FILES_FROM are separated by NUL characters instead of newlines')
+    parser.add_argument('--shard', dest='shard', type=parse_shard,
+                        help='only check the i-th of N parts of the files, e.g. 1/4. The files are split'
+                        ' deterministically, so that N runs on different nodes check every file exactly once')
+    parser.add_argument('--shard-by', dest='shard_by', choices=['hash', 'size'], default='hash',
+                        help='split the files by a hash of their path, or balanced by their size, which needs'
+                        ' to find all files before the first is checked [default: hash]')
+    parser.add_argument('--output', dest='output', type=parse_path,
+                        help='write the results of all files and the counters of the summary as JSON to this'
+                        ' file, which can be combined with the ones of other shards using "isimip-qc merge"')
     parser.add_argument('-f', '--first-file', dest='first_file', action='store_true', default=False,
                         help='only process first file found in UNCHECKED_PATH')
     parser.add_argument('-w', '--stop-on-warnings', dest='stop_warn', action='store_true', default=False,
@@ -68,8 +245,36 @@ def main():
     parser.add_argument('-r', '--minmax', dest='minmax', const=10, nargs='?', type=int,
                         help='test values for valid range (slow). MINMAX denotes the length of the ordered top'
                         ' list of outliers')
+    parser.add_argument('--minmax-sample', dest='minmax_sample', type=float,
+                        help='only read this fraction of the data (e.g. 0.05) for the valid range test, and'
+                        ' all values only if invalid values are found in the sample')
+    parser.add_argument('--scan-memory', dest='scan_memory', type=int, default=256,
+                        help='memory budget in MiB for the data read at once by the valid range test [default: 256]')
+    parser.add_argument('--scan-jobs', dest='scan_jobs', type=int, default=1,
+                        help='number of worker processes reading the data of one file for the valid range test'
+                        ' [default: 1]')
+    parser.add_argument('--mask-file', dest='mask_files', type=parse_path, action='append',
+                        help='NetCDF file with a land-sea mask to compare the missing values with when using'
+                        ' --minmax, can be used once per grid')
+    parser.add_argument('--references', dest='references', type=parse_path,
+                        help='JSON file with reference distributions of the variables to compare the values with'
+                        ' when using --minmax, e.g. to detect wrong units')
+    parser.add_argument('--update-references', dest='update_references', action='store_true', default=False,
+                        help='replace the distributions in REFERENCES with the ones of the files without errors,'
+                        ' invalid values or magnitudes which differ from REFERENCES')
+    parser.add_argument('--analyze-layout', dest='analyze_layout', action='store_true', default=False,
+                        help='report the chunk layout of the variable and the estimated cost of reading time steps'
+                        ' and time series (uses h5py if installed), reads one time step and the full time series'
+                        ' of one cell of every file to time them, the cached results are not used')
     parser.add_argument('-nt', '--skip-time-span-check', dest='time_span', action='store_true', default=False,
                         help='skip check for simulated time period')
+    parser.add_argument('--check-continuity', dest='check_continuity', action='store_true', default=False,
+                        help='check that the files which only differ by their years follow each other'
+                        ' without gaps or overlaps')
+    parser.add_argument('--completeness', dest='completeness', action='store_true', default=False,
+                        help='report missing and duplicate combinations of models, climate forcings, experiments,'
+                        ' periods and variables, only the variables which a model delivered for at least one'
+                        ' experiment are expected')
     parser.add_argument('--summary', dest='summary', action='store_true', default=False,
                         help='append a summary with statistics about experiments and specifiers to the output')
     parser.add_argument('--fix', dest='fix', action='store_true', default=False,
@@ -77,23 +282,41 @@ def main():
     parser.add_argument('--fix-datamodel', dest='fix_datamodel', nargs='?', const='nccopy', type=str,
                         help='also fix warnings on data model found using NCCOPY or CDO (slow).'
                         ' Choose preferred tool per lower case argument.')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                        help='number of worker processes used to check files in parallel [default: 1]')
+    parser.add_argument('--prefetch', dest='prefetch', type=int, default=0,
+                        help='number of files which are read ahead while the current file is checked [default: 0]')
+    parser.add_argument('--walk-threads', dest='walk_threads', type=int, default=WALK_THREADS,
+                        help=f'number of threads scanning directories for files [default: {WALK_THREADS}]')
     parser.add_argument('--check', dest='check',
                         help='perform only one particular check')
     parser.add_argument('--force-copy-move', dest='force_copy_move', action='store_true', default=False,
                         help='copy or move files despite errors')
+    parser.add_argument('--cache-path', dest='cache_path', type=parse_path,
+                        default=Path(os.getenv('XDG_CACHE_HOME', '~/.cache')).expanduser() / 'isimip-qc',
+                        help='path for the cached results of unchanged files [default: ~/.cache/isimip-qc]')
+    parser.add_argument('--cache-hash', dest='cache_hash', action='store_true', default=False,
+                        help='also compare the SHA-256 hash of the file content to detect unchanged files (slow)')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False,
+                        help='do not use or update the cached results, check all files again')
+    parser.add_argument('--clear-cache', dest='clear_cache', action='store_true', default=False,
+                        help='remove all cached results before checking the files')
+    parser.add_argument('--journal', dest='journal', type=parse_path,
+                        help='append every completed file and every fix, copy or move to this journal file')
+    parser.add_argument('--resume', dest='resume', action='store_true', default=False,
+                        help='skip the files which were completed according to JOURNAL and retry interrupted'
+                        ' fixes, copies or moves, can not be used with the summary and the other reports')
     parser.add_argument('-V', '--version', action='version',
                         version=VERSION)
 
-    setup_env()
+    return parser
 
-    args = parser.parse_args()
 
+def setup(parser, args):
     setup_logs(log_level=args.log_level, show_time=args.show_time, show_path=args.show_path)
 
     settings.from_dict(vars(args))
 
-    summary = Summary()
-
     try:
         settings.DEFINITIONS, settings.PATTERN, settings.SCHEMA  # noqa: B018
     except NotFound as e:
@@ -107,104 +330,258 @@ def main():
         if not settings.CHECKED_PATH.exists():
             parser.error(f'CHECKED_PATH does not exist: {settings.CHECKED_PATH}')
 
-    # determine checks to run and walk over unchecked files
+    if settings.SCAN_MEMORY < 1:
+        parser.error('SCAN_MEMORY needs to be a positive integer.')
+
+    if settings.SCAN_JOBS < 1:
+        parser.error('SCAN_JOBS needs to be a positive integer.')
+
+    if settings.MINMAX_SAMPLE is not None and not 0 < settings.MINMAX_SAMPLE <= 1:
+        parser.error('MINMAX_SAMPLE needs to be between 0 and 1.')
+
+    if settings.JOBS < 1:
+        parser.error('JOBS needs to be a positive integer.')
+
+    if settings.PREFETCH < 0:
+        parser.error('PREFETCH needs to be a non-negative integer.')
+
+    if settings.WALK_THREADS < 1:
+        parser.error('WALK_THREADS needs to be a positive integer.')
+
+    if settings.FILES_FROM not in (None, '-') and not Path(settings.FILES_FROM).expanduser().is_file():
+        parser.error(f'FILES_FROM {settings.FILES_FROM} does not exist.')
+
+    if settings.UPDATE_REFERENCES and (not settings.REFERENCES or settings.MINMAX is None):
+        parser.error('UPDATE_REFERENCES needs REFERENCES and MINMAX to be set.')
+
+    if settings.UPDATE_REFERENCES and settings.SHARD and not settings.OUTPUT:
+        parser.error('UPDATE_REFERENCES needs OUTPUT to be set when using SHARD, the distributions of all shards'
+                     ' are added to REFERENCES by "isimip-qc merge --update-references".')
+
+    if settings.RESUME and not settings.JOURNAL:
+        parser.error('RESUME needs JOURNAL to be set.')
+
+    # the files which were completed before are skipped, so they would be missing from the reports
+    if settings.RESUME and (settings.SUMMARY or settings.OUTPUT or settings.COMPLETENESS or
+                            settings.CHECK_CONTINUITY or settings.UPDATE_REFERENCES):
+        parser.error('RESUME can not be used together with SUMMARY, OUTPUT, COMPLETENESS, CHECK_CONTINUITY'
+                     ' or UPDATE_REFERENCES.')
+
+    if settings.CLEAR_CACHE:
+        clear_cache()
+
+    # determine checks to run
     if settings.CHECK:
         checks_to_run = [c for c in checks if c.__name__ == settings.CHECK]
     else:
         checks_to_run = list(checks)
 
-    # walk over unchecked files
-    for file_path in walk_files(settings.UNCHECKED_PATH):
-        if not check_file_path(file_path):
-            continue
-
-        logger.log(CHECKING, file_path)
+    return checks_to_run
 
-        file = File(file_path)
-        file.open_log()
 
-        try:
-            check_single_file(file, checks_to_run, summary)
-        finally:
-            # ensure that dataset and log are closed
-            file.close_dataset()
-            file.close_log()
+def report(summary):
+    if settings.CHECK_CONTINUITY:
+        summary.print_continuity()
 
-        # stop if flag is set
-        if settings.FIRST_FILE:
-            break
+    if settings.COMPLETENESS:
+        summary.print_completeness()
 
     if settings.SUMMARY:
         summary.print()
 
+    if settings.OUTPUT:
+        write_output(settings.OUTPUT, summary, settings.SHARD)
+
+    # the distributions of the shards are written to OUTPUT and added to REFERENCES once by merge
+    if settings.UPDATE_REFERENCES and not settings.SHARD:
+        write_distributions(settings.REFERENCES, settings.SCHEMA_PATH, summary.distributions)
+
+
+def merge():
+    parser = ArgumentParser(prog='isimip-qc merge',
+                            description='Merge the results of isimip-qc runs on different shards of the files')
+
+    parser.add_argument('results', nargs='+', type=parse_path,
+                        help='JSON files written by isimip-qc using --output')
+    parser.add_argument('--log-level', dest='log_level', default='CHECKING', type=lambda s: s.upper(),
+                        help='log level (CRITICAL, ERROR, WARN, CHECKING, INFO, or DEBUG) [default: CHECKING]')
+    parser.add_argument('--show-time', dest='show_time', action='store_true', default=False,
+                        help='show time in console logs')
+    parser.add_argument('--show-path', dest='show_path', action='store_true', default=False,
+                        help='show path in console logs')
+    parser.add_argument('--check-continuity', dest='check_continuity', action='store_true', default=False,
+                        help='check the continuity of the time axes across the files of all shards')
+    parser.add_argument('--completeness', dest='completeness', action='store_true', default=False,
+                        help='report missing and duplicate combinations across the files of all shards, only the'
+                        ' variables which a model delivered for at least one experiment are expected')
+    parser.add_argument('--summary', dest='summary', action='store_true', default=False,
+                        help='append a summary with statistics about experiments and specifiers to the output')
+    parser.add_argument('--output', dest='output', type=parse_path,
+                        help='write the merged results as JSON to this file')
+    parser.add_argument('--update-references', dest='update_references', type=parse_path,
+                        help='replace the distributions in this JSON file with reference distributions with the'
+                        ' ones of the files of all shards')
+
+    args = parser.parse_args(sys.argv[2:])
+
+    setup_logs(log_level=args.log_level, show_time=args.show_time, show_path=args.show_path)
+
+    summary = Summary()
+    schema_path, shards, shard_count = None, set(), None
+
+    for result_path in args.results:
+        try:
+            result = json.loads(result_path.read_text())
+        except (OSError, ValueError) as e:
+            parser.error(f'Could not read {result_path}: {e}')
+
+        if schema_path is None:
+            schema_path = result['schema_path']
+        elif result['schema_path'] != schema_path:
+            parser.error(f'{result_path} was checked against {result["schema_path"]} and not {schema_path}.')
+
+        if result['shard'] is not None:
+            shard, count = result['shard']
+            if shard_count is None:
+                shard_count = count
+            elif count != shard_count:
+                parser.error(f'{result_path} is shard {shard}/{count}, but the other results use {shard_count} shards.')
+
+            if shard in shards:
+                logger.warning('%s contains shard %s/%s again and is skipped.', result_path, shard, count)
+                continue
+            shards.add(shard)
+
+        summary.merge(Summary.from_dict(result['summary']))
+
+    if shard_count is not None:
+        missing_shards = sorted(set(range(1, shard_count + 1)) - shards)
+        if missing_shards:
+            logger.warning('The results of shard %s of %s are missing.',
+                           ', '.join(str(shard) for shard in missing_shards), shard_count)
+
+    # replay the messages of all files
+    for file in summary.files:
+        logger.log(CHECKING, file['path'])
+        for level, message in file['records']:
+            logger.log(logging.getLevelName(level.upper()), message)
+
+    if args.check_continuity:
+        summary.print_continuity()
+
+    if args.completeness:
+        summary.print_completeness()
+
+    if args.summary:
+        summary.print()
+
+    if args.output:
+        write_output(args.output, summary, schema_path=schema_path)
 
-def check_file_path(file_path):
-    if settings.INCLUDE:
-        if not include_path(settings.INCLUDE, file_path):
-            logger.info('%s skipped by include option.', file_path)
-            return False
+    if args.update_references:
+        write_distributions(args.update_references, schema_path, summary.distributions)
 
-    if settings.EXCLUDE:
-        if exclude_path(settings.EXCLUDE, file_path):
-            logger.info('%s skipped by exclude option.', file_path)
-            return False
 
-    if file_path.suffix not in settings.PATTERN.get('suffix', []):
-        logger.error('%s has wrong suffix. Use "%s" for this simulation round.',
-                     file_path, settings.PATTERN['suffix'][0])
-        return False
+def write_output(path, summary, shard=None, schema_path=None):
+    write_json(path, {
+        'version': VERSION,
+        'schema_path': schema_path or str(settings.SCHEMA_PATH),
+        'shard': shard,
+        'summary': summary.to_dict()
+    })
 
-    return True
 
+def check_file(file_path, checks_to_run, summary, console_handler=None):
+    logger.log(CHECKING, file_path)
 
-def check_single_file(file, checks_to_run, summary):
+    file = File(file_path)
+    file.open_log(console_handler=console_handler)
+
+    try:
+        status = check_single_file(file, checks_to_run, summary)
+        finish_file(file, status)
+    finally:
+        # ensure that dataset and log are closed
+        file.close_dataset()
+        file.close_log()
+
+
+def run_checks(file, checks_to_run, netcdf_lock=None):
     file.match()
 
     if not file.matched:
-        return
+        return 'unmatched'
 
     file.validate()
 
-    if settings.SUMMARY:
-        summary.update_specifiers(file.specifiers)
-        summary.update_variables(file.specifiers)
-        summary.update_experiments(file.specifiers)
-
     if settings.MATCH_ONLY:
-        return
+        return 'matched'
 
     # skip opening non-NetCDF files
     if file.path.suffix not in ['.nc', '.nc4']:
-        return
-
-    # 1st pass: perform checks
-    try:
-        file.open_dataset()
-    except OSError:
-        logger.critical('Could not open file, maybe it is corrupted, or not a NetCDF file.')
-        return
+        return 'matched'
 
-    skip = False
-    for check in checks_to_run:
+    # 1st pass: perform checks, the lock is held while the dataset is open if the NetCDF
+    # library is used by several threads (see isimip_qc.api)
+    with netcdf_lock or nullcontext():
         try:
-            check(file)
-        except FileWarning:
-            pass
-        except FileError:
-            pass
-        except FileCritical:
-            if not settings.IGNORE_CRIT:
-                logger.info('Skip further checks. Try to repair the file first before checking '
-                            'it again or proceed on own risk with the "--ignore-critical" option.')
-                skip = True
-                break
+            file.open_dataset()
+        except OSError:
+            return 'unreadable'
+
+        status = 'checked'
+        for check in checks_to_run:
+            try:
+                check(file)
+            except FileWarning:
+                pass
+            except FileError:
+                pass
+            except FileCritical:
+                if not settings.IGNORE_CRIT:
+                    # skip further checks for files with critical errors
+                    status = 'critical'
+                    break
 
-    # close the dataset
-    file.close_dataset()
+        # close the dataset
+        file.close_dataset()
 
-    # skip further checks for files with critical errors
-    if skip:
-        return
+    return status
+
+
+def check_single_file(file, checks_to_run, summary):
+    # replay the result of an unchanged file from the cache or perform the checks
+    status = get_cached_result(file)
+    if status is None:
+        status = run_checks(file, checks_to_run)
+        store_result(file, status)
+
+    if settings.OUTPUT:
+        summary.update_files(file, status)
+
+    if file.matched and (settings.SUMMARY or settings.OUTPUT):
+        summary.update_specifiers(file.specifiers)
+        summary.update_variables(file.specifiers)
+        summary.update_experiments(file.specifiers)
+
+    if file.matched and (settings.CHECK_CONTINUITY or settings.OUTPUT):
+        summary.update_time_index(file)
+
+    if file.matched and (settings.COMPLETENESS or settings.OUTPUT):
+        summary.update_index(file.specifiers)
+
+    if file.matched and settings.UPDATE_REFERENCES:
+        summary.update_distributions(file, status)
+
+    if status == 'unreadable':
+        logger.critical('Could not open file, maybe it is corrupted, or not a NetCDF file.')
+        return status
+    elif status == 'critical':
+        logger.info('Skip further checks. Try to repair the file first before checking '
+                    'it again or proceed on own risk with the "--ignore-critical" option.')
+        return status
+    elif status != 'checked':
+        return status
 
     # log result of checks, stop if flags are set
     if file.is_clean:
@@ -224,6 +601,7 @@ def check_single_file(file, checks_to_run, summary):
 
     # 2nd pass: fix warnings and fixable infos
     if settings.FIX:
+        start_action(file, 'fix')
         try:
             file.open_dataset(write=True)
         except OSError:
@@ -241,14 +619,19 @@ def check_single_file(file, checks_to_run, summary):
     # 2nd pass: fix warnings
     if file.has_warnings and settings.FIX_DATAMODEL:
         logger.info('Fix data model...')
+        start_action(file, 'fix_datamodel')
         file.fix_datamodel()
 
     # copy/move files to checked_path
     if settings.MOVE or settings.COPY:
         if file.is_clean or settings.FORCE_COPY_MOVE:
             if settings.MOVE:
+                start_action(file, 'move')
                 file.move()
             elif settings.COPY:
+                start_action(file, 'copy')
                 file.copy()
         else:
             logger.warning('File has not been moved or copied due to warnings or errors found.')
+
+    return status
@@ -3,29 +3,26 @@ import shutil
 from collections import Counter
 from pathlib import Path
 
-import jsonschema
 from isimip_utils.exceptions import DidNotMatch
-from isimip_utils.netcdf import (
-    get_dimensions,
-    get_global_attributes,
-    get_variables,
-    open_dataset_read,
-    open_dataset_write,
-)
 from isimip_utils.patterns import match_file
 from rich.console import Console
 from rich.logging import RichHandler
 from rich.table import Table
 
 from .config import settings
+from .utils.continuity import check_continuity, get_time_index_entry, read_time_index_entry
 from .utils.datamodel import call_cdo, call_nccopy
-from .utils.experiments import get_experiment
+from .utils.experiments import get_experiment, get_experiment_period, get_experiment_periods
 from .utils.files import copy_file, move_file
+from .utils.snapshot import read_snapshot
 
 logger = logging.getLogger(__name__)
 
 console = Console()
 
+# levels of the records which are kept for --output
+OUTPUT_LEVELS = ('warning', 'error', 'critical')
+
 class File:
 
     def __init__(self, file_path):
@@ -43,7 +40,20 @@ class File:
         self.file_handler = None
 
         self.dataset = None
+        self.snapshot = None
+        self.scan = None
+        self.sampled = False
+        self.distribution_mismatch = False
+        self.time_axis = None
         self.specifiers = {}
+        self.matched = False
+
+        # messages in the order they were reported, used by the result cache
+        self.records = []
+        self.cache_key = None
+
+        # fixes, copies or moves which were applied, used by the journal
+        self.actions = []
 
         self.is_2d = False
         self.is_3d = False
@@ -51,64 +61,149 @@ class File:
 
     @property
     def json(self):
-        if self.dataset is None:
+        if self.snapshot is None:
             return {
                 'specifiers': self.specifiers
             }
         else:
             return {
-                'dimensions': get_dimensions(self.dataset),
-                'variables': get_variables(self.dataset),
-                'global_attributes': get_global_attributes(self.dataset),
+                **self.snapshot.json,
                 'specifiers': self.specifiers
             }
 
-    def open_log(self):
-        self.logger = self.get_logger()
+    def open_log(self, console_handler=None):
+        self.logger = self.get_logger(console_handler)
 
     def close_log(self):
         if self.handler:
             self.handler.close()
         self.handler = None
 
+        if self.logger is not None:
+            for handler in self.logger.handlers[:]:
+                self.logger.removeHandler(handler)
+        self.logger = None
+
     def open_dataset(self, write=False):
+        # netCDF4 (and numpy) are only imported once a dataset is opened, not for --match-only
+        from isimip_utils.netcdf import open_dataset_read, open_dataset_write
+
         if write:
             self.dataset = open_dataset_write(self.abs_path)
         else:
             self.dataset = open_dataset_read(self.abs_path)
+            # read the header once, the checks use the snapshot instead of the dataset
+            self.snapshot = read_snapshot(self.dataset)
 
     def close_dataset(self):
         if self.dataset is not None:
             self.dataset.close()
         self.dataset = None
 
+    def scan_data(self):
+        '''
+        Read the data of the variable once and return the accumulators (valid range outliers, non-finite
+        values, statistics per time step and missing values per cell), which are shared by all checks.
+        With REFERENCES, the histogram of the magnitudes of the values is computed in the same pass.
+        With MINMAX_SAMPLE, only a sample of the data is read first. If it contains no values outside of
+        the valid range and no NaN or infinite values, only the valid range, the non-finite values and the
+        histogram of the sample are returned and self.sampled is set, otherwise all values are read.
+        '''
+        from .utils.scan import (
+            Histogram,
+            MissingCells,
+            NonFinite,
+            StepStatistics,
+            ValidRange,
+            scan_variable,
+            scan_variable_parallel,
+        )
+        from .utils.shard import get_path_hash
+
+        if self.scan is None:
+            variable = self.dataset.variables[self.variable_name]
+            memory = settings.SCAN_MEMORY * 1024 * 1024
+
+            definition = settings.DEFINITIONS.get('variable', {}).get(self.specifiers.get('variable'), {})
+            valid_min = definition.get('valid_min')
+            valid_max = definition.get('valid_max')
+
+            if settings.MINMAX_SAMPLE and valid_min is not None and valid_max is not None:
+                # the sample is drawn using the path of the file, so that every run reads the same sample
+                accumulators = {
+                    'range': ValidRange(valid_min, valid_max, 0),
+                    'non_finite': NonFinite()
+                }
+                if settings.REFERENCES:
+                    accumulators['histogram'] = Histogram()
+
+                sample = scan_variable(variable, accumulators, memory,
+                                       sample=settings.MINMAX_SAMPLE, seed=get_path_hash(self.path))
+
+                if not (sample['range'].low.count or sample['range'].high.count or
+                        sample['non_finite'].nan or sample['non_finite'].inf):
+                    self.scan = sample
+                    self.sampled = True
+                    return self.scan
+
+                self.info('Found invalid values in a sample of the data, reading all values...')
+
+            accumulators = {
+                'non_finite': NonFinite(),
+                'steps': StepStatistics(variable.shape)
+            }
+
+            if valid_min is not None and valid_max is not None:
+                accumulators['range'] = ValidRange(valid_min, valid_max, int(settings.MINMAX))
+
+            # the missing values per cell are only needed to compare with a land-sea mask
+            if settings.MASK_FILES:
+                accumulators['missing'] = MissingCells(variable.shape)
+
+            # the distribution is only needed to compare with the reference distributions
+            if settings.REFERENCES:
+                accumulators['histogram'] = Histogram()
+
+            if settings.SCAN_JOBS > 1:
+                self.scan = scan_variable_parallel(self.abs_path, variable, accumulators, memory, settings.SCAN_JOBS)
+            else:
+                self.scan = scan_variable(variable, accumulators, memory)
+
+        return self.scan
+
     def debug(self, message, *args):
         if self.logger is not None:
             self.logger.debug(message, *args)
 
+        self.records.append(('debug', message % args, None))
+
     def info(self, message, *args, fix=None):
         if self.logger is not None:
             self.logger.info(message, *args)
 
         self.infos.append((message % args, fix))
+        self.records.append(('info', message % args, None))
 
     def warning(self, message, *args, fix=None, fix_datamodel=None):
         if self.logger is not None:
             self.logger.warning(message, *args)
 
         self.warnings.append((message % args, fix, fix_datamodel))
+        self.records.append(('warning', message % args, fix_datamodel))
 
     def error(self, message, *args):
         if self.logger is not None:
             self.logger.error(message, *args)
 
         self.errors.append(message % args)
+        self.records.append(('error', message % args, None))
 
     def critical(self, message, *args):
         if self.logger is not None:
             self.logger.critical(message, *args)
 
         self.criticals.append(message % args)
+        self.records.append(('critical', message % args, None))
 
     def fix_infos(self):
         for info in self.infos[:]:
@@ -179,19 +274,20 @@ class File:
     def is_clean(self):
         return not (self.has_warnings or self.has_errors or self.has_criticals)
 
-    def get_logger(self):
-        # setup a log handler for the command line and one for the file
-        logger_name = str(self.path)
-
-        logger = logging.getLogger(logger_name)
-        logger.setLevel(settings.LOG_LEVEL)
+    def get_logger(self, console_handler=None):
+        # setup a log handler for the command line and one for the file, the logger is created for this
+        # file only and not registered with the logging module, so that the same path can be checked
+        # at the same time with different contexts (see isimip_qc.api)
+        logger = logging.Logger(str(self.path), settings.LOG_LEVEL)
 
         # do not propagate messages to the root logger,
         # which is configured in main()
         logger.propagate = False
 
-        # add rich handler
-        logger.addHandler(RichHandler(show_time=settings.SHOW_TIME, show_path=settings.SHOW_PATH))
+        # add rich handler, or the given handler, e.g. when running in a worker process
+        if console_handler is None:
+            console_handler = RichHandler(show_time=settings.SHOW_TIME, show_path=settings.SHOW_PATH)
+        logger.addHandler(console_handler)
 
         # add file handler
         if settings.LOG_PATH:
@@ -223,10 +319,12 @@ class File:
             self.matched = False
 
     def validate(self):
-        try:
-            jsonschema.validate(schema=settings.SCHEMA, instance=self.json)
-        except jsonschema.exceptions.ValidationError as e:
-            self.error('Failed to validate with JSON schema: %s\n%s', self.json, e)
+        import jsonschema
+
+        instance = self.json
+        error = jsonschema.exceptions.best_match(settings.VALIDATOR.iter_errors(instance))
+        if error is not None:
+            self.error('Failed to validate with JSON schema: %s\n%s', instance, error)
 
     def copy(self):
         copy_file(self.abs_path, settings.CHECKED_PATH / self.path)
@@ -241,6 +339,11 @@ class Summary:
         self.specifiers = {}
         self.variables = {}
         self.experiments = Counter()
+        self.time_index = []
+        self.index = None
+        self.experiment_periods = None
+        self.files = []
+        self.distributions = {}
 
     def update_specifiers(self, specifiers):
         for identifier, specifier in specifiers.items():
@@ -267,6 +370,120 @@ class Summary:
         if experiment:
             self.experiments[experiment] += 1
 
+    def update_time_index(self, file):
+        entry = get_time_index_entry(file.path, file.specifiers, file.time_axis)
+        if entry is not None:
+            self.time_index.append(entry)
+
+    def update_index(self, specifiers):
+        from .utils.completeness import SpecifierIndex
+
+        if self.index is None:
+            self.index = SpecifierIndex()
+            self.experiment_periods = get_experiment_periods()
+
+        experiment, period = get_experiment_period(specifiers) or (None, None)
+        self.index.add({**specifiers, 'experiment': experiment, 'period': period})
+
+    def update_distributions(self, file, status):
+        # only files without errors, without invalid values and which match the current reference
+        # distribution are added to the new reference distributions
+        if status != 'checked' or file.has_errors or file.distribution_mismatch or \
+                file.scan is None or 'histogram' not in file.scan:
+            return
+
+        scan = file.scan
+        if scan['non_finite'].nan or scan['non_finite'].inf or \
+                ('range' in scan and (scan['range'].low.count or scan['range'].high.count)):
+            return
+
+        variable = file.specifiers.get('variable')
+        if variable not in self.distributions:
+            self.distributions[variable] = scan['histogram']
+        else:
+            self.distributions[variable].merge(scan['histogram'])
+
+    def update_files(self, file, status):
+        # only the warnings and errors are kept, to limit the memory for many files
+        self.files.append({
+            'path': str(file.path),
+            'status': status,
+            'records': [[level, message] for level, message, _ in file.records if level in OUTPUT_LEVELS]
+        })
+
+    def merge(self, other):
+        for identifier, counter in other.specifiers.items():
+            if identifier not in self.specifiers:
+                self.specifiers[identifier] = Counter()
+
+            self.specifiers[identifier].update(counter)
+
+        for specifier, variable in other.variables.items():
+            if specifier not in self.variables:
+                self.variables[specifier] = dict(variable)
+            else:
+                self.variables[specifier]['count'] += variable['count']
+
+        self.experiments.update(other.experiments)
+        self.time_index.extend(other.time_index)
+
+        if other.index is not None:
+            if self.index is None:
+                self.index = other.index
+                self.experiment_periods = other.experiment_periods
+            else:
+                self.index.merge(other.index)
+
+        self.files.extend(other.files)
+
+        for variable, histogram in other.distributions.items():
+            if variable not in self.distributions:
+                self.distributions[variable] = histogram
+            else:
+                self.distributions[variable].merge(histogram)
+
+    def to_dict(self):
+        return {
+            'specifiers': [
+                [identifier, specifier, count]
+                for identifier, counter in self.specifiers.items()
+                for specifier, count in counter.items()
+            ],
+            'variables': self.variables,
+            'experiments': dict(self.experiments),
+            'time_index': self.time_index,
+            'index': self.index.to_dict() if self.index is not None else None,
+            'experiment_periods': self.experiment_periods,
+            'files': self.files,
+            'distributions': {variable: histogram.to_dict() for variable, histogram in self.distributions.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        for identifier, specifier, count in data['specifiers']:
+            summary.specifiers.setdefault(identifier, Counter())[specifier] += count
+        summary.variables = data['variables']
+        summary.experiments = Counter(data['experiments'])
+        summary.time_index = [read_time_index_entry(values) for values in data['time_index']]
+
+        if data['index'] is not None:
+            from .utils.completeness import SpecifierIndex
+
+            summary.index = SpecifierIndex.from_dict(data['index'])
+            summary.experiment_periods = [tuple(item) for item in data['experiment_periods']]
+
+        summary.files = data['files']
+
+        if data.get('distributions'):
+            from .utils.scan import Histogram
+
+            summary.distributions = {
+                variable: Histogram.from_dict(histogram) for variable, histogram in data['distributions'].items()
+            }
+
+        return summary
+
     def print_specifiers(self):
         table = Table()
         table.add_column('Identifier')
@@ -300,6 +517,57 @@ class Summary:
 
         console.print(table)
 
+    def print_continuity(self):
+        n_groups, problems = check_continuity(self.time_index)
+
+        for problem in problems:
+            if problem.source == 'years':
+                logger.error('%s between %s (%s-%s) and %s (%s-%s) by the years in the file names.',
+                             problem.kind.capitalize(), problem.previous.path, problem.previous.start_year,
+                             problem.previous.end_year, problem.following.path, problem.following.start_year,
+                             problem.following.end_year)
+            else:
+                logger.error('%s between the time axes of %s and %s: the first time step is %s, but should be %s.',
+                             problem.kind.capitalize(), problem.previous.path, problem.following.path,
+                             '-'.join(map(str, problem.found)), '-'.join(map(str, problem.expected)))
+
+        if not problems:
+            logger.info('The time axes of the files in %s groups are contiguous.', n_groups)
+
+    def print_completeness(self):
+        from .utils.completeness import find_duplicates, find_missing
+
+        if self.index is None:
+            return
+
+        missing = find_missing(self.index, self.experiment_periods)
+        if missing:
+            table = Table(title='Missing combinations')
+            table.add_column('Model')
+            table.add_column('Climate forcing')
+            table.add_column('Experiment')
+            table.add_column('Period')
+            table.add_column('Missing', style='magenta')
+
+            for row in missing:
+                variants = ', '.join('_'.join(str(value) for value in variant.values()) for variant in row.variants)
+                table.add_row(row.model, row.climate_forcing, row.experiment, row.period, variants or 'all')
+
+            console.print(table)
+        else:
+            logger.info('No missing combinations found for the %s matched files.', len(self.index))
+
+        duplicates = find_duplicates(self.index)
+        if duplicates:
+            table = Table(title='Duplicate combinations')
+            table.add_column('Specifiers')
+            table.add_column('Count', justify='right', style='cyan')
+
+            for specifiers, count in duplicates:
+                table.add_row(', '.join(f'{key}={value}' for key, value in specifiers.items()), str(count))
+
+            console.print(table)
+
     def print(self):
         self.print_specifiers()
         self.print_variables()
@@ -0,0 +1,106 @@
+import logging
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import settings
+from .models import Summary
+
+logger = logging.getLogger(__name__)
+
+
+class BufferHandler(logging.Handler):
+    '''
+    Collects the log records of one file in a worker process, so that they
+    can be emitted in one block by the main process.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # render the message and drop everything which might not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        self.records.append(record)
+
+
+def init_worker(settings_dict, cached_settings):
+    settings.from_dict(settings_dict)
+
+    # set the cached properties (NOW, DEFINITIONS, ...) from the main process,
+    # so that the protocol is not fetched again and all log files use the same time stamp
+    settings.__dict__.update(cached_settings)
+
+    # remove the handlers inherited from the main process, logs are collected per file
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.setLevel(settings.LOG_LEVEL)
+
+
+def check_file_worker(file_path, checks_to_run):
+    from .main import check_file
+
+    handler = BufferHandler()
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+
+    summary = Summary()
+    stop = False
+    try:
+        check_file(file_path, checks_to_run, summary, console_handler=handler)
+    except SystemExit:
+        # raised by check_single_file for --stop-on-warnings or --stop-on-errors
+        stop = True
+    finally:
+        root_logger.removeHandler(handler)
+
+    return handler.records, summary, stop
+
+
+def handle_result(result, summary):
+    records, file_summary, stop = result
+
+    # emit the records of one file in one block using the handlers of the main process
+    root_logger = logging.getLogger()
+    for record in records:
+        root_logger.handle(record)
+
+    summary.merge(file_summary)
+
+    return stop
+
+
+def check_files_parallel(file_paths, checks_to_run, summary):
+    cached_settings = {key: getattr(settings, key) for key in ('NOW', 'DEFINITIONS', 'PATTERN', 'SCHEMA')}
+
+    with ProcessPoolExecutor(max_workers=settings.JOBS, initializer=init_worker,
+                             initargs=(settings.to_dict(), cached_settings)) as executor:
+        # keep a bounded number of files in flight and handle the results in order
+        futures = deque()
+        stop = False
+
+        for file_path in file_paths:
+            futures.append(executor.submit(check_file_worker, file_path, checks_to_run))
+
+            if len(futures) >= 2 * settings.JOBS:
+                stop = handle_result(futures.popleft().result(), summary)
+                if stop:
+                    break
+
+        if stop:
+            # cancel the files which have not been started, but report the ones already in progress
+            for future in futures:
+                future.cancel()
+
+        while futures:
+            future = futures.popleft()
+            if not future.cancelled():
+                stop = handle_result(future.result(), summary) or stop
+
+    if stop:
+        sys.exit(1)
@@ -0,0 +1,229 @@
+import argparse
+import ipaddress
+import json
+import logging
+import signal
+import socket
+import socketserver
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from isimip_utils.exceptions import NotFound
+
+from . import VERSION
+from .api import check_file
+from .config import Context, settings
+from .utils.cli import parse_schema_path
+
+logger = logging.getLogger(__name__)
+
+# options which can be set for each request, and how their values are checked, options with paths
+# (e.g. unchecked_path or mask_files) can only be set when the service is started
+REQUEST_OPTIONS = {
+    'minmax': int,
+    'minmax_sample': float,
+    'scan_memory': int,
+    'skip_exp': bool,
+    'time_span': bool,
+    'check': str,
+    'ignore_crit': bool,
+    'match_only': bool,
+    'no_cache': bool,
+    'cache_hash': bool
+}
+
+# upper limits of the options for the memory used by a worker for one request
+MAX_MINMAX = 1000
+MAX_SCAN_MEMORY = 4096
+
+# cached properties of the settings which are derived from the protocol
+PROTOCOL_PROPERTIES = ('PROTOCOL', 'DEFINITIONS', 'PATTERN', 'SCHEMA', 'PROTOCOL_VERSION', 'VALIDATOR')
+
+_settings_dict = None
+_protocols = OrderedDict()
+
+
+def parse_request(request, default_schema_path=None):
+    '''
+    Validate a check request and return the path, the schema_path and the options.
+    '''
+    if not isinstance(request, dict):
+        raise ValueError('The request needs to be a JSON object.')
+
+    path = request.get('path')
+    if not isinstance(path, str) or not path:
+        raise ValueError('The request needs a "path".')
+
+    schema_path = request.get('schema_path', default_schema_path)
+    if schema_path is None:
+        raise ValueError('The request needs a "schema_path".')
+
+    try:
+        schema_path = parse_schema_path(str(schema_path))
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(f'schema_path {e}') from e
+
+    options = request.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError('The options need to be a JSON object.')
+
+    for key, value in options.items():
+        option_type = REQUEST_OPTIONS.get(key)
+        if option_type is None:
+            raise ValueError(f'The option "{key}" can not be set for a request.')
+        if value is not None and (not isinstance(value, option_type) or
+                                  (option_type is int and isinstance(value, bool))):
+            raise ValueError(f'The option "{key}" needs to be of type {option_type.__name__}.')
+
+    # the same ranges as on the command line, but with upper limits
+    if options.get('minmax') is not None and not 0 <= options['minmax'] <= MAX_MINMAX:
+        raise ValueError(f'The option "minmax" needs to be between 0 and {MAX_MINMAX}.')
+    if options.get('minmax_sample') is not None and not 0 < options['minmax_sample'] <= 1:
+        raise ValueError('The option "minmax_sample" needs to be between 0 and 1.')
+    if options.get('scan_memory') is not None and not 1 <= options['scan_memory'] <= MAX_SCAN_MEMORY:
+        raise ValueError(f'The option "scan_memory" needs to be between 1 and {MAX_SCAN_MEMORY}.')
+
+    return path, schema_path, options
+
+
+def is_loopback(host):
+    '''
+    Return True if all addresses of host are loopback addresses, i.e. the service is not reachable from
+    other hosts.
+    '''
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except OSError:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_loopback for address in addresses)
+
+
+def init_service_worker(settings_dict):
+    global _settings_dict
+
+    _settings_dict = settings_dict
+
+    # the service is stopped by the main process, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_context(schema_path, options):
+    '''
+    Create the context for one request. The protocols of the most recently used schema paths are kept,
+    together with the compiled pattern and schema validator.
+    '''
+    context = Context({**_settings_dict, **options, 'schema_path': schema_path, 'handler': None})
+
+    protocol, loaded = _protocols.pop(schema_path, (None, None))
+    if protocol is None or time.time() - loaded > context.PROTOCOL_TTL * 3600:
+        # load_protocol itself uses the protocol cache on disk
+        protocol = {key: getattr(context, key) for key in PROTOCOL_PROPERTIES}
+        loaded = time.time()
+
+    context.__dict__.update(protocol)
+
+    _protocols[schema_path] = (protocol, loaded)
+    while len(_protocols) > context.PROTOCOLS:
+        _protocols.popitem(last=False)
+
+    return context
+
+
+def check_request(path, schema_path, options):
+    result = check_file(path, get_context(schema_path, options))
+    return {
+        **result._asdict(),
+        'schema_path': str(schema_path),
+        'records': [{'level': level, 'message': message} for level, message in result.records]
+    }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    server_version = f'isimip-qc/{VERSION}'
+
+    def do_GET(self):
+        if self.path == '/':
+            self.send_json(HTTPStatus.OK, {'version': VERSION})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found.'})
+
+    def do_POST(self):
+        if self.path != '/check':
+            return self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found.'})
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            path, schema_path, options = parse_request(json.loads(self.rfile.read(length)),
+                                                       self.server.schema_path)
+        except ValueError as e:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+
+        try:
+            result = self.server.executor.submit(check_request, path, schema_path, options).result()
+        except ValueError as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+        except (FileNotFoundError, NotFound) as e:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': str(e)})
+        except Exception as e:
+            logger.exception('Could not check %s.', path)
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+        else:
+            self.send_json(HTTPStatus.OK, result)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # the client address of a Unix socket is an empty string
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.info('%s %s', self.address_string(), format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def server_bind(self):
+        # remove the socket of a previous run
+        Path(self.server_address).unlink(missing_ok=True)
+        super().server_bind()
+        self.server_name, self.server_port = str(self.server_address), 0
+
+
+def serve(schema_path=None, host='127.0.0.1', port=8000, socket_path=None, jobs=1):
+    '''
+    Answer check requests via HTTP on host:port, or on a Unix socket at socket_path. The files are
+    checked by a pool of jobs worker processes, which keep the protocols of recent schema paths loaded.
+    '''
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_service_worker,
+                             initargs=(settings.to_dict(), )) as executor:
+        if socket_path:
+            server = ThreadingUnixHTTPServer(str(socket_path), RequestHandler)
+            logger.info('Listening on %s.', socket_path)
+        else:
+            server = ThreadingHTTPServer((host, port), RequestHandler)
+            logger.info('Listening on http://%s:%s.', host, server.server_port)
+
+        server.schema_path = schema_path
+        server.executor = executor
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info('Stop serving.')
+        finally:
+            server.server_close()
+            if socket_path:
+                Path(socket_path).unlink(missing_ok=True)
@@ -0,0 +1,100 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ..api import check_file, create_context
+from ..config import settings, use_context
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def get_context(tmp_path, pattern, handler=None):
+    context = create_context('ISIMIP3b/OutputData/water_global', handler, unchecked_path=str(tmp_path),
+                             match_only=True, no_cache=True, log_level='INFO')
+    context.__dict__['PATTERN'] = {'file': re.compile(pattern)}
+    context.__dict__['SCHEMA'] = {}
+    return context
+
+
+def test_create_context(tmp_path):
+    context = create_context('ISIMIP3b/OutputData/water_global', unchecked_path=str(tmp_path), minmax=5)
+
+    assert context.UNCHECKED_PATH == tmp_path
+    assert context.MINMAX == 5
+    assert context.SECTOR == 'water_global'
+    assert context.SCAN_MEMORY == 256
+
+    with pytest.raises(TypeError):
+        create_context('ISIMIP3b/OutputData/water_global', unknown=True)
+
+
+def test_check_file(tmp_path):
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+
+    model_context = get_context(tmp_path, r'^(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)[.]nc$')
+    variable_context = get_context(tmp_path, r'^(?P<variable>[a-z0-9]+)_[a-z]+[.]nc$')
+
+    # both contexts are used at the same time, without changing the global settings
+    settings.from_dict({'UNCHECKED_PATH': None})
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(check_file, ['h08_dis.nc'] * 8, [model_context, variable_context] * 4))
+
+    assert settings.UNCHECKED_PATH is None
+    for i, result in enumerate(results):
+        assert result.path == 'h08_dis.nc'
+        assert result.status == 'matched'
+        if i % 2 == 0:
+            assert result.specifiers == {'model': 'h08', 'variable': 'dis'}
+        else:
+            assert result.specifiers == {'variable': 'h08'}
+
+    with pytest.raises(FileNotFoundError):
+        check_file('qtot.nc', model_context)
+
+
+def test_check_file_handlers(tmp_path):
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+
+    # the same file is checked with both contexts at once, every handler only gets the records of its context
+    handlers = [ListHandler(), ListHandler()]
+    contexts = [get_context(tmp_path, r'^(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)[.]nc$', handlers[0]),
+                get_context(tmp_path, r'^(?P<variable>[a-z0-9]+)_[a-z]+[.]nc$', handlers[1])]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(check_file, ['h08_dis.nc'] * 8, contexts * 4))
+
+    for i, handler in enumerate(handlers):
+        assert handler.messages == [message for result in results[i::2] for _, message in result.records]
+        assert len(handler.messages) >= 4
+
+
+def test_use_context(tmp_path):
+    context = get_context(tmp_path, r'^$')
+
+    settings.from_dict({'MINMAX': 10})
+    with use_context(context):
+        assert settings.MINMAX is None
+        assert settings.UNCHECKED_PATH == tmp_path
+    assert settings.MINMAX == 10
+
+
+def test_check_file_outside(tmp_path):
+    (tmp_path / 'unchecked').mkdir()
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+    (tmp_path / 'unchecked' / 'link.nc').symlink_to(tmp_path / 'h08_dis.nc')
+
+    # files outside of UNCHECKED_PATH can not be checked, also not using a symbolic link
+    context = get_context(tmp_path / 'unchecked', r'^(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)[.]nc$')
+    for path in ('../h08_dis.nc', str(tmp_path / 'h08_dis.nc'), 'link.nc'):
+        with pytest.raises(ValueError):
+            check_file(path, context)
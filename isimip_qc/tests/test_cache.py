@@ -0,0 +1,72 @@
+import re
+
+from ..api import check_file, create_context
+from ..config import use_context
+from ..models import File
+from ..utils.cache import get_cache_key, get_connection
+
+
+def get_context(tmp_path, **options):
+    options.setdefault('cache_path', tmp_path / 'cache')
+    context = create_context('ISIMIP3b/OutputData/water_global', unchecked_path=str(tmp_path), **options)
+    context.__dict__['PATTERN'] = {'file': re.compile(r'^(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)[.]nc$')}
+    context.__dict__['SCHEMA'] = {}
+    context.__dict__['DEFINITIONS'] = {}
+    return context
+
+
+def get_cached_paths(context):
+    with use_context(context):
+        return [path for path, in get_connection().execute('SELECT path FROM results')]
+
+
+def test_store_result(tmp_path):
+    (tmp_path / 'unmatched.nc').write_bytes(b'')
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+    context = get_context(tmp_path)
+
+    # unreadable files are not stored, they might only be incomplete
+    assert check_file('unmatched.nc', context).status == 'unmatched'
+    assert check_file('h08_dis.nc', context).status == 'unreadable'
+    assert get_cached_paths(context) == ['unmatched.nc']
+
+
+def test_get_cache_key(tmp_path):
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+    references_path = tmp_path / 'references.json'
+    references_path.write_text('{}')
+    context = get_context(tmp_path, references=references_path)
+
+    with use_context(context):
+        file = File(tmp_path / 'h08_dis.nc')
+        key = get_cache_key(file)
+        assert get_cache_key(file) == key
+
+        # the key changes with the content of the references, not only with their path
+        references_path.write_text('{"ISIMIP3b/OutputData/water_global": {}}')
+        assert get_cache_key(file) != key
+
+
+def test_store_result_roots(tmp_path):
+    for root in ('a', 'b'):
+        (tmp_path / root).mkdir()
+        (tmp_path / root / 'unmatched.nc').write_bytes(b'')
+
+    # the results of the same relative path below different roots are stored separately
+    contexts = [get_context(tmp_path / 'a', cache_path=tmp_path / 'cache'),
+                get_context(tmp_path / 'b', cache_path=tmp_path / 'cache')]
+    for context in contexts:
+        check_file('unmatched.nc', context)
+
+    assert get_cached_paths(contexts[0]) == ['unmatched.nc', 'unmatched.nc']
+
+
+def test_protocol_version(tmp_path):
+    context = get_context(tmp_path)
+    other_context = get_context(tmp_path)
+    other_context.__dict__['DEFINITIONS'] = {'variable': {}}
+
+    # local protocols without a commit are identified by their content
+    assert context.PROTOCOL_VERSION.startswith('sha256:')
+    assert context.PROTOCOL_VERSION == get_context(tmp_path).PROTOCOL_VERSION
+    assert context.PROTOCOL_VERSION != other_context.PROTOCOL_VERSION
@@ -0,0 +1,42 @@
+import pickle
+from types import SimpleNamespace
+
+from ..checks import CHECKS, checks, discover_checks
+
+
+def test_checks_match_discovered_checks():
+    assert list(CHECKS) == discover_checks()
+
+
+def test_check_is_imported_lazily():
+    check = checks[0]
+    assert check.__name__ == 'check_3d'
+    assert check.func.__module__ == 'isimip_qc.checks.3d'
+
+
+def test_check_pickle():
+    check = pickle.loads(pickle.dumps(checks[-1]))
+    assert check.module_name == 'isimip_qc.checks.variables.var3d'
+    assert check.__name__ == 'check_3d_variable'
+
+
+def test_has_range_test(tmp_path):
+    from ..api import create_context
+    from ..checks.variables.var import has_range_test
+    from ..config import use_context
+
+    context = create_context('ISIMIP3b/OutputData/water_global', unchecked_path=str(tmp_path), minmax=5)
+    context.__dict__['DEFINITIONS'] = {
+        'sector': {},
+        'variable': {'dis': {'valid_min': 0, 'valid_max': 1e6}, 'qtot': {}}
+    }
+
+    def get_file(variable):
+        time = SimpleNamespace(attrs={'units': 'days since 1661-1-1', 'calendar': 'standard'})
+        return SimpleNamespace(specifiers={'variable': variable}, variable_name=variable, is_time_fixed=False,
+                               snapshot=SimpleNamespace(variables={variable: None, 'time': time}))
+
+    # the data is only read for variables with a valid range
+    with use_context(context):
+        assert has_range_test(get_file('dis'))
+        assert not has_range_test(get_file('qtot'))
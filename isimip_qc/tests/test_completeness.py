@@ -0,0 +1,77 @@
+from ..utils.completeness import Missing, SpecifierIndex, find_duplicates, find_missing
+
+EXPERIMENT_PERIODS = [('historical', 'historical'), ('ssp126', 'future'), ('ssp585', 'future')]
+
+
+def get_specifiers(model, climate_forcing, experiment, period, variable, time_step='daily'):
+    return {
+        'model': model, 'climate_forcing': climate_forcing, 'experiment': experiment, 'period': period,
+        'variable': variable, 'time_step': time_step
+    }
+
+
+def get_index(rows):
+    index = SpecifierIndex()
+    for row in rows:
+        index.add(get_specifiers(*row))
+    return index
+
+
+def test_specifier_index():
+    index = get_index([
+        ('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'),
+        ('h08', 'ukesm1-0-ll', 'historical', 'historical', 'qtot')
+    ])
+    index.add({'model': 'lpjml', 'region': 'global'})
+
+    assert len(index) == 3
+    assert index.values['model'] == [None, 'h08', 'lpjml']
+    assert index.get_array(['model', 'region', 'variable']).tolist() == [[1, 0, 1], [1, 0, 2], [2, 1, 0]]
+    assert index.decode_row(['model', 'region'], [2, 1]) == {'model': 'lpjml', 'region': 'global'}
+
+
+def test_specifier_index_merge():
+    index = get_index([('h08', 'gfdl-esm4', 'historical', 'historical', 'dis')])
+    other = get_index([
+        ('lpjml', 'gfdl-esm4', 'historical', 'historical', 'qtot'),
+        ('h08', 'gfdl-esm4', 'historical', 'historical', 'dis')
+    ])
+    other.add({'model': 'lpjml', 'region': 'global'})
+    index.merge(other)
+
+    assert len(index) == 4
+    assert [index.decode_row(sorted(index.columns), row) for row in index.get_array(sorted(index.columns))] == [
+        get_specifiers('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'),
+        get_specifiers('lpjml', 'gfdl-esm4', 'historical', 'historical', 'qtot'),
+        get_specifiers('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'),
+        {'model': 'lpjml', 'region': 'global'}
+    ]
+
+
+def test_find_duplicates():
+    index = get_index([
+        ('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'),
+        ('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'),
+        ('h08', 'gfdl-esm4', 'historical', 'historical', 'dis', 'monthly')
+    ])
+    assert find_duplicates(index) == [(get_specifiers('h08', 'gfdl-esm4', 'historical', 'historical', 'dis'), 2)]
+
+
+def test_find_missing():
+    rows = [
+        (model, climate_forcing, experiment, period, variable)
+        for model in ('h08', 'lpjml')
+        for climate_forcing in ('gfdl-esm4', 'ukesm1-0-ll')
+        for experiment, period in EXPERIMENT_PERIODS
+        for variable in ('dis', 'qtot')
+    ]
+    rows.remove(('h08', 'ukesm1-0-ll', 'ssp126', 'future', 'qtot'))
+    rows = [row for row in rows if row[:3] != ('lpjml', 'gfdl-esm4', 'ssp585')]
+
+    # files which do not belong to an experiment are ignored
+    rows.append(('lpjml', 'gfdl-esm4', None, None, 'dis'))
+
+    assert find_missing(get_index(rows), EXPERIMENT_PERIODS) == [
+        Missing('h08', 'ukesm1-0-ll', 'ssp126', 'future', [{'time_step': 'daily', 'variable': 'qtot'}]),
+        Missing('lpjml', 'gfdl-esm4', 'ssp585', 'future', [])
+    ]
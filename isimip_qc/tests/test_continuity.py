@@ -0,0 +1,46 @@
+from ..utils.continuity import check_continuity, get_next_time_step, get_time_index_entry
+
+SPECIFIERS = {'model': 'h08', 'variable': 'dis', 'time_step': 'daily'}
+
+
+def get_entry(start_year, end_year, first, last, calendar='proleptic_gregorian', **specifiers):
+    return get_time_index_entry(f'{start_year}_{end_year}.nc', {
+        **SPECIFIERS, **specifiers, 'start_year': start_year, 'end_year': end_year
+    }, {'calendar': calendar, 'first': first, 'last': last})
+
+
+def test_get_next_time_step():
+    assert get_next_time_step((1852, 2, 28), 'daily', 'proleptic_gregorian') == (1852, 2, 29)
+    assert get_next_time_step((1852, 2, 28), 'daily', '365_day') == (1852, 3, 1)
+    assert get_next_time_step((1850, 12, 30), 'daily', '360_day') == (1851, 1, 1)
+    assert get_next_time_step((1850, 12), 'monthly', 'standard') == (1851, 1)
+    assert get_next_time_step((1850, ), 'annual', 'standard') == (1851, )
+
+
+def test_check_continuity():
+    entries = [
+        get_entry(2011, 2020, [2011, 1, 1], [2020, 12, 31]),
+        get_entry(1991, 2000, [1991, 1, 1], [2000, 12, 31]),
+        get_entry(2001, 2010, [2001, 1, 1], [2010, 12, 31]),
+        get_entry(1991, 2000, [1991, 1, 1], [2000, 12, 31], variable='qtot')
+    ]
+    assert check_continuity(entries) == (2, [])
+
+
+def test_check_continuity_problems():
+    entries = [
+        get_entry(1991, 2000, [1991, 1, 1], [2000, 12, 31]),
+        get_entry(2001, 2010, [2001, 1, 2], [2010, 12, 31]),  # first day is missing
+        get_entry(2010, 2020, [2010, 1, 1], [2020, 12, 31]),  # overlaps by one year
+        get_entry(2031, 2040, [2031, 1, 1], [2040, 12, 31])   # 2021-2030 is missing
+    ]
+    n_groups, problems = check_continuity(entries)
+
+    assert n_groups == 1
+    assert [(problem.kind, problem.source, problem.found, problem.expected) for problem in problems] == [
+        ('gap', 'time', (2001, 1, 2), (2001, 1, 1)),
+        ('overlap', 'years', (2010, ), (2011, )),
+        ('overlap', 'time', (2010, 1, 1), (2011, 1, 1)),
+        ('gap', 'years', (2031, ), (2021, )),
+        ('gap', 'time', (2031, 1, 1), (2021, 1, 1))
+    ]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from ..utils.distributions import read_distributions, write_distributions
+from ..utils.scan import Histogram, Slab
+
+
+def get_histogram(values):
+    histogram = Histogram()
+    histogram.update(Slab((slice(0, len(values)), ), np.array(values, dtype='f4')))
+    return histogram
+
+
+def test_write_distributions(tmp_path):
+    path = tmp_path / 'references.json'
+    assert read_distributions(path, 'ISIMIP3b/OutputData/water_global') == {}
+
+    write_distributions(path, 'ISIMIP3b/OutputData/water_global', {'dis': get_histogram([1, 10, 100])})
+    write_distributions(path, 'ISIMIP3b/OutputData/water_global', {'dis': get_histogram([0, 1000]),
+                                                                   'qtot': get_histogram([2e-5])})
+    write_distributions(path, 'ISIMIP3b/OutputData/agriculture', {'yield': get_histogram([5])})
+
+    # the distributions of a variable are replaced, the ones of other variables are kept
+    write_distributions(path, 'ISIMIP3b/OutputData/water_global', {'dis': get_histogram([0, 1000])})
+
+    distributions = read_distributions(path, 'ISIMIP3b/OutputData/water_global')
+    assert sorted(distributions) == ['dis', 'qtot']
+    assert distributions['dis'].zeros == 1
+    assert distributions['dis'].counts.sum() == 1
+    assert np.isclose(distributions['qtot'].percentile(50), 2.24e-5, rtol=0.01)
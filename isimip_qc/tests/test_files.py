@@ -0,0 +1,84 @@
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from ..utils.files import read_files, split_file_list, walk_files
+
+
+def walk_files_sequential(path):
+    # the sequential walk used before, as reference for the order of the files
+    stack = [Path(path)]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    yield Path(entry.path)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for model in ('h08', 'lpjml', 'watergap2'):
+        for experiment in ('historical', 'picontrol', 'ssp126'):
+            for variable in ('dis', 'qtot'):
+                path = tmp_path / model / experiment / variable
+                path.mkdir(parents=True)
+                for year in ('1850_1900', '1901_2014'):
+                    (path / f'{model}_{experiment}_{variable}_{year}.nc').touch()
+                (path / 'README.txt').touch()
+    (tmp_path / 'a.nc').touch()
+    (tmp_path / 'link').symlink_to(tmp_path / 'h08')
+    return tmp_path
+
+
+@pytest.mark.parametrize('threads', [1, 2, 8])
+def test_walk_files_order(tree, threads):
+    assert list(walk_files(tree, threads=threads)) == list(walk_files_sequential(tree))
+
+
+def test_walk_files_filter(tree):
+    file_paths = list(walk_files(tree, include=['dis'], exclude=['picontrol'], suffixes=['.nc']))
+
+    assert len(file_paths) == 3 * 2 * 2
+    assert all('dis' in str(file_path) for file_path in file_paths)
+    assert not any('picontrol' in str(file_path) for file_path in file_paths)
+
+
+def test_walk_files_close(tree):
+    file_paths = walk_files(tree)
+    assert next(file_paths) == tree / 'a.nc'
+    file_paths.close()
+
+
+def test_split_file_list():
+    fp = io.StringIO('a.nc\0b c.nc\0\0d\n.nc')
+    assert list(split_file_list(fp, '\0')) == ['a.nc', 'b c.nc', '', 'd\n.nc']
+
+
+@pytest.mark.parametrize('null', [False, True])
+def test_read_files(tree, null):
+    separator = '\0' if null else '\n'
+    files = [
+        'h08/historical/dis/h08_historical_dis_1850_1900.nc',
+        str(tree / 'lpjml/ssp126/qtot/lpjml_ssp126_qtot_1901_2014.nc'),
+        'h08/historical/dis/README.txt',
+        'h08/picontrol/dis/h08_picontrol_dis_1850_1900.nc',
+        'h08/historical/dis/h08_historical_dis_1850_1900.nc',
+        'h08/historical',
+        'h08/missing.nc',
+        '../outside.nc',
+        ''
+    ]
+    files_from = tree.parent / 'files.txt'
+    files_from.write_text(separator.join(files))
+
+    file_paths = list(read_files(files_from, tree, null=null, exclude=['picontrol'], suffixes=['.nc']))
+
+    assert file_paths == [
+        tree / 'h08/historical/dis/h08_historical_dis_1850_1900.nc',
+        tree / 'lpjml/ssp126/qtot/lpjml_ssp126_qtot_1901_2014.nc'
+    ]
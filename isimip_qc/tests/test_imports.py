@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+# match a file with --match-only in a fresh interpreter and report which heavy modules were loaded
+SCRIPT = '''
+import re
+import sys
+import time
+from pathlib import Path
+
+start = time.perf_counter()
+
+from isimip_qc.checks import checks
+from isimip_qc.config import settings
+from isimip_qc.main import run_checks
+from isimip_qc.models import File
+
+settings.from_dict({'UNCHECKED_PATH': Path('{tmp_path}'), 'MATCH_ONLY': True, 'NO_CACHE': True})
+settings.__dict__['PATTERN'] = {'file': re.compile(r'^(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)[.]nc$')}
+settings.__dict__['SCHEMA'] = {}
+
+file = File(Path('{tmp_path}') / 'h08_dis.nc')
+status = run_checks(file, checks)
+
+print(status, file.specifiers['model'], file.specifiers['variable'])
+print(time.perf_counter() - start)
+print(' '.join(module for module in ('numpy', 'netCDF4', 'h5py') if module in sys.modules))
+'''
+
+
+def test_match_only_imports(tmp_path):
+    (tmp_path / 'h08_dis.nc').write_bytes(b'')
+
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT.replace('{tmp_path}', str(tmp_path))], text=True)
+    result, seconds, modules = output.split('\n')[:3]
+
+    assert result == 'matched h08 dis'
+    assert float(seconds) < 5  # generous, only guards against pathological regressions
+    assert modules == ''
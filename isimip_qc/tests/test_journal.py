@@ -0,0 +1,43 @@
+import json
+
+from ..config import settings
+from ..utils.journal import read_journal, resume_files
+
+
+def test_resume_files(tmp_path):
+    unchecked_path, checked_path = tmp_path / 'unchecked', tmp_path / 'checked'
+    unchecked_path.mkdir()
+    checked_path.mkdir()
+
+    file_paths = []
+    for name in ['a.nc', 'b.nc', 'c.nc', 'd.nc', 'e.nc']:
+        file_path = unchecked_path / name
+        file_path.write_bytes(b'data')
+        file_paths.append(file_path)
+
+    journal_path = tmp_path / 'journal.jsonl'
+    settings.from_dict({'journal': journal_path, 'unchecked_path': unchecked_path, 'checked_path': checked_path})
+
+    stat = file_paths[0].stat()
+    entries = [
+        {'path': 'a.nc', 'status': 'checked', 'actions': [], 'size': stat.st_size, 'mtime': stat.st_mtime_ns},
+        # b.nc has changed since it was completed
+        {'path': 'b.nc', 'status': 'checked', 'actions': [], 'size': 1, 'mtime': stat.st_mtime_ns},
+        # the copy of c.nc was interrupted and left a partial target
+        {'path': 'c.nc', 'action': 'copy', 'target_existed': False},
+        # the move of f.nc was interrupted after the file arrived at the target
+        {'path': 'f.nc', 'action': 'move', 'target_existed': False}
+    ]
+    # the last line of the killed run is incomplete
+    journal_path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries) + '{"path": "d.n')
+
+    (checked_path / 'c.nc').write_bytes(b'da')
+    (checked_path / '.c.nc.123').write_bytes(b'd')
+    (checked_path / 'f.nc').write_bytes(b'data')
+
+    assert list(resume_files(file_paths, unchecked_path, journal_path)) == file_paths[1:]
+    assert sorted(path.name for path in checked_path.iterdir()) == ['f.nc']
+
+    done, pending = read_journal(journal_path)
+    assert sorted(done) == ['a.nc', 'b.nc', 'f.nc']
+    assert list(pending) == ['c.nc']
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from ..utils.layout import analyze_layout, get_access, read_chunk_sizes, time_reads
+
+
+@pytest.mark.parametrize('chunk_shape,time_slice,time_series', [
+    # chunked per time step
+    ((1, 360, 720), (1, 1.0), (3650, 360 * 720)),
+    # chunked as time series
+    ((3650, 1, 1), (360 * 720, 3650), (1, 1.0)),
+    # chunked in blocks, which do not divide the dimensions
+    ((365, 50, 50), (8 * 15, 365 * 2500 * 120 / (360 * 720)), (10, 365 * 2500 * 10 / 3650)),
+])
+def test_get_access(chunk_shape, time_slice, time_series):
+    shape = (3650, 360, 720)
+    assert get_access(chunk_shape, (1, *shape[1:]))[:2] == pytest.approx(time_slice)
+    assert get_access(chunk_shape, (shape[0], 1, 1))[:2] == pytest.approx(time_series)
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    file_path = tmp_path / 'test.nc'
+    with Dataset(file_path, 'w', format='NETCDF4_CLASSIC') as dataset:
+        dataset.createDimension('time', None)
+        dataset.createDimension('lat', 6)
+        dataset.createDimension('lon', 8)
+        variable = dataset.createVariable('var', 'f4', ('time', 'lat', 'lon'), zlib=True, chunksizes=(5, 6, 4))
+        variable[:] = np.zeros((20, 6, 8), dtype='f4')
+    return file_path
+
+
+def test_analyze_layout(file_path):
+    layout = analyze_layout(file_path, 'var', (20, 6, 8), (5, 6, 4), 4)
+
+    assert layout.chunk_shape == (5, 6, 4)
+    assert layout.chunk_size == 5 * 6 * 4 * 4
+    assert layout.chunk_count == 8
+    assert layout.time_slice.chunks == 2
+    assert layout.time_slice.amplification == 5
+    assert layout.time_series.chunks == 4
+    assert layout.time_series.amplification == 6 * 4
+
+    assert all(t >= 0 for t in time_reads(file_path, 'var', (20, 6, 8)))
+
+
+def test_read_chunk_sizes(file_path):
+    pytest.importorskip('h5py')
+
+    sizes = read_chunk_sizes(file_path, 'var')
+    assert len(sizes) == 8
+    assert 0 < sum(sizes) < 20 * 6 * 8 * 4
+
+    # the chunk sizes are not known for files which h5py can not read
+    assert read_chunk_sizes(file_path, 'missing') is None
+
+
+def test_read_chunk_sizes_netcdf3(tmp_path):
+    pytest.importorskip('h5py')
+
+    file_path = tmp_path / 'test.nc'
+    with Dataset(file_path, 'w', format='NETCDF3_CLASSIC') as dataset:
+        dataset.createDimension('time', None)
+        dataset.createVariable('var', 'f4', ('time', ))
+
+    assert read_chunk_sizes(file_path, 'var') is None
@@ -0,0 +1,59 @@
+import numpy as np
+from netCDF4 import Dataset
+
+from ..utils.masks import load_masks
+
+
+def write_mask(path, lat):
+    land = np.zeros((len(lat), 4), dtype=bool)
+    land[1:3, 1:3] = True
+
+    with Dataset(path, 'w') as dataset:
+        dataset.createDimension('lat', len(lat))
+        dataset.createDimension('lon', 4)
+        dataset.createVariable('lat', 'f8', ('lat', ))[:] = lat
+        dataset.createVariable('lon', 'f8', ('lon', ))[:] = [-135, -45, 45, 135]
+        variable = dataset.createVariable('LSM', 'f4', ('lat', 'lon'), fill_value=1e20)
+        variable[:] = np.ma.masked_where(~land, np.ones(land.shape))
+
+    return land
+
+
+def test_load_masks(tmp_path, monkeypatch):
+    land = write_mask(tmp_path / 'mask.nc', [-60, -20, 20, 60])
+    write_mask(tmp_path / 'mask_3x4.nc', [60, 0, -60])
+
+    masks = load_masks((tmp_path / 'mask.nc', tmp_path / 'mask_3x4.nc'), tmp_path / 'cache')
+
+    mask, lat_descending = masks['4x4']
+    assert isinstance(mask, np.memmap)
+    assert mask.tolist() == land.tolist()
+    assert not lat_descending
+    assert masks['3x4'][1]
+
+    # the masks are read from the cache once they were converted
+    def read_mask(mask_file):
+        raise AssertionError('mask read again')
+
+    monkeypatch.setattr('isimip_qc.utils.masks.read_mask', read_mask)
+    load_masks.cache_clear()
+    assert load_masks((tmp_path / 'mask.nc', ), tmp_path / 'cache')['4x4'][0].tolist() == land.tolist()
+
+
+def test_get_mask(tmp_path):
+    from ..api import create_context
+    from ..config import use_context
+    from ..utils.masks import get_mask
+
+    write_mask(tmp_path / 'mask.nc', [-60, -20, 20, 60])
+    context = create_context('ISIMIP3b/OutputData/water_global', unchecked_path=str(tmp_path),
+                             cache_path=tmp_path / 'cache', mask_files=[tmp_path / 'mask.nc'])
+
+    with use_context(context):
+        assert get_mask('4x4', False) is not None
+
+        # a replaced mask file is loaded again
+        (tmp_path / 'mask.nc').unlink()
+        write_mask(tmp_path / 'mask.nc', [-60, 0, 60])
+        assert get_mask('4x4', False) is None
+        assert get_mask('3x4', False) is not None
@@ -0,0 +1,37 @@
+import pytest
+
+from ..utils.prefetch import prefetch_file, prefetch_files, sniff_format
+
+
+def test_sniff_format():
+    assert sniff_format(b'\x89HDF\r\n\x1a\n') == 'HDF5'
+    assert sniff_format(b'CDF\x02\x00\x00\x00\x00') == 'NETCDF3_64BIT_OFFSET'
+    assert sniff_format(b'README') is None
+
+
+def test_prefetch_file(tmp_path):
+    (tmp_path / 'a.nc').write_bytes(b'CDF\x01' + bytes(100))
+    (tmp_path / 'a.txt').write_bytes(bytes(100))
+
+    # only NetCDF and HDF5 files are read ahead
+    assert prefetch_file(tmp_path / 'a.nc', 50) == 104
+    assert prefetch_file(tmp_path / 'a.txt', 50) == 0
+    assert prefetch_file(tmp_path / 'missing.nc', 50) == 0
+
+
+@pytest.mark.parametrize('depth', [1, 3, 10])
+def test_prefetch_files(tmp_path, depth):
+    file_paths = [tmp_path / f'{i}.nc' for i in range(5)]
+    for file_path in file_paths:
+        file_path.write_bytes(b'CDF\x01' + bytes(100))
+
+    # missing files are passed on and reported later
+    file_paths.insert(2, tmp_path / 'missing.nc')
+
+    assert list(prefetch_files(iter(file_paths), depth, readahead=50)) == file_paths
+
+
+def test_prefetch_files_close(tmp_path):
+    file_paths = prefetch_files((tmp_path / f'{i}.nc' for i in range(100)), 2)
+    assert next(file_paths) == tmp_path / '0.nc'
+    file_paths.close()
@@ -0,0 +1,58 @@
+import re
+import time
+
+import pytest
+from isimip_utils.exceptions import NotFound
+
+from ..utils import protocol as protocol_module
+from ..utils.protocol import load_protocol
+
+locations = ['https://protocol.example.org']
+
+protocol = {
+    'definitions': {'commit': 'abc1234', 'variable': {'dis': {'specifier': 'dis'}}},
+    'pattern': {
+        'path': re.compile(r'.*'),
+        'file': re.compile(r'(?P<model>[a-z0-9]+)_(?P<variable>[a-z]+)'),
+        'dataset': re.compile(r'.*'),
+        'suffix': ['.nc'],
+        'specifiers': {},
+        'specifiers_map': {}
+    },
+    'schema': {'type': 'object'}
+}
+
+
+@pytest.fixture
+def fetch(monkeypatch):
+    calls = []
+
+    def fetch_protocol(schema_path, protocol_locations):
+        calls.append(schema_path)
+        return protocol
+
+    monkeypatch.setattr(protocol_module, 'fetch_protocol', fetch_protocol)
+    return calls
+
+
+def test_load_protocol(tmp_path, fetch):
+    assert load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, ttl=24) == protocol
+    assert load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, ttl=24) == protocol
+    assert len(fetch) == 1
+
+
+def test_load_protocol_ttl(tmp_path, fetch, monkeypatch):
+    load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, ttl=1)
+
+    monkeypatch.setattr(time, 'time', lambda: 1e12)
+    load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, ttl=1)
+    assert len(fetch) == 2
+
+
+def test_load_protocol_offline(tmp_path, fetch):
+    with pytest.raises(NotFound):
+        load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, offline=True)
+
+    load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path)
+    assert load_protocol('ISIMIP3b/OutputData/water_global', locations, cache_path=tmp_path, offline=True) == protocol
+    assert len(fetch) == 1
@@ -0,0 +1,338 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from ..utils import scan as scan_module
+from ..utils.scan import (
+    Histogram,
+    MissingCells,
+    NonFinite,
+    Outliers,
+    Slab,
+    StepStatistics,
+    ValidRange,
+    get_fill_values,
+    get_sample_slabs,
+    get_slab_shape,
+    get_slabs,
+    iter_slabs,
+    scan_variable,
+    scan_variable_parallel,
+)
+
+MiB = 1024 * 1024
+
+
+@pytest.mark.parametrize('shape,chunk_shape,memory,slab_shape', [
+    # chunked per time step, the slab contains many time steps
+    ((3650, 360, 720), (1, 360, 720), 256 * MiB, (258, 360, 720)),
+    # chunked as time series, the slab contains complete time series for some latitudes
+    ((3650, 360, 720), (3650, 1, 1), 256 * MiB, (3650, 25, 720)),
+    # chunked in blocks
+    ((3650, 360, 720), (365, 36, 36), 64 * MiB, (365, 36, 720)),
+    # a single chunk exceeds the memory budget
+    ((3650, 360, 720), (3650, 360, 720), 1 * MiB, (3650, 360, 720)),
+    # the whole variable fits into the memory budget
+    ((12, 360, 720), (1, 360, 720), 256 * MiB, (12, 360, 720)),
+    # 3d variable
+    ((3650, 10, 360, 720), (1, 1, 360, 720), 64 * MiB, (6, 10, 360, 720)),
+])
+def test_get_slab_shape(shape, chunk_shape, memory, slab_shape):
+    assert get_slab_shape(shape, chunk_shape, 4, memory) == slab_shape
+
+
+def test_get_slab_shape_chunk_aligned():
+    shape = (3650, 360, 720)
+    chunk_shape = (365, 36, 36)
+    slab_shape = get_slab_shape(shape, chunk_shape, 4, 256 * MiB)
+
+    for size, chunk_size, slab_size in zip(shape, chunk_shape, slab_shape, strict=True):
+        assert slab_size == size or slab_size % chunk_size == 0
+
+
+def test_get_slabs():
+    slabs = list(get_slabs((5, 2, 3), (2, 2, 3)))
+    assert slabs == [
+        (slice(0, 2), slice(0, 2), slice(0, 3)),
+        (slice(2, 4), slice(0, 2), slice(0, 3)),
+        (slice(4, 5), slice(0, 2), slice(0, 3)),
+    ]
+
+
+@pytest.mark.parametrize('fraction,size', [(0.1, 10), (0.25, 25), (0.001, 1), (1, 100)])
+def test_get_sample_slabs(fraction, size):
+    sample = list(get_sample_slabs((100, 6, 8), (1, 6, 8), fraction, seed=42))
+    steps = [slices[0].start for slices in sample]
+
+    # one slab is drawn from each stratum
+    assert len(steps) == size
+    assert all(i * 100 // size <= step < (i + 1) * 100 // size for i, step in enumerate(steps))
+    assert sample == list(get_sample_slabs((100, 6, 8), (1, 6, 8), fraction, seed=42))
+
+
+@pytest.mark.parametrize('largest', [True, False])
+@pytest.mark.parametrize('n', [0, 1, 5, 1000])
+def test_outliers(largest, n):
+    rng = np.random.default_rng(42)
+    data = rng.normal(size=(10, 4, 6)).astype('f4')
+    cond = data > 1 if largest else data < -1
+
+    # update the outliers slab by slab
+    outliers = Outliers(n, largest)
+    for t in range(0, 10, 3):
+        outliers.update(data[t:t + 3], cond[t:t + 3], np.array([t, 0, 0]))
+
+    # compare with the outliers computed for all values at once
+    expected = sorted(((float(data[idx]), idx) for idx in zip(*np.nonzero(cond), strict=True)), reverse=largest)[:n]
+
+    values, indices = outliers.sorted()
+    assert outliers.count == np.count_nonzero(cond)
+    assert values.tolist() == [value for value, _ in expected]
+    assert [tuple(index) for index in indices.tolist()] == [tuple(int(i) for i in idx) for _, idx in expected]
+
+
+@pytest.fixture
+def variable(tmp_path):
+    rng = np.random.default_rng(42)
+    data = np.ma.masked_array(rng.uniform(0, 10, size=(20, 6, 8)).astype('f4'))
+    data[:, 0, :] = np.ma.masked  # "ocean"
+    data[3] = np.ma.masked        # all missing
+    data[5, 1:] = 2.5             # constant
+    data[7, 2, 2] = np.nan
+    data[8, 3, 3] = np.inf
+
+    dataset = Dataset(tmp_path / 'test.nc', 'w', format='NETCDF4_CLASSIC', diskless=True)
+    dataset.createDimension('time', None)
+    dataset.createDimension('lat', 6)
+    dataset.createDimension('lon', 8)
+    variable = dataset.createVariable('var', 'f4', ('time', 'lat', 'lon'), fill_value=np.float32(1e20),
+                                      chunksizes=(4, 3, 8))
+    variable[:] = data
+    yield variable, data
+    dataset.close()
+
+
+def get_accumulators(shape):
+    return {
+        'range': ValidRange(1, 9, 3),
+        'non_finite': NonFinite(),
+        'steps': StepStatistics(shape),
+        'missing': MissingCells(shape)
+    }
+
+
+def test_scan_variable(variable):
+    variable, data = variable
+
+    # use a small memory budget to read many slabs
+    scan = scan_variable(variable, get_accumulators(variable.shape), 4 * 6 * 8 * 4)
+
+    assert scan['range'].low.count == np.count_nonzero((data < 1).filled(False))
+    assert scan['range'].high.count == np.count_nonzero((data > 9).filled(False))
+    assert scan['non_finite'].nan == 1
+    assert scan['non_finite'].inf == 1
+
+    steps = scan['steps']
+    finite = np.ma.masked_invalid(data)
+    assert steps.missing_steps.tolist() == [3]
+    assert steps.constant_steps.tolist() == [5]
+    assert steps.count.tolist() == finite.count(axis=(1, 2)).tolist()
+    assert np.allclose(steps.max[steps.count > 0], finite.max(axis=(1, 2)).compressed())
+    assert np.allclose(steps.mean[steps.count > 0], finite.mean(axis=(1, 2)).compressed())
+    assert np.allclose(steps.masked_fraction, np.ma.getmaskarray(data).mean(axis=(1, 2)))
+
+    missing = scan['missing']
+    assert missing.count.tolist() == (~np.isfinite(finite.filled(np.nan))).sum(axis=0).tolist()
+    assert missing.all_missing[0].all()
+    assert missing.some_missing[2, 2]
+
+
+def test_scan_variable_merge(variable):
+    variable, _ = variable
+
+    scan = scan_variable(variable, get_accumulators(variable.shape), 1024 * 1024)
+
+    # scan the first and the second half of the time steps separately and merge the results
+    merged = get_accumulators(variable.shape)
+    for slices in [(slice(0, 12), slice(0, 6), slice(0, 8)), (slice(12, 20), slice(0, 6), slice(0, 8))]:
+        accumulators = get_accumulators(variable.shape)
+        slab = Slab(slices, variable[slices])
+        for accumulator in accumulators.values():
+            accumulator.update(slab)
+        for key, accumulator in merged.items():
+            accumulator.merge(accumulators[key])
+
+    for outliers, merged_outliers in [(scan['range'].low, merged['range'].low),
+                                      (scan['range'].high, merged['range'].high)]:
+        assert outliers.count == merged_outliers.count
+        assert outliers.sorted()[0].tolist() == merged_outliers.sorted()[0].tolist()
+
+    assert scan['non_finite'].nan == merged['non_finite'].nan
+    assert np.array_equal(scan['missing'].count, merged['missing'].count)
+    for key in ('min', 'max', 'sum', 'count', 'masked'):
+        assert np.array_equal(getattr(scan['steps'], key), getattr(merged['steps'], key))
+
+
+class Size:
+
+    def __init__(self):
+        self.size = 0
+
+    def update(self, slab):
+        self.size += slab.data.size
+
+
+def test_scan_variable_sample(variable):
+    variable, _ = variable
+
+    # the whole variable is read for a sample of 100%
+    scan = scan_variable(variable, get_accumulators(variable.shape), 1024 * 1024)
+    sample = scan_variable(variable, get_accumulators(variable.shape), 1024 * 1024, sample=1)
+    assert np.array_equal(scan['steps'].count, sample['steps'].count)
+    assert scan['range'].high.count == sample['range'].high.count
+
+    # otherwise the sample is drawn from single chunks of 4 * 3 * 8 values, 3 of the 10 chunks are read
+    sample = scan_variable(variable, {'size': Size()}, 1024 * 1024, sample=0.25, seed=42)
+    assert sample['size'].size == 3 * 4 * 3 * 8
+
+
+def test_scan_variable_parallel(tmp_path):
+    rng = np.random.default_rng(42)
+    data = rng.uniform(0, 10, size=(20, 6, 8)).astype('f4')
+    data[2:9, 1, 1] = 10.5  # equal outliers in several parts
+    data[4, 2, 2] = np.nan
+
+    with Dataset(tmp_path / 'test.nc', 'w', format='NETCDF4_CLASSIC') as dataset:
+        dataset.createDimension('time', None)
+        dataset.createDimension('lat', 6)
+        dataset.createDimension('lon', 8)
+        dataset.createVariable('var', 'f4', ('time', 'lat', 'lon'), chunksizes=(1, 6, 8))[:] = data
+
+    with Dataset(tmp_path / 'test.nc') as dataset:
+        variable = dataset.variables['var']
+        scan = scan_variable(variable, get_accumulators(variable.shape), 2 * 6 * 8 * 4)
+        parallel = scan_variable_parallel(tmp_path / 'test.nc', variable, get_accumulators(variable.shape),
+                                          2 * 6 * 8 * 4, jobs=3)
+
+    for key in ('low', 'high'):
+        outliers, parallel_outliers = getattr(scan['range'], key), getattr(parallel['range'], key)
+        assert outliers.count == parallel_outliers.count
+        for array, parallel_array in zip(outliers.sorted(), parallel_outliers.sorted(), strict=True):
+            assert array.tolist() == parallel_array.tolist()
+
+    assert parallel['non_finite'].nan == 1
+    assert np.array_equal(scan['missing'].count, parallel['missing'].count)
+    for key in ('min', 'max', 'sum', 'count', 'masked'):
+        assert np.array_equal(getattr(scan['steps'], key), getattr(parallel['steps'], key))
+
+
+def test_get_fill_values(tmp_path):
+    with Dataset(tmp_path / 'test.nc', 'w', diskless=True) as dataset:
+        dataset.createDimension('time', 2)
+        variable = dataset.createVariable('var', 'f4', ('time', ), fill_value=np.float32(1e20))
+        variable.missing_value = np.float32(-999)
+        assert get_fill_values(variable) == (np.float32(1e20), np.float32(-999))
+
+        # the default fill value is masked by netCDF4 if no _FillValue is set
+        variable = dataset.createVariable('default', 'f4', ('time', ))
+        assert get_fill_values(variable) == (np.float32(9.96921e+36), )
+
+        # other masking or packing is left to netCDF4
+        variable = dataset.createVariable('packed', 'f4', ('time', ))
+        variable.scale_factor = 2.0
+        assert get_fill_values(variable) is None
+
+        variable = dataset.createVariable('nan', 'f4', ('time', ), fill_value=np.float32(np.nan))
+        assert get_fill_values(variable) is None
+
+
+def test_scan_variable_raw(variable, monkeypatch):
+    variable, _ = variable
+
+    scan = scan_variable(variable, get_accumulators(variable.shape), 4 * 6 * 8 * 4)
+    assert variable.mask
+
+    # read the masked arrays of netCDF4 instead of the raw data
+    monkeypatch.setattr(scan_module, 'get_fill_values', lambda variable: None)
+    masked = scan_variable(variable, get_accumulators(variable.shape), 4 * 6 * 8 * 4)
+
+    for key in ('low', 'high'):
+        outliers, masked_outliers = getattr(scan['range'], key), getattr(masked['range'], key)
+        assert outliers.count == masked_outliers.count
+        for array, masked_array in zip(outliers.sorted(), masked_outliers.sorted(), strict=True):
+            assert array.tolist() == masked_array.tolist()
+
+    assert (scan['non_finite'].nan, scan['non_finite'].inf) == (masked['non_finite'].nan, masked['non_finite'].inf)
+    assert np.array_equal(scan['missing'].count, masked['missing'].count)
+    for key in ('min', 'max', 'sum', 'count', 'masked'):
+        assert np.array_equal(getattr(scan['steps'], key), getattr(masked['steps'], key))
+
+
+def test_scan_variable_memory(tmp_path):
+    # benchmark the memory which is allocated per slab
+    rng = np.random.default_rng(42)
+    data = rng.uniform(1, 9, size=(80, 90, 180)).astype('f4')
+    data[:, :20] = 1e20
+    data[::10, 50, ::10] = 10
+
+    dataset = Dataset(tmp_path / 'test.nc', 'w', diskless=True)
+    dataset.createDimension('time', None)
+    dataset.createDimension('lat', 90)
+    dataset.createDimension('lon', 180)
+    variable = dataset.createVariable('var', 'f4', ('time', 'lat', 'lon'), fill_value=np.float32(1e20),
+                                      chunksizes=(1, 90, 180))
+    variable[:] = data
+
+    slab_size = 20 * 90 * 180 * 4
+    accumulators = get_accumulators(variable.shape)
+
+    tracemalloc.start()
+    try:
+        peak = 0
+        for slab in iter_slabs(variable, slab_size):
+            # memory allocated by the accumulators, besides the data and the masks of the slab
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for accumulator in accumulators.values():
+                accumulator.update(slab)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+            del slab
+
+        # the data is read once (netCDF4 uses a second array while reading) and the masks use
+        # one byte per value each, so at most three times the slab is allocated at once
+        tracemalloc.reset_peak()
+        scan_variable(variable, get_accumulators(variable.shape), slab_size)
+        total_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        dataset.close()
+
+    assert peak < 0.25 * slab_size
+    assert total_peak < 3.25 * slab_size
+
+
+def test_histogram():
+    rng = np.random.default_rng(42)
+    data = np.ma.masked_array(rng.lognormal(0, 3, size=(20, 6, 8)).astype('f4'))
+    data[:, 0] = np.ma.masked
+    data[1] = 0
+    data[2, 2, 2] = np.nan
+
+    histogram = Histogram()
+    for t in range(0, 20, 5):
+        histogram.update(Slab((slice(t, t + 5), slice(0, 6), slice(0, 8)), data[t:t + 5]))
+
+    values = np.ma.masked_invalid(data).compressed()
+    assert histogram.zeros == np.count_nonzero(values == 0)
+    assert histogram.counts.sum() == np.count_nonzero(values)
+
+    # the percentiles are estimated with a relative error of at most half a bin
+    for q in (10, 50, 90):
+        assert abs(np.log10(histogram.percentile(q) / np.percentile(values[values > 0], q))) <= 0.05 + 1e-6
+
+    histogram.merge(Histogram.from_dict(histogram.to_dict()))
+    assert histogram.zeros == 2 * np.count_nonzero(values == 0)
+    assert histogram.counts.sum() == 2 * np.count_nonzero(values)
+    assert Histogram().percentile(50) is None
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+from ..service import is_loopback, parse_request
+
+
+def test_parse_request():
+    path, schema_path, options = parse_request({
+        'path': 'h08/h08_dis.nc',
+        'options': {'minmax': 5, 'scan_memory': 64}
+    }, default_schema_path='ISIMIP3b/OutputData/water_global')
+
+    assert path == 'h08/h08_dis.nc'
+    assert schema_path == Path('ISIMIP3b/OutputData/water_global')
+    assert options == {'minmax': 5, 'scan_memory': 64}
+
+
+@pytest.mark.parametrize('request_data', [
+    [],
+    {'schema_path': 'ISIMIP3b/OutputData/water_global'},
+    {'path': 'h08_dis.nc'},
+    {'path': 'h08_dis.nc', 'schema_path': '/ISIMIP3b/OutputData/water_global'},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'fix': True}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'minmax': True}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'unchecked_path': '/'}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'mask_files': ['m.nc']}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'minmax': 10 ** 9}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'minmax_sample': 0.0}},
+    {'path': 'h08_dis.nc', 'schema_path': 'ISIMIP3b/OutputData/water_global', 'options': {'scan_memory': 0}}
+])
+def test_parse_request_invalid(request_data):
+    with pytest.raises(ValueError):
+        parse_request(request_data)
+
+
+@pytest.mark.parametrize('host,loopback', [
+    ('127.0.0.1', True),
+    ('::1', True),
+    ('localhost', True),
+    ('0.0.0.0', False),
+    ('192.0.2.1', False)
+])
+def test_is_loopback(host, loopback):
+    assert is_loopback(host) == loopback
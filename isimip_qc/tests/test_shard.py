@@ -0,0 +1,33 @@
+import pytest
+
+from ..utils.shard import shard_files
+
+
+@pytest.mark.parametrize('by', ['hash', 'size'])
+def test_shard_files(tmp_path, by):
+    file_paths = []
+    for i in range(20):
+        file_path = tmp_path / f'file_{i:02d}.nc'
+        file_path.write_bytes(bytes(100 * i))
+        file_paths.append(file_path)
+
+    shards = [list(shard_files(file_paths, tmp_path, shard, 3, by=by)) for shard in range(1, 4)]
+
+    # every file is in exactly one shard, and the order of the files is kept
+    assert sorted(file_path for shard in shards for file_path in shard) == file_paths
+    assert all(shard == sorted(shard) for shard in shards)
+
+    # the files are split the same way on every run
+    assert list(shard_files(file_paths, tmp_path, 2, 3, by=by)) == shards[1]
+
+
+def test_shard_files_by_size(tmp_path):
+    file_paths = []
+    for i, size in enumerate([900, 100, 500, 400, 300, 200, 600]):
+        file_path = tmp_path / f'file_{i}.nc'
+        file_path.write_bytes(bytes(size))
+        file_paths.append(file_path)
+
+    sizes = [sum(file_path.stat().st_size for file_path in shard_files(file_paths, tmp_path, shard, 2, by='size'))
+             for shard in (1, 2)]
+    assert sorted(sizes) == [1500, 1500]
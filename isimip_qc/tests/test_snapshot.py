@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from ..utils.snapshot import read_snapshot
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    dataset = Dataset(tmp_path / 'test.nc', 'w', format='NETCDF4_CLASSIC', diskless=True)
+    dataset.createDimension('time', None)
+    dataset.createDimension('lat', 3)
+    dataset.createDimension('lon', 4)
+    variable = dataset.createVariable('dis', 'f4', ('time', 'lat', 'lon'), fill_value=np.float32(1e20),
+                                      zlib=True, complevel=5, chunksizes=(1, 3, 4))
+    variable.units = 'm3 s-1'
+    dataset.contact = 'John Doe <john@example.com>'
+    yield dataset
+    dataset.close()
+
+
+def test_read_snapshot(dataset):
+    snapshot = read_snapshot(dataset)
+
+    assert snapshot.data_model == 'NETCDF4_CLASSIC'
+    assert snapshot.dimensions == {'time': 0, 'lat': 3, 'lon': 4}
+    assert snapshot.attrs == {'contact': 'John Doe <john@example.com>'}
+
+    variable = snapshot.variables['dis']
+    assert variable.dtype == np.dtype('float32')
+    assert variable.dimensions == ('time', 'lat', 'lon')
+    assert variable.chunking == (1, 3, 4)
+    assert variable.filters['complevel'] == 5
+    assert variable.attrs['units'] == 'm3 s-1'
+    assert '_FillValue' in variable.attrs
+
+
+def test_read_snapshot_immutable(dataset):
+    snapshot = read_snapshot(dataset)
+
+    with pytest.raises(TypeError):
+        snapshot.attrs['contact'] = 'Jane Doe <jane@example.com>'
+
+    with pytest.raises(TypeError):
+        snapshot.variables['dis'].attrs['units'] = 'm'
+
+    with pytest.raises(AttributeError):
+        snapshot.variables['dis'].dtype = np.dtype('float64')
+
+
+def test_read_snapshot_json(dataset):
+    assert read_snapshot(dataset).json['variables']['dis']['dimensions'] == ['time', 'lat', 'lon']
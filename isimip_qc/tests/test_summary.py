@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+from ..models import Summary
+
+
+def test_merge():
+    summary = Summary()
+    summary.update_specifiers({'model': 'h08', 'variable': 'dis'})
+
+    other = Summary()
+    other.update_specifiers({'model': 'h08', 'variable': 'qtot'})
+    other.variables['qtot'] = {'specifier': 'qtot', 'sectors': ['water_global'], 'count': 1}
+    other.experiments['historical_histsoc'] += 2
+
+    summary.merge(other)
+    summary.merge(other)
+
+    assert summary.specifiers['model'] == {'h08': 3}
+    assert summary.specifiers['variable'] == {'dis': 1, 'qtot': 2}
+    assert summary.variables['qtot']['count'] == 2
+    assert summary.experiments == {'historical_histsoc': 4}
+
+    # the merged summary must not share state with the other summary
+    assert other.variables['qtot']['count'] == 1
+
+
+def test_to_dict():
+    from ..utils.completeness import SpecifierIndex
+    from ..utils.continuity import get_time_index_entry
+    from ..utils.scan import Histogram
+
+    summary = Summary()
+    summary.update_specifiers({'model': 'h08', 'variable': 'dis', 'start_year': 1850})
+    summary.experiments['historical_histsoc'] += 1
+    summary.time_index.append(get_time_index_entry('dis_1850_1850.nc', {
+        'model': 'h08', 'variable': 'dis', 'time_step': 'daily', 'start_year': 1850, 'end_year': 1850
+    }, {'calendar': 'standard', 'first': [1850, 1, 1], 'last': [1850, 12, 31]}))
+    summary.index = SpecifierIndex()
+    summary.index.add({'model': 'h08', 'variable': 'dis', 'experiment': 'historical', 'period': 'historical'})
+    summary.index.add({'model': 'h08', 'variable': 'qtot'})
+    summary.experiment_periods = [('historical', 'historical')]
+    summary.files.append({'path': 'dis_1850_1850.nc', 'status': 'checked', 'records': [['warning', 'Warning.']]})
+    summary.distributions['dis'] = Histogram()
+    summary.distributions['dis'].counts[10] = 5
+
+    other = Summary.from_dict(json.loads(json.dumps(summary.to_dict())))
+
+    assert other.specifiers == summary.specifiers
+    assert other.specifiers['start_year'] == {1850: 1}
+    assert other.experiments == summary.experiments
+    assert other.time_index == summary.time_index
+    assert other.experiment_periods == summary.experiment_periods
+    assert other.files == summary.files
+    assert other.distributions['dis'].counts.tolist() == summary.distributions['dis'].counts.tolist()
+    assert len(other.index) == 2
+    assert other.index.get_array(['model', 'variable']).tolist() == \
+        summary.index.get_array(['model', 'variable']).tolist()
+    assert other.index.decode('variable', 2) == 'qtot'
+
+
+def test_update_files():
+    file = SimpleNamespace(path='dis_1850_1850.nc', records=[
+        ('info', 'Info.', None), ('warning', 'Warning.', None), ('error', 'Error.', None)
+    ])
+
+    # only the warnings and errors are kept
+    summary = Summary()
+    summary.update_files(file, 'checked')
+    assert summary.files == [{'path': 'dis_1850_1850.nc', 'status': 'checked',
+                              'records': [['warning', 'Warning.'], ['error', 'Error.']]}]
+
+
+def test_update_distributions():
+    from ..utils.scan import Histogram
+
+    def get_file(distribution_mismatch):
+        histogram = Histogram()
+        histogram.counts[10] = 1
+        return SimpleNamespace(specifiers={'variable': 'dis'}, has_errors=False,
+                               distribution_mismatch=distribution_mismatch, scan={
+                                   'non_finite': SimpleNamespace(nan=0, inf=0),
+                                   'histogram': histogram
+                               })
+
+    # files whose magnitudes differ from the reference are not added to the new reference
+    summary = Summary()
+    summary.update_distributions(get_file(False), 'checked')
+    summary.update_distributions(get_file(True), 'checked')
+    summary.update_distributions(get_file(False), 'critical')
+    assert summary.distributions['dis'].counts.sum() == 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from ..utils.timeaxis import get_time_bounds, validate_time_axis
+
+UNITS = 'days since 1601-01-01 00:00:00'
+
+
+@pytest.mark.parametrize('calendar,n_days', [
+    ('proleptic_gregorian', 365 + 366 + 365),
+    ('365_day', 3 * 365),
+    ('366_day', 3 * 366),
+    ('360_day', 3 * 360)
+])
+def test_get_time_bounds_daily(calendar, n_days):
+    bounds = get_time_bounds(calendar, UNITS, 1851, 1853, 'daily')
+    assert len(bounds) == n_days + 1
+    assert np.all(np.diff(bounds) == 1)
+
+
+def test_get_time_bounds_monthly():
+    bounds = get_time_bounds('proleptic_gregorian', UNITS, 1852, 1852, 'monthly')
+    assert len(bounds) == 13
+    assert np.diff(bounds)[1] == 29  # 1852 is a leap year
+
+
+def test_get_time_bounds_cached():
+    bounds = get_time_bounds('365_day', UNITS, 1850, 2014, 'annual')
+    assert get_time_bounds('365_day', UNITS, 1850, 2014, 'annual') is bounds
+    assert not bounds.flags.writeable
+
+
+def test_validate_time_axis():
+    bounds = get_time_bounds('proleptic_gregorian', UNITS, 1850, 1850, 'daily')
+    problems = validate_time_axis(bounds[:-1] + 0.5, bounds)
+    assert not any(getattr(problems, key).size for key in ('decreasing', 'duplicates', 'outside', 'missing',
+                                                           'multiple'))
+    assert problems.offset_spread == 0
+
+
+def test_validate_time_axis_problems():
+    bounds = get_time_bounds('proleptic_gregorian', UNITS, 1850, 1850, 'monthly')
+    values = bounds[:-1] + 14
+
+    values = np.delete(values, 5)                # June is missing
+    values = np.insert(values, 2, values[2])     # March is duplicated
+    values[[7, 8]] = values[[8, 7]]              # August and July are swapped
+    values = np.append(values, bounds[-1] + 14)  # January of the next year
+    values[10] = values[9] + 1                   # two different values in October
+
+    problems = validate_time_axis(values, bounds)
+    assert problems.decreasing.tolist() == [7]
+    assert problems.duplicates.tolist() == [2]
+    assert problems.outside.tolist() == [12]
+    assert problems.missing.tolist() == [5, 10]
+    assert problems.multiple.tolist() == [9]
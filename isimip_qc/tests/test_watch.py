@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+from ..utils.watch import watch_files
+
+
+@pytest.mark.parametrize('poll', [
+    True,
+    pytest.param(False, marks=pytest.mark.skipif(not sys.platform.startswith('linux'), reason='needs inotify'))
+])
+def test_watch_files(tmp_path, poll):
+    (tmp_path / 'a.nc').write_bytes(b'a')
+    (tmp_path / '.a.nc.tmp').write_bytes(b'a')
+
+    file_paths = watch_files(tmp_path, suffixes=['.nc'], settle=0.1, poll=poll, interval=0.05)
+
+    # files which are present when the watch starts are yielded as well
+    assert next(file_paths) == tmp_path / 'a.nc'
+
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'b.nc').write_bytes(b'b')
+    assert next(file_paths) == tmp_path / 'sub' / 'b.nc'
+
+    # files which were changed after the check are yielded again
+    (tmp_path / 'a.nc').write_bytes(b'aa')
+    assert next(file_paths) == tmp_path / 'a.nc'
+
+    # files which were removed are yielded again when they are created again, even if they are unchanged
+    stat = (tmp_path / 'a.nc').stat()
+    (tmp_path / 'c.nc').write_bytes(b'c')
+    assert next(file_paths) == tmp_path / 'c.nc'
+
+    (tmp_path / 'a.nc').unlink()
+    (tmp_path / 'd.nc').write_bytes(b'd')
+    assert next(file_paths) == tmp_path / 'd.nc'
+
+    (tmp_path / 'a.nc').write_bytes(b'aa')
+    os.utime(tmp_path / 'a.nc', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert next(file_paths) == tmp_path / 'a.nc'
+
+    file_paths.close()
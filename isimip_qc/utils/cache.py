@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from .. import VERSION
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# options which change the outcome of the checks
+CACHE_OPTIONS = ('CHECK', 'IGNORE_CRIT', 'MASK_FILES', 'MATCH_ONLY', 'MINMAX', 'MINMAX_SAMPLE', 'REFERENCES',
+                 'SKIP_EXP', 'TIME_SPAN')
+
+# options with files which change the outcome of the checks when their content changes
+CACHE_FILE_OPTIONS = ('MASK_FILES', 'REFERENCES')
+
+# only the results of completed checks are stored, e.g. unreadable files might only be incomplete
+CACHE_STATUSES = ('checked', 'critical', 'unmatched')
+
+# version of the layout of the results table, older tables are removed
+CACHE_VERSION = 1
+
+# every thread of every (worker) process needs its own connection
+_local = threading.local()
+
+
+def get_connection():
+    cache_path = settings.CACHE_PATH
+    key = (os.getpid(), str(cache_path))
+
+    if getattr(_local, 'key', None) != key:
+        cache_path.mkdir(parents=True, exist_ok=True)
+
+        _local.connection = sqlite3.connect(cache_path / 'results.sqlite', timeout=60)
+        _local.connection.execute('PRAGMA journal_mode=WAL')
+        with _local.connection:
+            if _local.connection.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+                _local.connection.execute('DROP TABLE IF EXISTS results')
+                _local.connection.execute(f'PRAGMA user_version = {CACHE_VERSION}')
+
+            # the same relative path can be checked below different roots, and with different protocols
+            _local.connection.execute('CREATE TABLE IF NOT EXISTS results (path TEXT, root TEXT, schema_path TEXT,'
+                                      ' protocol TEXT, key TEXT, result TEXT,'
+                                      ' PRIMARY KEY (path, root, schema_path, protocol))')
+        _local.key = key
+
+    return _local.connection
+
+
+def clear_cache():
+    connection = get_connection()
+    with connection:
+        connection.execute('DELETE FROM results')
+
+
+def get_file_hash(path):
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        while chunk := fp.read(1024 * 1024):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_file_stat(path):
+    try:
+        stat = path.expanduser().stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def get_option_files():
+    paths = []
+    for option in CACHE_FILE_OPTIONS:
+        value = settings.to_dict().get(option)
+        if isinstance(value, list | tuple):
+            paths += value
+        elif value:
+            paths.append(value)
+    return {str(path): get_file_stat(path) for path in paths}
+
+
+def get_cache_key(file):
+    stat = file.abs_path.stat()
+    key = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'hash': get_file_hash(file.abs_path) if settings.CACHE_HASH else None,
+        'schema_path': str(settings.SCHEMA_PATH),
+        'protocol': settings.PROTOCOL_VERSION,
+        'version': VERSION,
+        'options': {option: settings.to_dict().get(option) for option in CACHE_OPTIONS},
+        'files': get_option_files()
+    }
+    return json.dumps(key, sort_keys=True, default=str)
+
+
+def get_row_key(file):
+    return (str(file.path), os.path.abspath(settings.UNCHECKED_PATH), str(settings.SCHEMA_PATH),
+            settings.PROTOCOL_VERSION)
+
+
+def get_cached_result(file):
+    '''
+    Replay the recorded messages of an unchanged file and return the recorded status,
+    or return None if the file needs to be checked.
+    '''
+    # the distributions for the references are only computed when the data is read, and
+    # the timings of the layout analysis are only valid for this run
+    if settings.NO_CACHE or settings.UPDATE_REFERENCES or settings.ANALYZE_LAYOUT:
+        return
+
+    try:
+        file.cache_key = get_cache_key(file)
+    except OSError:
+        return
+
+    row = get_connection().execute('SELECT key, result FROM results WHERE path = ? AND root = ? AND schema_path = ?'
+                                   ' AND protocol = ?', get_row_key(file)).fetchone()
+    if row is None or row[0] != file.cache_key:
+        return
+
+    result = json.loads(row[1])
+
+    # the fixes can not be stored, so the file needs to be checked again to apply them
+    if result['fixable'] and settings.FIX:
+        return
+
+    logger.debug('Replay cached result for %s', file.path)
+    if file.logger is not None:
+        file.logger.info('File is unchanged, replay the result of the last check from the cache.')
+
+    file.matched = result['matched']
+    file.specifiers = result['specifiers']
+    file.time_axis = result.get('time_axis')
+    for method, message, fix_datamodel in result['records']:
+        if method == 'warning':
+            file.warning('%s', message, fix_datamodel=fix_datamodel)
+        else:
+            getattr(file, method)('%s', message)
+
+    return result['status']
+
+
+def store_result(file, status):
+    if settings.NO_CACHE or file.cache_key is None or status not in CACHE_STATUSES:
+        return
+
+    result = {
+        'status': status,
+        'matched': file.matched,
+        'specifiers': file.specifiers,
+        'time_axis': file.time_axis,
+        'records': file.records,
+        'fixable': any(fix for _, fix in file.infos) or any(fix for _, fix, _ in file.warnings)
+    }
+
+    connection = get_connection()
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO results (path, root, schema_path, protocol, key, result)'
+                           ' VALUES (?, ?, ?, ?, ?, ?)', (*get_row_key(file), file.cache_key,
+                                                          json.dumps(result, default=str)))
@@ -11,3 +11,14 @@ def parse_schema_path(path):
     if path.is_absolute():
         raise argparse.ArgumentTypeError('must not be an absolute path.')
     return path
+
+
+def parse_shard(shard):
+    match = re.match(r'^(\d+)/(\d+)$', shard)
+    if not match:
+        raise argparse.ArgumentTypeError('must be given as i/N, e.g. 1/4.')
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError('i needs to be between 1 and N.')
+    return index, count
@@ -0,0 +1,170 @@
+import base64
+from array import array
+from typing import NamedTuple
+
+import numpy as np
+
+# identifiers which are determined by the experiment and the period, or by the experiment itself
+EXPERIMENT_IDENTIFIERS = ('experiment', 'period', 'climate_scenario', 'soc_scenario', 'sens_scenario',
+                          'start_year', 'end_year')
+
+
+class Missing(NamedTuple):
+    model: str
+    climate_forcing: str
+    experiment: str
+    period: str
+    variants: list   # missing variants (variable, time_step, ...) as dicts, empty if all are missing
+
+
+class SpecifierIndex:
+    '''
+    Index of the specifiers of all matched files. Every distinct value of a specifier is stored once, and the
+    files are stored as integer codes in one compact array per identifier, so that millions of files only need
+    a few bytes each. Code 0 is used for files without this specifier.
+    '''
+
+    def __init__(self):
+        self.size = 0
+        self.values = {}   # identifier -> list of values, indexed by code
+        self.codes = {}    # identifier -> dict of value -> code
+        self.columns = {}  # identifier -> array of codes, one per file
+
+    def __len__(self):
+        return self.size
+
+    def add_identifier(self, identifier):
+        self.values[identifier] = [None]
+        self.codes[identifier] = {None: 0}
+        self.columns[identifier] = array('I', bytes(4 * self.size))
+
+    def encode(self, identifier, value):
+        codes = self.codes[identifier]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[identifier])
+            self.values[identifier].append(value)
+        return code
+
+    def decode(self, identifier, code):
+        return self.values.get(identifier, [None])[code]
+
+    def add(self, specifiers):
+        for identifier in specifiers:
+            if identifier not in self.columns:
+                self.add_identifier(identifier)
+
+        for identifier, column in self.columns.items():
+            column.append(self.encode(identifier, specifiers.get(identifier)))
+
+        self.size += 1
+
+    def merge(self, other):
+        # the codes of the other index are translated to the codes of this index
+        for identifier in other.columns:
+            if identifier not in self.columns:
+                self.add_identifier(identifier)
+
+        for identifier, column in self.columns.items():
+            if identifier in other.columns:
+                translation = [self.encode(identifier, value) for value in other.values[identifier]]
+                column.extend(translation[code] for code in other.columns[identifier])
+            else:
+                column.extend(array('I', bytes(4 * other.size)))
+
+        self.size += other.size
+
+    def to_dict(self):
+        return {
+            'size': self.size,
+            'values': self.values,
+            'columns': {
+                identifier: base64.b64encode(column.tobytes()).decode() for identifier, column in self.columns.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.size = data['size']
+        for identifier, values in data['values'].items():
+            index.values[identifier] = values
+            index.codes[identifier] = {value: code for code, value in enumerate(values)}
+            index.columns[identifier] = array('I', base64.b64decode(data['columns'][identifier]))
+        return index
+
+    def get_array(self, identifiers):
+        # return the codes of the identifiers as (files x identifiers) array
+        if not self.size:
+            return np.zeros((0, len(identifiers)), dtype=np.uint32)
+
+        return np.column_stack([
+            np.frombuffer(self.columns[identifier], dtype=np.uint32) if identifier in self.columns
+            else np.zeros(self.size, dtype=np.uint32)
+            for identifier in identifiers
+        ])
+
+    def decode_row(self, identifiers, row):
+        return {
+            identifier: self.decode(identifier, code)
+            for identifier, code in zip(identifiers, row, strict=True)
+            if identifier in self.values and code
+        }
+
+
+def find_duplicates(index):
+    '''
+    Return the specifiers of the combinations which occur in more than one file, and how often.
+    '''
+    identifiers = sorted(index.columns)
+    rows, counts = np.unique(index.get_array(identifiers), axis=0, return_counts=True)
+    return [(index.decode_row(identifiers, row), int(count)) for row, count in zip(rows, counts, strict=True)
+            if count > 1]
+
+
+def find_missing(index, experiment_periods):
+    '''
+    Join the index with the expected experiments and periods from the protocol (a list of (experiment, period)
+    tuples), and return the combinations of model, climate_forcing, experiment and period with missing variants.
+    The variants (all other specifiers, e.g. variable and time_step) which are expected for a model are the
+    ones it delivered for any experiment. The protocol does not define which variables a model has to deliver,
+    so a variable which a model did not deliver for any experiment is not reported as missing.
+    '''
+    variant_identifiers = sorted(
+        identifier for identifier in index.columns
+        if identifier not in ('model', 'climate_forcing', *EXPERIMENT_IDENTIFIERS)
+    )
+    identifiers = ['model', 'climate_forcing', 'experiment', 'period', *variant_identifiers]
+    codes = index.get_array(identifiers)
+
+    # only files which belong to an experiment of the protocol are considered
+    codes = codes[codes[:, 2] > 0]
+
+    missing = []
+    for model_code in np.unique(codes[:, 0]):
+        model_codes = codes[codes[:, 0] == model_code]
+
+        variants = np.unique(model_codes[:, 4:], axis=0)
+        present = {tuple(row) for row in np.unique(model_codes[:, 1:], axis=0).tolist()}
+
+        for climate_forcing_code in np.unique(model_codes[:, 1]).tolist():
+            for experiment, period in experiment_periods:
+                experiment_code = index.codes['experiment'].get(experiment, -1)
+                period_code = index.codes['period'].get(period, -1)
+
+                missing_variants = [
+                    variant for variant in variants.tolist()
+                    if (climate_forcing_code, experiment_code, period_code, *variant) not in present
+                ]
+                if missing_variants:
+                    missing.append(Missing(
+                        index.decode('model', model_code),
+                        index.decode('climate_forcing', climate_forcing_code),
+                        experiment,
+                        period,
+                        [] if len(missing_variants) == len(variants) else [
+                            index.decode_row(variant_identifiers, variant) for variant in missing_variants
+                        ]
+                    ))
+
+    return missing
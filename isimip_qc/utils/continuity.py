@@ -0,0 +1,102 @@
+from datetime import timedelta
+from itertools import pairwise
+from typing import NamedTuple
+
+# number of date components (year, month, day) which identify a time step
+TIME_STEP_PRECISION = {
+    'daily': 3,
+    'monthly': 2,
+    'annual': 1
+}
+
+
+class TimeIndexEntry(NamedTuple):
+    group: tuple        # all specifiers except start_year and end_year
+    path: str
+    start_year: int
+    end_year: int
+    time_step: str
+    calendar: str | None
+    first: tuple | None  # date of the first and the last time step, as (year, month, day)
+    last: tuple | None
+
+
+class ContinuityProblem(NamedTuple):
+    kind: str            # 'gap' or 'overlap'
+    source: str          # 'years' (file names) or 'time' (time axes)
+    previous: TimeIndexEntry
+    following: TimeIndexEntry
+    expected: tuple
+    found: tuple
+
+
+def get_time_index_entry(path, specifiers, time_axis):
+    start_year, end_year = specifiers.get('start_year'), specifiers.get('end_year')
+    time_step = specifiers.get('time_step')
+    if start_year is None or end_year is None or time_step not in TIME_STEP_PRECISION:
+        return None
+
+    group = tuple(sorted((key, str(value)) for key, value in specifiers.items()
+                         if key not in ('start_year', 'end_year')))
+
+    calendar, first, last = None, None, None
+    if time_axis is not None:
+        precision = TIME_STEP_PRECISION[time_step]
+        calendar = time_axis['calendar']
+        first = tuple(time_axis['first'][:precision])
+        last = tuple(time_axis['last'][:precision])
+
+    return TimeIndexEntry(group, str(path), int(start_year), int(end_year), time_step, calendar, first, last)
+
+
+def read_time_index_entry(values):
+    # restore an entry which was stored as JSON list
+    group, path, start_year, end_year, time_step, calendar, first, last = values
+    return TimeIndexEntry(tuple(tuple(item) for item in group), path, start_year, end_year, time_step, calendar,
+                          tuple(first) if first is not None else None, tuple(last) if last is not None else None)
+
+
+def get_next_time_step(date, time_step, calendar):
+    if time_step == 'daily':
+        import cftime
+
+        next_date = cftime.datetime(*date, calendar=calendar) + timedelta(days=1)
+        return (next_date.year, next_date.month, next_date.day)
+    elif time_step == 'monthly':
+        year, month = date
+        return (year + month // 12, month % 12 + 1)
+    else:
+        return (date[0] + 1, )
+
+
+def check_continuity(entries):
+    '''
+    Group the entries of the time index by all specifiers except the years, and check that the files of each
+    group follow each other without gaps or overlaps, both by the years in the file names and by the first
+    and the last time step of their time axes. Returns the number of groups and a list of problems.
+    '''
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry.group, []).append(entry)
+
+    problems = []
+    for group_entries in groups.values():
+        group_entries.sort(key=lambda entry: (entry.start_year, entry.end_year, entry.path))
+
+        for previous, following in pairwise(group_entries):
+            expected, found = (previous.end_year + 1, ), (following.start_year, )
+            if found < expected:
+                problems.append(ContinuityProblem('overlap', 'years', previous, following, expected, found))
+            elif found > expected:
+                problems.append(ContinuityProblem('gap', 'years', previous, following, expected, found))
+
+            if previous.last is None or following.first is None:
+                continue
+
+            expected, found = get_next_time_step(previous.last, previous.time_step, previous.calendar), following.first
+            if found < expected:
+                problems.append(ContinuityProblem('overlap', 'time', previous, following, expected, found))
+            elif found > expected:
+                problems.append(ContinuityProblem('gap', 'time', previous, following, expected, found))
+
+    return len(groups), problems
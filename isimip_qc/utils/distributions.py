@@ -0,0 +1,49 @@
+import json
+import logging
+
+from .protocol import write_json
+
+logger = logging.getLogger(__name__)
+
+# factor by which the median magnitude of a file may differ from the reference, unit errors like
+# per day instead of per second (86400) or g instead of kg (1000) are far beyond
+REFERENCE_FACTOR = 10
+
+# percentiles of the magnitudes which are reported
+PERCENTILES = (10, 50, 90)
+
+
+def read_references(path):
+    try:
+        return json.loads(path.expanduser().read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def read_distributions(path, schema_path):
+    '''
+    Read the reference distributions of the variables of schema_path, and return them as Histogram objects.
+    '''
+    from .scan import Histogram
+
+    references = read_references(path)
+    return {
+        variable: Histogram.from_dict(data)
+        for variable, data in references.get(str(schema_path), {}).items()
+    }
+
+
+def write_distributions(path, schema_path, distributions):
+    '''
+    Replace the reference distributions of schema_path stored in path with the distributions of the
+    variables, which were computed for the checked files. The distributions of other variables are kept,
+    so that running again over the same files gives the same references.
+    '''
+    references = read_references(path)
+    schema_references = references.setdefault(str(schema_path), {})
+
+    for variable, histogram in distributions.items():
+        schema_references[variable] = histogram.to_dict()
+
+    write_json(path.expanduser(), references)
+    logger.info('Replaced the reference distributions of %s variables in %s.', len(distributions), path)
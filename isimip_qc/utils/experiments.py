@@ -2,6 +2,13 @@ from ..config import settings
 
 
 def get_experiment(specifiers):
+    experiment_period = get_experiment_period(specifiers)
+    if experiment_period:
+        return experiment_period[0]
+    return experiment_period
+
+
+def get_experiment_period(specifiers):
     climate_scenario = specifiers.get('climate_scenario')
     soc_scenario = specifiers.get('soc_scenario')
     sens_scenario = specifiers.get('sens_scenario')
@@ -24,4 +31,14 @@ def get_experiment(specifiers):
                     (sens_scenario == 'default' or
                      experiment_period.get('climate_sens') == sens_scenario or
                      experiment_period.get('soc_sens') == sens_scenario)):
-                    return experiment_specifier
+                    return experiment_specifier, period_specifier
+
+
+def get_experiment_periods():
+    # return all combinations of experiment and period defined in the protocol
+    return [
+        (experiment_specifier, period_specifier)
+        for experiment_specifier, experiment_values in settings.DEFINITIONS.get('experiments', {}).items()
+        for period_specifier in settings.DEFINITIONS.get('period', {})
+        if isinstance(experiment_values.get(period_specifier), dict)
+    ]
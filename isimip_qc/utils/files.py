@@ -1,33 +1,162 @@
+import errno
 import logging
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
+from isimip_utils.utils import exclude_path, include_path
+
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# default number of threads scanning directories
+WALK_THREADS = 8
+
+# number of directories scanned ahead per thread
+WALK_AHEAD = 4
+
+
+def scan_dir(path):
+    # return the files and the directories in path, sorted by name
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                # skip symlinks to avoid repeated or unexpected traversal
+                if entry.is_symlink():
+                    continue
+                # prefer non-following-symlink checks
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(Path(entry.path))
+    except PermissionError:
+        # skip directories we cannot access
+        pass
+    return files, dirs
+
+
+def filter_file_path(file_path, include=None, exclude=None, suffixes=None):
+    if include and not include_path(include, file_path):
+        logger.info('%s skipped by include option.', file_path)
+        return False
+
+    if exclude and exclude_path(exclude, file_path):
+        logger.info('%s skipped by exclude option.', file_path)
+        return False
+
+    if suffixes is not None and file_path.suffix not in suffixes:
+        logger.error('%s has wrong suffix. Use "%s" for this simulation round.', file_path, suffixes[0])
+        return False
 
-def walk_files(path):
-    # Use os.scandir recursively to avoid creating large lists returned by os.walk
+    return True
+
+
+def walk_files(path, include=None, exclude=None, suffixes=None, threads=WALK_THREADS):
+    '''
+    Walk over the files below path and yield the ones which pass the include, exclude and suffix filters.
+    The directories which are visited next are scanned ahead by a pool of threads, since listing a
+    directory is slow on parallel file systems. The files are yielded in the same order as for a
+    sequential walk, as soon as their directory was scanned. Excluded directories are not walked at all.
+    '''
+    executor = ThreadPoolExecutor(max_workers=threads)
+    futures = {}
+
+    # the directories still to visit, the last one is visited next
     stack = [Path(path)]
-    while stack:
-        current = stack.pop()
-        try:
-            with os.scandir(current) as it:
-                entries = sorted(it, key=lambda e: e.name)
-                for entry in entries:
-                    # skip symlinks to avoid repeated or unexpected traversal
-                    if entry.is_symlink():
-                        continue
-                    # prefer non-following-symlink checks
-                    if entry.is_dir(follow_symlinks=False):
-                        stack.append(Path(entry.path))
-                    elif entry.is_file(follow_symlinks=False):
-                        yield Path(entry.path)
-        except PermissionError:
-            # skip directories we cannot access
-            continue
+    try:
+        while stack:
+            # keep a bounded number of the next directories scanned or in progress
+            for dir_path in stack[-WALK_AHEAD * threads:]:
+                if dir_path not in futures:
+                    futures[dir_path] = executor.submit(scan_dir, dir_path)
+
+            files, dirs = futures.pop(stack.pop()).result()
+
+            for file_path in files:
+                if filter_file_path(file_path, include, exclude, suffixes):
+                    yield file_path
+
+            for dir_path in dirs:
+                # all files below an excluded directory are excluded as well
+                if exclude and exclude_path(exclude, dir_path):
+                    logger.info('%s skipped by exclude option.', dir_path)
+                else:
+                    stack.append(dir_path)
+    finally:
+        # do not wait for directories which are not needed anymore, e.g. for --first-file
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def split_file_list(fp, separator):
+    # split the content of fp lazily, so that a list from stdin can be processed while it is written
+    buffer = ''
+    while chunk := fp.read(64 * 1024):
+        *entries, buffer = (buffer + chunk).split(separator)
+        yield from entries
+    yield buffer
+
+
+def read_files(files_from, path, null=False, include=None, exclude=None, suffixes=None):
+    '''
+    Read a list of files from the file files_from, or from stdin if files_from is "-", and yield the
+    ones which pass the include, exclude and suffix filters. The files are separated by newlines, or
+    by NUL characters if null is set, and are relative to path (absolute paths need to be below path).
+    No directories are walked.
+    '''
+    path = Path(path)
+    seen = set()
+
+    with open(Path(files_from).expanduser()) if files_from != '-' else nullcontext(sys.stdin) as fp:
+        for entry in split_file_list(fp, '\0' if null else '\n'):
+            if not null:
+                entry = entry.rstrip('\r')
+            if not entry:
+                continue
+
+            file_path = Path(os.path.normpath(path / Path(entry).expanduser()))
+            if not file_path.is_relative_to(path):
+                logger.error('%s is not below UNCHECKED_PATH.', file_path)
+                continue
+
+            if file_path in seen:
+                continue
+            seen.add(file_path)
+
+            if file_path.is_dir():
+                logger.debug('%s is a directory and is skipped.', file_path)
+            elif not file_path.is_file():
+                logger.error('%s does not exist.', file_path)
+            elif filter_file_path(file_path, include, exclude, suffixes):
+                yield file_path
+
+
+def get_stat(path):
+    # return the size and the modification time of a file, which change while it is written
+    try:
+        stat = path.stat()
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def get_tmp_path(target_path):
+    return target_path.with_name(f'.{target_path.name}.{os.getpid()}')
+
+
+def replace_file(source_path, target_path, copy_function=shutil.copy):
+    # copy to a temporary file next to the target and rename it, so that an interrupted copy never leaves
+    # a partial file at the target path
+    tmp_path = get_tmp_path(target_path)
+    try:
+        copy_function(source_path, tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def move_file(source_path, target_path, overwrite=False):
@@ -38,7 +167,14 @@ def move_file(source_path, target_path, overwrite=False):
     target_path.parent.mkdir(parents=True, exist_ok=True)
     if not target_path.is_file() or overwrite:
         logger.info('Move file')
-        shutil.move(source_path, target_path)
+        try:
+            os.replace(source_path, target_path)
+        except OSError as e:
+            # the target is on a different file system, copy the file first and remove the source afterwards
+            if e.errno != errno.EXDEV:
+                raise
+            replace_file(source_path, target_path, copy_function=shutil.copy2)
+            os.unlink(source_path)
     else:
         logger.warning('Skip moving because target file is present and overwriting not allowed.'
                     ' Use -O to allow overwriting.')
@@ -49,7 +185,7 @@ def copy_file(source_path, target_path):
     target_path.parent.mkdir(parents=True, exist_ok=True)
     if not target_path.is_file() or settings.OVERWRITE:
         logger.info('Copy file')
-        shutil.copy(source_path, target_path)
+        replace_file(source_path, target_path)
     else:
         logger.warning('Skip copying because target file is present and overwriting not allowed.'
                     ' Use -O to allow overwriting.')
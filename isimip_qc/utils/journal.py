@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+from ..config import settings
+from .files import get_stat
+
+logger = logging.getLogger(__name__)
+
+_fd = None
+_fd_pid = None
+
+
+def get_journal_fd():
+    global _fd, _fd_pid
+
+    # every (worker) process appends to the journal using its own file descriptor
+    if _fd is None or _fd_pid != os.getpid():
+        _fd = os.open(settings.JOURNAL, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _fd_pid = os.getpid()
+
+        # terminate an incomplete last line of a killed run, so that it does not corrupt the next entry
+        with open(settings.JOURNAL, 'rb') as fp:
+            size = fp.seek(0, os.SEEK_END)
+            if size:
+                fp.seek(size - 1)
+                if fp.read(1) != b'\n':
+                    os.write(_fd, b'\n')
+
+    return _fd
+
+
+def write_journal(path, **entry):
+    # every entry is written with a single write call and synced to disk before the run continues,
+    # so that the journal is complete up to the last entry, even if the process is killed
+    fd = get_journal_fd()
+    os.write(fd, (json.dumps({'path': str(path), **entry}) + '\n').encode())
+    os.fsync(fd)
+
+
+def start_action(file, action):
+    '''
+    Record that a fix, copy or move is about to change a file, before it is started.
+    '''
+    if not settings.JOURNAL:
+        return
+
+    entry = {'action': action}
+    if action in ('copy', 'move'):
+        entry['target_existed'] = (settings.CHECKED_PATH / file.path).exists()
+
+    write_journal(file.path, **entry)
+    file.actions.append(action)
+
+
+def finish_file(file, status):
+    '''
+    Record that a file is completed, together with its outcome and the actions which were applied.
+    '''
+    if not settings.JOURNAL:
+        return
+
+    size, mtime = get_stat(file.abs_path)
+    write_journal(file.path, status=status, actions=file.actions, size=size, mtime=mtime)
+
+
+def read_journal(journal_path):
+    '''
+    Read the journal and return the last entry of every completed file, and the action of every
+    file where a fix, copy or move was started but the file was never completed.
+    '''
+    done, pending = {}, {}
+
+    try:
+        with open(Path(journal_path).expanduser()) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line might be incomplete if the run was killed while it was written
+                    continue
+
+                path = entry.pop('path')
+                if 'action' in entry:
+                    pending[path] = entry
+                else:
+                    done[path] = entry
+                    pending.pop(path, None)
+    except FileNotFoundError:
+        pass
+
+    return done, pending
+
+
+def recover_file(path, entry):
+    '''
+    Clean up after an interrupted action, so that the file can be checked again. Returns True if the file
+    needs to be checked again, and False if the action was actually completed.
+    '''
+    abs_path = settings.UNCHECKED_PATH / path
+    target_path = settings.CHECKED_PATH / path
+    action = entry['action']
+
+    if action in ('copy', 'move'):
+        # remove the temporary files of an interrupted copy
+        for tmp_path in target_path.parent.glob(f'.{target_path.name}.*'):
+            tmp_path.unlink(missing_ok=True)
+
+        if action == 'move' and not abs_path.exists() and target_path.exists():
+            logger.warning('The interrupted move of %s was completed.', path)
+            write_journal(path, status='checked', actions=['move'], size=None, mtime=None)
+            return False
+
+        if not entry.get('target_existed') and target_path.exists():
+            # the target was created by the interrupted action
+            target_path.unlink()
+
+        logger.warning('The %s of %s was interrupted and is retried.', action, path)
+
+    elif action == 'fix_datamodel':
+        # the original file is only replaced by the rewritten file once it is complete
+        abs_path.with_name('.' + abs_path.name + '-fix').unlink(missing_ok=True)
+        logger.warning('The data model fix of %s was interrupted and is retried.', path)
+
+    else:
+        logger.warning('The fixes of %s were interrupted, the file is checked again.', path)
+
+    return True
+
+
+def resume_files(file_paths, base_path, journal_path):
+    '''
+    Skip the files which were completed according to the journal and have not changed since, and
+    clean up the files where a fix, copy or move was interrupted, so that they are checked again.
+    '''
+    done, pending = read_journal(journal_path)
+
+    # files which were moved away from base_path are not found again
+    for path, entry in list(pending.items()):
+        if entry['action'] == 'move' and not (base_path / path).exists():
+            recover_file(path, pending.pop(path))
+
+    skipped = 0
+    for file_path in file_paths:
+        path = str(file_path.relative_to(base_path))
+
+        if path in pending:
+            if recover_file(path, pending.pop(path)):
+                yield file_path
+        elif path in done and get_stat(file_path) == (done[path]['size'], done[path]['mtime']):
+            logger.debug('Skip %s, which was completed before.', path)
+            skipped += 1
+        else:
+            yield file_path
+
+    if skipped:
+        logger.info('Skipped %s files which were completed before.', skipped)
@@ -0,0 +1,105 @@
+import math
+import statistics
+import time
+from typing import NamedTuple
+
+
+class Access(NamedTuple):
+    chunks: int           # number of chunks which are touched
+    amplification: float  # ratio of the decompressed values to the values which are needed
+    stored: int | None    # compressed bytes which are read from disk, if the chunk sizes are known
+
+
+class Layout(NamedTuple):
+    chunk_shape: tuple
+    chunk_size: int               # uncompressed bytes of one chunk
+    chunk_count: int              # number of chunks of the variable
+    stored_sizes: list | None     # compressed bytes of every stored chunk, if h5py is installed
+    compression_ratio: float | None
+    time_slice: Access            # reading all values of one time step
+    time_series: Access           # reading all time steps of one grid cell
+
+
+def read_chunk_sizes(file_path, variable_name):
+    '''
+    Read the compressed size of every stored chunk of a variable from the chunk index of the HDF5 file.
+    h5py is an optional dependency, None is returned if it is not installed, or if h5py can not read
+    the chunk index (e.g. for NETCDF3 files).
+    '''
+    try:
+        import h5py
+    except ImportError:
+        return None
+
+    try:
+        with h5py.File(file_path, 'r') as h5_file:
+            dataset_id = h5_file[variable_name].id
+
+            sizes = []
+            try:
+                # iterate over the chunk index in one call, needs HDF5 1.14
+                dataset_id.chunk_iter(lambda info: sizes.append(info.size))
+            except (AttributeError, NotImplementedError):
+                sizes = [dataset_id.get_chunk_info(i).size for i in range(dataset_id.get_num_chunks())]
+    except (OSError, KeyError):
+        return None
+
+    return sizes
+
+
+def get_access(chunk_shape, selection_shape, stored_sizes=None):
+    # estimate the cost of reading a selection which starts at the beginning of a chunk
+    chunks = math.prod(math.ceil(s / c) for s, c in zip(selection_shape, chunk_shape, strict=True))
+    amplification = chunks * math.prod(chunk_shape) / math.prod(selection_shape)
+    stored = round(chunks * statistics.fmean(stored_sizes)) if stored_sizes else None
+    return Access(chunks, amplification, stored)
+
+
+def analyze_layout(file_path, variable_name, shape, chunk_shape, itemsize):
+    '''
+    Analyze the chunk layout of a variable with the dimensions (time, ..., lat, lon): the size and the
+    number of the chunks, the compressed size of every chunk (if h5py is installed), and the estimated
+    read amplification for reading one time step and for reading the time series of one grid cell.
+    '''
+    chunk_shape = tuple(min(c, s) for c, s in zip(chunk_shape, shape, strict=True))
+    chunk_size = math.prod(chunk_shape) * itemsize
+    chunk_count = math.prod(math.ceil(s / c) for s, c in zip(shape, chunk_shape, strict=True))
+
+    stored_sizes = read_chunk_sizes(file_path, variable_name)
+    if stored_sizes:
+        compression_ratio = math.prod(shape) * itemsize / sum(stored_sizes)
+    else:
+        compression_ratio = None
+
+    return Layout(
+        chunk_shape=chunk_shape,
+        chunk_size=chunk_size,
+        chunk_count=chunk_count,
+        stored_sizes=stored_sizes,
+        compression_ratio=compression_ratio,
+        time_slice=get_access(chunk_shape, (1, *shape[1:]), stored_sizes),
+        time_series=get_access(chunk_shape, (shape[0], *(1 for _ in shape[1:])), stored_sizes)
+    )
+
+
+def time_reads(file_path, variable_name, shape):
+    '''
+    Measure the time in seconds to read the middle time step and the time series of the grid cell in the
+    middle, each using a new handle of the file, so that no chunks are cached by the HDF5 library.
+    '''
+    import netCDF4
+
+    selections = [
+        (shape[0] // 2, ),
+        (slice(None), *(size // 2 for size in shape[1:]))
+    ]
+
+    times = []
+    for selection in selections:
+        with netCDF4.Dataset(file_path) as dataset:
+            variable = dataset.variables[variable_name]
+            start = time.perf_counter()
+            variable[selection]
+            times.append(time.perf_counter() - start)
+
+    return tuple(times)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from ..config import settings
+from .files import get_stat
+from .protocol import write_json
+
+logger = logging.getLogger(__name__)
+
+
+def get_grid(lat_size, lon_size):
+    return f'{lat_size}x{lon_size}'
+
+
+def read_mask(mask_file):
+    # read the first variable on the lat/lon grid, cells with a value other than 0 are inside the mask
+    import netCDF4
+
+    with netCDF4.Dataset(mask_file) as dataset:
+        for variable in dataset.variables.values():
+            if variable.dimensions[-2:] == ('lat', 'lon'):
+                data = np.ma.masked_invalid(variable[:])
+                while data.ndim > 2:
+                    data = data[0]
+
+                lat = dataset.variables['lat'][:]
+                return np.ma.filled(data != 0, False), bool(lat[0] > lat[-1])
+
+    raise ValueError(f'No variable on a lat/lon grid found in {mask_file}.')
+
+
+def write_npy(path, array):
+    # write to a temporary file and rename, so that concurrent runs never read partial files
+    tmp_path = path.with_name(f'.{path.stem}.{os.getpid()}.npy')
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=8)
+def load_masks(mask_files, cache_path, mask_stats=None):
+    '''
+    Load the land-sea masks from the NetCDF files in mask_files and return them by grid. Every mask is
+    converted once to a .npy file below cache_path, which is memory-mapped by all following runs (and
+    shared by all worker processes), so that the NetCDF file is not read for every checked file.
+    mask_stats (the size and modification time of the mask files) is only used as part of the key of the
+    lru_cache, so that a long running process (e.g. watch or serve) loads a replaced mask file again.
+    '''
+    masks_path = Path(cache_path) / 'masks'
+    masks = {}
+
+    for mask_file in mask_files:
+        mask_file = Path(mask_file).expanduser()
+        try:
+            stat = mask_file.stat()
+        except OSError as e:
+            logger.error('Could not read the land-sea mask %s: %s', mask_file, e)
+            continue
+
+        # the cached mask is renewed if the mask file has changed
+        mask_hash = hashlib.sha1(f'{mask_file.resolve()} {stat.st_size} {stat.st_mtime_ns}'.encode()).hexdigest()
+        npy_path = masks_path / f'{mask_hash[:12]}.npy'
+        json_path = npy_path.with_suffix('.json')
+
+        if not json_path.is_file():
+            try:
+                mask, lat_descending = read_mask(mask_file)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error('Could not read the land-sea mask %s: %s', mask_file, e)
+                continue
+
+            masks_path.mkdir(parents=True, exist_ok=True)
+            write_npy(npy_path, mask)
+            # write the json file last, so that it only exists for complete masks
+            write_json(json_path, {
+                'mask_file': str(mask_file),
+                'grid': get_grid(*mask.shape),
+                'lat_descending': lat_descending
+            })
+
+        meta = json.loads(json_path.read_text())
+        masks[meta['grid']] = (np.load(npy_path, mmap_mode='r'), meta['lat_descending'])
+
+    return masks
+
+
+def get_mask(grid, lat_descending):
+    '''
+    Return the land-sea mask for a grid as boolean array, oriented like the latitudes of the file,
+    or None if no mask was provided for this grid.
+    '''
+    mask_files = tuple(settings.MASK_FILES or ())
+    mask_stats = tuple(get_stat(Path(mask_file).expanduser()) for mask_file in mask_files)
+    masks = load_masks(mask_files, settings.CACHE_PATH, mask_stats)
+    if grid not in masks:
+        return None
+
+    mask, mask_lat_descending = masks[grid]
+    return mask if lat_descending == mask_lat_descending else mask[::-1]
@@ -0,0 +1,93 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# magic bytes at the start of NetCDF files
+MAGIC_BYTES = {
+    b'CDF\x01': 'NETCDF3_CLASSIC',
+    b'CDF\x02': 'NETCDF3_64BIT_OFFSET',
+    b'CDF\x05': 'NETCDF3_64BIT_DATA',
+    b'\x89HDF\r\n\x1a\n': 'HDF5'
+}
+
+# bytes read from the start of every file, which usually contain the header of a NetCDF file
+HEADER_SIZE = 1024 * 1024
+
+# size of the buffer used to read ahead
+BUFFER_SIZE = 1024 * 1024
+
+
+def sniff_format(header):
+    for magic, file_format in MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return file_format
+
+
+def read_ahead(fp, size):
+    # ask the kernel to read ahead asynchronously, and read the data, since not every
+    # (network) file system honors the advice, the data ends up in the page cache
+    try:
+        os.posix_fadvise(fp.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+    except (AttributeError, OSError):
+        pass
+
+    buffer = bytearray(BUFFER_SIZE)
+    n_bytes = 0
+    while n_bytes < size:
+        n = fp.readinto(buffer)
+        if not n:
+            break
+        n_bytes += n
+    return n_bytes
+
+
+def prefetch_file(file_path, readahead):
+    try:
+        size = file_path.stat().st_size
+        with open(file_path, 'rb', buffering=0) as fp:
+            file_format = sniff_format(fp.read(8))
+            if file_format is None:
+                # other files are not opened by the checks, so reading them ahead is wasted
+                logger.debug('Skip prefetching %s (unknown format)', file_path)
+                return 0
+
+            fp.seek(0)
+            n_bytes = read_ahead(fp, min(size, max(readahead, HEADER_SIZE)))
+    except OSError as e:
+        # the error is reported when the file is checked
+        logger.debug('Could not prefetch %s: %s', file_path, e)
+        return 0
+
+    logger.debug('Prefetched %s bytes of %s (%s)', n_bytes, file_path, file_format)
+    return n_bytes
+
+
+def prefetch_files(file_paths, depth, readahead=0):
+    '''
+    Yield the file paths, while the next depth files are read ahead by a pool of threads. For each NetCDF
+    file, the header and (if readahead is larger) the first readahead bytes are read into the page cache of the
+    operating system, so that opening and scanning the file does not wait for slow (network) storage.
+    The files are not opened with netCDF4 in the threads, since the HDF5 library is not thread safe.
+    '''
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        futures = deque()
+        try:
+            for file_path in file_paths:
+                futures.append((file_path, executor.submit(prefetch_file, file_path, readahead)))
+
+                if len(futures) > depth:
+                    file_path, future = futures.popleft()
+                    future.result()
+                    yield file_path
+
+            while futures:
+                file_path, future = futures.popleft()
+                future.result()
+                yield file_path
+        finally:
+            # do not wait for files which are not needed anymore, e.g. for --first-file
+            for _, future in futures:
+                future.cancel()
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+from isimip_utils.exceptions import FetchError, NotFound
+from isimip_utils.protocol import fetch_definitions, fetch_pattern, fetch_schema
+
+logger = logging.getLogger(__name__)
+
+PATTERN_REGEX_KEYS = ('path', 'file', 'dataset')
+
+
+def fetch_protocol(schema_path, protocol_locations):
+    return {
+        'definitions': fetch_definitions(schema_path, protocol_locations),
+        'pattern': fetch_pattern(schema_path, protocol_locations),
+        'schema': fetch_schema(schema_path, protocol_locations)
+    }
+
+
+def get_protocol_cache_path(cache_path, schema_path, protocol_locations):
+    # use a separate cache for each set of protocol locations
+    locations_hash = hashlib.sha1(' '.join(str(location) for location in protocol_locations).encode()).hexdigest()
+    return cache_path / 'protocol' / locations_hash[:12] / schema_path
+
+
+def read_cached_protocol(protocol_cache_path):
+    latest_path = protocol_cache_path / 'latest.json'
+    if not latest_path.is_file():
+        return None, None
+
+    latest = json.loads(latest_path.read_text())
+    commit_path = protocol_cache_path / latest['commit']
+
+    protocol = {}
+    for key in ('definitions', 'pattern', 'schema'):
+        protocol[key] = json.loads((commit_path / f'{key}.json').read_text())
+
+    for key in PATTERN_REGEX_KEYS:
+        protocol['pattern'][key] = re.compile(protocol['pattern'][key])
+
+    return protocol, latest['fetched']
+
+
+def write_cached_protocol(protocol_cache_path, protocol):
+    commit = protocol['definitions'].get('commit', 'unknown')
+    commit_path = protocol_cache_path / commit
+    commit_path.mkdir(parents=True, exist_ok=True)
+
+    pattern = dict(protocol['pattern'])
+    for key in PATTERN_REGEX_KEYS:
+        pattern[key] = pattern[key].pattern
+
+    write_json(commit_path / 'definitions.json', protocol['definitions'])
+    write_json(commit_path / 'pattern.json', pattern)
+    write_json(commit_path / 'schema.json', protocol['schema'])
+
+    # write latest.json last, so that it only points to complete commits
+    write_json(protocol_cache_path / 'latest.json', {'commit': commit, 'fetched': time.time()})
+
+
+def write_json(path, data):
+    # write to a temporary file and rename, so that concurrent runs never read partial files
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def load_protocol(schema_path, protocol_locations, cache_path=None, ttl=None, offline=False):
+    '''
+    Load the definitions, the pattern and the schema for a schema_path. Protocols fetched
+    from URLs are stored below cache_path, keyed by the schema_path and the commit of the
+    protocol, and reused for ttl hours, or without any time limit in offline mode.
+    '''
+    if isinstance(protocol_locations, str | Path):
+        protocol_locations = [protocol_locations]
+
+    # local protocols are fast to read and need no cache
+    if cache_path is None or all(isinstance(location, Path) for location in protocol_locations):
+        return fetch_protocol(schema_path, protocol_locations)
+
+    protocol_cache_path = get_protocol_cache_path(cache_path, schema_path, protocol_locations)
+    try:
+        cached_protocol, fetched = read_cached_protocol(protocol_cache_path)
+    except (OSError, ValueError, KeyError, re.error):
+        logger.warning('The cached protocol in %s is not readable and is ignored.', protocol_cache_path)
+        cached_protocol, fetched = None, None
+
+    if offline:
+        if cached_protocol is None:
+            raise NotFound(f'No cached protocol found for {schema_path}. Run once without --offline.')
+        return cached_protocol
+
+    if cached_protocol is not None and ttl is not None and time.time() - fetched < ttl * 3600:
+        return cached_protocol
+
+    try:
+        protocol = fetch_protocol(schema_path, protocol_locations)
+    except FetchError as e:
+        if cached_protocol is None:
+            raise NotFound(f'Could not fetch the protocol from {e.url}.') from e
+
+        logger.warning('Could not fetch the protocol from %s, using the cached protocol (commit %s).',
+                       e.url, cached_protocol['definitions'].get('commit'))
+        return cached_protocol
+
+    try:
+        write_cached_protocol(protocol_cache_path, protocol)
+    except OSError as e:
+        logger.warning('Could not write the protocol cache: %s', e)
+
+    return protocol
@@ -0,0 +1,525 @@
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# number of chunks the HDF5 chunk cache can index, should be a prime number
+CHUNK_CACHE_NELEMS = 10007
+
+# number of slabs a variable is divided into (at least) when only a sample of it is read
+SAMPLE_SLABS = 100
+
+# resolution of the histograms of the magnitudes of the values, in bins per decade
+HISTOGRAM_BINS_PER_DECADE = 10
+
+# decades covered by the histograms, float32 values range from about 1e-45 to 3e38
+HISTOGRAM_MIN_EXPONENT = -46
+HISTOGRAM_MAX_EXPONENT = 39
+
+# attributes which are used by netCDF4 to mask or unpack the data, besides the fill values
+MASK_AND_SCALE_ATTRS = ('valid_min', 'valid_max', 'valid_range', 'scale_factor', 'add_offset')
+
+
+def get_chunk_shape(variable):
+    # contiguous variables (or data models without chunking) are read one step of the first dimension at a time
+    chunking = variable.chunking()
+    if isinstance(chunking, list | tuple) and len(chunking) == len(variable.shape):
+        return tuple(chunking)
+    else:
+        return (1, *variable.shape[1:])
+
+
+def get_slab_shape(shape, chunk_shape, itemsize, memory):
+    '''
+    Compute the shape of the slabs used to read a variable. Slabs are aligned with the chunks,
+    so that every chunk is decompressed exactly once. Starting from a single chunk, the slab grows
+    along the last (innermost) dimension first, until the memory budget (in bytes) is used up.
+    A single chunk is always read completely, even if it exceeds the memory budget.
+    '''
+    slab_shape = [min(c, s) for c, s in zip(chunk_shape, shape, strict=True)]
+    max_size = max(memory // itemsize, 1)
+
+    for i in reversed(range(len(shape))):
+        other_size = math.prod(slab_shape) // slab_shape[i]
+
+        if other_size * shape[i] <= max_size:
+            # the full dimension fits into the budget
+            slab_shape[i] = shape[i]
+        else:
+            # use as many chunks along this dimension as fit into the budget and stop growing
+            n_chunks = max(max_size // (other_size * slab_shape[i]), 1)
+            slab_shape[i] = min(n_chunks * slab_shape[i], shape[i])
+            break
+
+    return tuple(slab_shape)
+
+
+def get_slabs(shape, slab_shape):
+    # yield the slices of all slabs in C order
+    ranges = [range(0, size, step) for size, step in zip(shape, slab_shape, strict=True)]
+    for start in itertools.product(*ranges):
+        yield tuple(slice(s, min(s + step, size)) for s, step, size in zip(start, slab_shape, shape, strict=True))
+
+
+def get_sample_slabs(shape, slab_shape, fraction, seed):
+    '''
+    Draw a stratified random sample of the given fraction of the slabs. The slabs (in C order, i.e.
+    along the time dimension first) are divided into equally sized strata and one slab is drawn from
+    each of them, so that the sample is spread over the whole variable. The same seed draws the same sample.
+    '''
+    slabs = list(get_slabs(shape, slab_shape))
+    size = min(max(math.ceil(fraction * len(slabs)), 1), len(slabs))
+    bounds = np.linspace(0, len(slabs), size + 1).astype(int)
+    rng = np.random.default_rng(seed)
+    for start, stop in itertools.pairwise(bounds):
+        yield slabs[rng.integers(start, stop)]
+
+
+def set_chunk_cache(variable, chunk_shape, slab_shape):
+    # the cache needs to hold the chunks of one slab, every chunk is only used once
+    cache_size = math.prod(slab_shape) * variable.dtype.itemsize
+    n_chunks = math.prod(math.ceil(s / c) for s, c in zip(slab_shape, chunk_shape, strict=True))
+    try:
+        variable.set_var_chunk_cache(size=cache_size, nelems=max(CHUNK_CACHE_NELEMS, n_chunks), preemption=1.0)
+    except (AttributeError, RuntimeError):
+        # not available for all data models
+        pass
+
+
+def get_fill_values(variable):
+    '''
+    Return the values which netCDF4 masks when the variable is read, i.e. the _FillValue (or the default
+    fill value) and the missing_value, so that the missing values can be found in the raw data. Returns
+    None for variables which are masked or unpacked using other attributes as well.
+    '''
+    from netCDF4 import default_fillvals
+
+    attrs = variable.ncattrs()
+    if variable.dtype.kind != 'f' or any(attr in attrs for attr in MASK_AND_SCALE_ATTRS):
+        return None
+
+    try:
+        fill_values = [variable.getncattr('_FillValue') if '_FillValue' in attrs
+                       else default_fillvals[variable.dtype.str[1:]]]
+        if 'missing_value' in attrs:
+            fill_values.extend(np.ravel(variable.getncattr('missing_value')))
+        fill_values = np.array(fill_values, dtype=variable.dtype)
+    except (TypeError, ValueError):
+        return None
+
+    # NaN is not equal to itself, so NaN fill values are left to netCDF4
+    if np.isnan(fill_values).any():
+        return None
+
+    return tuple(fill_values)
+
+
+def read_slabs(variable, chunk_shape, slab_shape, slabs):
+    '''
+    Read the given slabs of a variable and yield them as Slab objects. If possible, the automatic masking
+    of netCDF4 is switched off and the missing values are found by comparing the raw data with the fill
+    values. The masks are computed into buffers which are allocated once for the largest slab and reused,
+    so a Slab is only valid until the next one is read. The data itself is always a new array, since
+    netCDF4 can not read into an existing one.
+    '''
+    set_chunk_cache(variable, chunk_shape, slab_shape)
+
+    fill_values = get_fill_values(variable)
+    buffers = SlabBuffers(math.prod(slab_shape))
+
+    auto_mask = variable.mask
+    if fill_values is not None:
+        variable.set_auto_mask(False)
+
+    try:
+        for slices in slabs:
+            yield Slab(slices, variable[slices], fill_values, buffers)
+    finally:
+        variable.set_auto_mask(auto_mask)
+
+
+def iter_slabs(variable, memory, sample=None, seed=0):
+    '''
+    Iterate over the data of a variable in chunk aligned slabs and yield them as Slab objects
+    (see read_slabs). If sample is given, only this fraction of the slabs is read.
+    '''
+    shape = variable.shape
+    if not shape or 0 in shape:
+        return
+
+    if sample:
+        # use smaller slabs, so that the sample is drawn from many places of the variable
+        memory = min(memory, math.prod(shape) * variable.dtype.itemsize // SAMPLE_SLABS)
+
+    chunk_shape = get_chunk_shape(variable)
+    slab_shape = get_slab_shape(shape, chunk_shape, variable.dtype.itemsize, memory)
+
+    if sample:
+        slabs = get_sample_slabs(shape, slab_shape, sample, seed)
+    else:
+        slabs = get_slabs(shape, slab_shape)
+
+    yield from read_slabs(variable, chunk_shape, slab_shape, slabs)
+
+
+class Outliers:
+    '''
+    Counts the values flagged as outliers and keeps the n most extreme of them (the largest or the
+    smallest values), together with their index in the variable. Slabs are processed in bulk.
+    '''
+
+    def __init__(self, n, largest):
+        self.n = n
+        self.largest = largest
+        self.count = 0
+        self.values = np.empty(0)
+        self.indices = None
+
+    def select(self, values):
+        # return the positions of the n most extreme values (in no particular order)
+        if self.largest:
+            return np.argpartition(values, -self.n)[-self.n:]
+        else:
+            return np.argpartition(values, self.n - 1)[:self.n]
+
+    def update(self, data, cond, offset):
+        flat = np.flatnonzero(cond)
+        if flat.size == 0:
+            return
+
+        self.count += flat.size
+        if self.n == 0:
+            return
+
+        # select the most extreme values of this slab before computing their indices
+        values = data.ravel()[flat]
+        if values.size > self.n:
+            selection = self.select(values)
+            flat, values = flat[selection], values[selection]
+
+        self.add(values, np.column_stack(np.unravel_index(flat, data.shape)) + offset)
+
+    def merge(self, other):
+        self.count += other.count
+        if self.n and other.indices is not None:
+            self.add(other.values, other.indices)
+
+    def order(self, values, indices):
+        # order from the most extreme value, equal values by their index, so that the kept values
+        # do not depend on whether the slabs were read in one pass or in several merged parts
+        return np.lexsort((*indices.T[::-1], -values if self.largest else values))
+
+    def add(self, values, indices):
+        # merge with the values kept so far
+        if self.indices is not None:
+            values = np.concatenate([self.values, values])
+            indices = np.concatenate([self.indices, indices])
+            if values.size > self.n:
+                selection = self.order(values, indices)[:self.n]
+                values, indices = values[selection], indices[selection]
+
+        self.values, self.indices = values, indices
+
+    def sorted(self):
+        # return the values and indices ordered from the most extreme value
+        if self.indices is None:
+            return self.values, np.empty((0, 0), dtype=int)
+
+        order = self.order(self.values, self.indices)
+        return self.values[order], self.indices[order]
+
+
+class SlabBuffers:
+    '''
+    The boolean arrays for the masks of a slab, which are allocated once for the largest slab
+    of a variable and used for all its slabs.
+    '''
+
+    def __init__(self, size):
+        self.arrays = [np.empty(size, dtype=bool) for _ in range(4)]
+
+    def get(self, shape):
+        size = math.prod(shape)
+        return [array[:size].reshape(shape) for array in self.arrays]
+
+
+class Slab:
+    '''
+    The data of one slab together with its position in the variable. The masks are computed
+    only once and shared by all accumulators. The data is either a masked array, or the raw
+    data together with the fill values which mark the missing values.
+    '''
+
+    def __init__(self, slices, data, fill_values=None, buffers=None):
+        self.slices = slices
+        self.offset = np.array([s.start for s in slices])
+
+        if buffers is None:
+            buffers = SlabBuffers(np.size(data))
+        self.mask, self.valid, self.finite, self.cond = buffers.get(np.shape(data))
+
+        if fill_values is None:
+            data = np.ma.asarray(data)
+            self.data = data.data
+            np.copyto(self.mask, np.ma.getmask(data))
+        else:
+            self.data = data
+            self.mask.fill(False)
+            for fill_value in fill_values:
+                np.equal(data, fill_value, out=self.cond)
+                self.mask |= self.cond
+
+        np.logical_not(self.mask, out=self.valid)
+        np.isfinite(self.data, out=self.finite)
+        self.finite &= self.valid
+
+    def compare(self, op, value):
+        # compare the valid values with value, the result is overwritten by the next comparison
+        op(self.data, value, out=self.cond)
+        self.cond &= self.valid
+        return self.cond
+
+
+class ValidRange:
+    '''
+    Counts the values below valid_min and above valid_max and keeps the n most extreme of them.
+    '''
+
+    def __init__(self, valid_min, valid_max, n):
+        self.valid_min = valid_min
+        self.valid_max = valid_max
+        self.low = Outliers(n, largest=False)
+        self.high = Outliers(n, largest=True)
+
+    def update(self, slab):
+        self.low.update(slab.data, slab.compare(np.less, self.valid_min), slab.offset)
+        self.high.update(slab.data, slab.compare(np.greater, self.valid_max), slab.offset)
+
+    def merge(self, other):
+        self.low.merge(other.low)
+        self.high.merge(other.high)
+
+
+class NonFinite:
+    '''
+    Counts the NaN and infinite values, which are not masked as missing values.
+    '''
+
+    def __init__(self):
+        self.nan = 0
+        self.inf = 0
+
+    def update(self, slab):
+        non_finite = np.count_nonzero(slab.valid) - np.count_nonzero(slab.finite)
+        if non_finite:
+            nan = int(np.count_nonzero(np.isnan(slab.data, out=slab.cond) & slab.valid))
+            self.nan += nan
+            self.inf += non_finite - nan
+
+    def merge(self, other):
+        self.nan += other.nan
+        self.inf += other.inf
+
+
+class StepStatistics:
+    '''
+    Computes the minimum, the maximum, the sum and the number of the finite values, as well as
+    the number of missing values, for every step of the first (time) dimension.
+    '''
+
+    def __init__(self, shape):
+        n_steps = shape[0]
+        self.step_size = math.prod(shape[1:])
+        self.min = np.full(n_steps, np.inf)
+        self.max = np.full(n_steps, -np.inf)
+        self.sum = np.zeros(n_steps)
+        self.count = np.zeros(n_steps, dtype=np.int64)
+        self.masked = np.zeros(n_steps, dtype=np.int64)
+
+    def update(self, slab):
+        steps = slab.slices[0]
+        axes = tuple(range(1, slab.data.ndim))
+
+        # reduce only the finite values, without creating filled copies of the data
+        self.min[steps] = np.minimum(self.min[steps], slab.data.min(axis=axes, where=slab.finite, initial=np.inf))
+        self.max[steps] = np.maximum(self.max[steps], slab.data.max(axis=axes, where=slab.finite, initial=-np.inf))
+        self.sum[steps] += slab.data.sum(axis=axes, where=slab.finite, dtype=np.float64)
+        self.count[steps] += np.count_nonzero(slab.finite, axis=axes)
+        self.masked[steps] += np.count_nonzero(slab.mask, axis=axes)
+
+    def merge(self, other):
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        self.sum += other.sum
+        self.count += other.count
+        self.masked += other.masked
+
+    @property
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.sum / self.count, np.nan)
+
+    @property
+    def masked_fraction(self):
+        return self.masked / self.step_size if self.step_size else np.zeros_like(self.sum)
+
+    @property
+    def missing_steps(self):
+        # steps which contain only missing values
+        return np.flatnonzero(self.masked == self.step_size)
+
+    @property
+    def constant_steps(self):
+        # steps with more than one value, which all are the same
+        return np.flatnonzero((self.count > 1) & (self.min == self.max))
+
+
+class MissingCells:
+    '''
+    Counts the missing (masked or non-finite) values of every cell of the lat/lon grid
+    over all time steps (and levels).
+    '''
+
+    def __init__(self, shape):
+        self.total = math.prod(shape[:-2])
+        self.count = np.zeros(shape[-2:], dtype=np.int64)
+
+    def update(self, slab):
+        # the values which are not finite are missing
+        missing = np.count_nonzero(slab.finite, axis=tuple(range(slab.data.ndim - 2)))
+        np.subtract(math.prod(slab.data.shape[:-2]), missing, out=missing)
+        self.count[slab.slices[-2], slab.slices[-1]] += missing
+
+    def merge(self, other):
+        self.count += other.count
+
+    @property
+    def all_missing(self):
+        return self.count == self.total
+
+    @property
+    def some_missing(self):
+        return (self.count > 0) & (self.count < self.total)
+
+
+class Histogram:
+    '''
+    Counts the finite values by their magnitude in logarithmic bins, so that the percentiles of the
+    magnitudes can be estimated with a relative error of about 12% using a fixed amount of memory,
+    regardless of the size of the variable. Zeros are counted separately.
+    '''
+
+    size = (HISTOGRAM_MAX_EXPONENT - HISTOGRAM_MIN_EXPONENT) * HISTOGRAM_BINS_PER_DECADE
+
+    def __init__(self):
+        self.counts = np.zeros(self.size, dtype=np.int64)
+        self.zeros = 0
+
+    def update(self, slab):
+        values = np.abs(slab.data[slab.finite])
+        zeros = values.size - np.count_nonzero(values)
+        self.zeros += zeros
+        if zeros == values.size:
+            return
+
+        # compute the bins in place, zeros end up in the first bin and are removed again
+        with np.errstate(divide='ignore'):
+            np.log10(values, out=values)
+        values -= HISTOGRAM_MIN_EXPONENT
+        values *= HISTOGRAM_BINS_PER_DECADE
+        np.clip(values, 0, self.size - 1, out=values)
+
+        counts = np.bincount(values.astype(np.intp), minlength=self.size)
+        counts[0] -= zeros
+        self.counts += counts
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.zeros += other.zeros
+
+    def percentile(self, q):
+        # return the geometric center of the bin which contains the q-th percentile of the magnitudes
+        # of the values which are not zero, or None if there are no such values
+        cumulative = np.cumsum(self.counts)
+        if not cumulative[-1]:
+            return None
+
+        i = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return 10 ** ((i + 0.5) / HISTOGRAM_BINS_PER_DECADE + HISTOGRAM_MIN_EXPONENT)
+
+    def to_dict(self):
+        # only the bins which are not empty are stored
+        bins = np.flatnonzero(self.counts)
+        return {
+            'zeros': int(self.zeros),
+            'bins': [[int(i), int(self.counts[i])] for i in bins]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.zeros = data['zeros']
+        for i, count in data['bins']:
+            histogram.counts[i] = count
+        return histogram
+
+
+def update_accumulators(accumulators, slabs):
+    for slab in slabs:
+        for accumulator in accumulators.values():
+            accumulator.update(slab)
+
+        # release the data before the next slab is read
+        del slab
+
+
+def scan_variable(variable, accumulators, memory, sample=None, seed=0):
+    '''
+    Read the data of a variable once in chunk aligned slabs and pass every slab to all accumulators.
+    If sample is given, only a random sample of this fraction of the slabs is read (see get_sample_slabs).
+    '''
+    update_accumulators(accumulators, iter_slabs(variable, memory, sample, seed))
+    return accumulators
+
+
+def scan_part(file_path, variable_name, accumulators, chunk_shape, slab_shape, slabs):
+    # runs in a worker process, which reads the slabs using its own handle of the file
+    import netCDF4
+
+    with netCDF4.Dataset(file_path) as dataset:
+        variable = dataset.variables[variable_name]
+        update_accumulators(accumulators, read_slabs(variable, chunk_shape, slab_shape, slabs))
+
+    return accumulators
+
+
+def scan_variable_parallel(file_path, variable, accumulators, memory, jobs):
+    '''
+    Like scan_variable, but the slabs are divided into up to jobs consecutive parts (i.e. time ranges
+    for variables chunked by time step), which are read by worker processes using their own handle of
+    the file. The accumulators of the parts are merged in order, so that the result is the same as the
+    one of scan_variable. Variables which fit into one slab are read by scan_variable.
+    '''
+    shape = variable.shape
+    if not shape or 0 in shape:
+        return accumulators
+
+    chunk_shape = get_chunk_shape(variable)
+    slab_shape = get_slab_shape(shape, chunk_shape, variable.dtype.itemsize, memory)
+    slabs = list(get_slabs(shape, slab_shape))
+    if jobs < 2 or len(slabs) < 2:
+        return scan_variable(variable, accumulators, memory)
+
+    bounds = np.linspace(0, len(slabs), min(jobs, len(slabs)) + 1).astype(int)
+    with ProcessPoolExecutor(max_workers=len(bounds) - 1) as executor:
+        # every worker starts with a copy of the empty accumulators
+        futures = [executor.submit(scan_part, file_path, variable.name, accumulators,
+                                   chunk_shape, slab_shape, slabs[start:stop])
+                   for start, stop in itertools.pairwise(bounds)]
+
+        for future in futures:
+            for key, part in future.result().items():
+                accumulators[key].merge(part)
+
+    return accumulators
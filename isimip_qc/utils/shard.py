@@ -0,0 +1,57 @@
+import hashlib
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_path_hash(path):
+    # python's hash() is randomized per process, so use a stable hash of the path
+    return int.from_bytes(hashlib.sha1(str(path).encode()).digest()[:8], 'big')
+
+
+def shard_files_by_hash(file_paths, base_path, shard, shard_count):
+    # each file belongs to one shard by the hash of its path, the files are passed on as they are found
+    for file_path in file_paths:
+        if get_path_hash(file_path.relative_to(base_path)) % shard_count == shard - 1:
+            yield file_path
+
+
+def shard_files_by_size(file_paths, base_path, shard, shard_count):
+    # collect all files first, since the shards are balanced by the size of all files
+    files = []
+    for file_path in file_paths:
+        try:
+            size = file_path.stat().st_size
+        except OSError:
+            size = 0
+        files.append((size, str(file_path.relative_to(base_path)), file_path))
+
+    # assign the largest files first to the shard with the smallest total size (LPT scheduling),
+    # the order of the files and the tie breaks make the assignment the same on every node
+    shards = [(0, i) for i in range(shard_count)]
+    assigned = set()
+    for size, relative_path, _ in sorted(files, key=lambda file: (-file[0], file[1])):
+        total, i = heapq.heappop(shards)
+        if i == shard - 1:
+            assigned.add(relative_path)
+        heapq.heappush(shards, (total + size, i))
+
+    logger.debug('Shard %s/%s contains %s of %s files.', shard, shard_count, len(assigned), len(files))
+
+    # keep the order of the walk
+    for _, relative_path, file_path in files:
+        if relative_path in assigned:
+            yield file_path
+
+
+def shard_files(file_paths, base_path, shard, shard_count, by='hash'):
+    '''
+    Yield the files of one shard (1 to shard_count). The files are split deterministically, so that
+    shard_count runs on different nodes check every file exactly once: by a hash of the path relative
+    to base_path, or (for by='size') balanced by the file sizes, which needs to know all files in advance.
+    '''
+    if by == 'size':
+        return shard_files_by_size(file_paths, base_path, shard, shard_count)
+    else:
+        return shard_files_by_hash(file_paths, base_path, shard, shard_count)
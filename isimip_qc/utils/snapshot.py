@@ -0,0 +1,69 @@
+from types import MappingProxyType
+from typing import NamedTuple
+
+
+class VariableSnapshot(NamedTuple):
+    name: str
+    dtype: object
+    dimensions: tuple
+    shape: tuple
+    attrs: MappingProxyType
+    chunking: tuple | str | None
+    filters: MappingProxyType | None
+
+
+class Snapshot(NamedTuple):
+    data_model: str
+    dimensions: MappingProxyType
+    variables: MappingProxyType
+    attrs: MappingProxyType
+
+    @property
+    def json(self):
+        return {
+            'dimensions': dict(self.dimensions),
+            'variables': {
+                variable_name: {**variable.attrs, 'dimensions': list(variable.dimensions)}
+                for variable_name, variable in self.variables.items()
+            },
+            'global_attributes': dict(self.attrs)
+        }
+
+
+def read_variable_snapshot(variable):
+    try:
+        chunking = variable.chunking()
+    except AttributeError:
+        chunking = None
+
+    try:
+        filters = variable.filters()
+    except AttributeError:
+        filters = None
+
+    return VariableSnapshot(
+        name=variable.name,
+        dtype=variable.dtype,
+        dimensions=tuple(variable.dimensions),
+        shape=tuple(variable.shape),
+        attrs=MappingProxyType({attr: variable.getncattr(attr) for attr in variable.ncattrs()}),
+        chunking=tuple(chunking) if isinstance(chunking, list) else chunking,
+        filters=MappingProxyType(filters) if filters is not None else None
+    )
+
+
+def read_snapshot(dataset):
+    '''
+    Read the header of a NetCDF dataset (dimensions, variables and attributes) at once.
+    The checks work on this immutable snapshot and only use the dataset to read values.
+    '''
+    return Snapshot(
+        data_model=dataset.data_model,
+        dimensions=MappingProxyType({
+            dimension_name: dimension.size for dimension_name, dimension in dataset.dimensions.items()
+        }),
+        variables=MappingProxyType({
+            variable_name: read_variable_snapshot(variable) for variable_name, variable in dataset.variables.items()
+        }),
+        attrs=MappingProxyType({attr: dataset.getncattr(attr) for attr in dataset.ncattrs()})
+    )
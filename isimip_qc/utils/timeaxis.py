@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+import cftime
+import numpy as np
+
+
+class TimeAxisProblems(NamedTuple):
+    decreasing: np.ndarray   # indices i where time[i + 1] < time[i]
+    duplicates: np.ndarray   # indices i where time[i + 1] == time[i]
+    outside: np.ndarray      # indices of the values outside of the expected time steps
+    missing: np.ndarray      # expected time steps without a value
+    multiple: np.ndarray     # expected time steps with more than one distinct value
+    offset_spread: float     # spread of the position of the values within their time step
+
+
+@lru_cache(maxsize=256)
+def get_time_bounds(calendar, units, start_year, end_year, time_step):
+    '''
+    Return the bounds of the expected daily, monthly or annual time steps from the first day of start_year
+    to the first day after end_year, in the units of the time axis. The arrays are cached, since many files
+    share the same calendar, units and period, and are therefore read-only.
+    '''
+    if time_step == 'daily':
+        # days are uniform in all calendars, so only the first and the last bound need to be converted
+        first, last = cftime.date2num([
+            cftime.datetime(start_year, 1, 1, calendar=calendar),
+            cftime.datetime(end_year + 1, 1, 1, calendar=calendar)
+        ], units, calendar)
+        bounds = first + np.arange(round(last - first) + 1, dtype='f8')
+    elif time_step == 'monthly':
+        dates = [
+            cftime.datetime(year, month, 1, calendar=calendar)
+            for year in range(start_year, end_year + 1)
+            for month in range(1, 13)
+        ]
+        dates.append(cftime.datetime(end_year + 1, 1, 1, calendar=calendar))
+        bounds = np.asarray(cftime.date2num(dates, units, calendar), dtype='f8')
+    elif time_step == 'annual':
+        dates = [cftime.datetime(year, 1, 1, calendar=calendar) for year in range(start_year, end_year + 2)]
+        bounds = np.asarray(cftime.date2num(dates, units, calendar), dtype='f8')
+    else:
+        raise ValueError(f'Unknown time step "{time_step}".')
+
+    bounds.flags.writeable = False
+    return bounds
+
+
+def validate_time_axis(values, bounds):
+    '''
+    Validate the values of a time axis against the bounds of the expected time steps in one vectorized
+    pass: the values need to increase strictly and every expected time step needs exactly one value.
+    '''
+    values = np.asarray(values, dtype='f8')
+
+    diff = np.diff(values)
+
+    # assign every value to the time step it falls into
+    steps = np.searchsorted(bounds, values, side='right') - 1
+    inside = (steps >= 0) & (steps < len(bounds) - 1)
+    counts = np.bincount(steps[inside], minlength=len(bounds) - 1)
+
+    # count the distinct values per time step, duplicates are reported separately
+    distinct = np.unique(values[inside])
+    distinct_counts = np.bincount(np.searchsorted(bounds, distinct, side='right') - 1, minlength=len(bounds) - 1)
+
+    # the values should be at the same position in every time step, e.g. at 00:00 or 12:00 for daily data
+    offsets = values[inside] - bounds[steps[inside]]
+
+    return TimeAxisProblems(
+        decreasing=np.flatnonzero(diff < 0),
+        duplicates=np.flatnonzero(diff == 0),
+        outside=np.flatnonzero(~inside),
+        missing=np.flatnonzero(counts == 0),
+        multiple=np.flatnonzero(distinct_counts > 1),
+        offset_spread=float(np.ptp(offsets)) if offsets.size else 0.0
+    )
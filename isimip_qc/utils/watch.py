@@ -0,0 +1,216 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from .files import filter_file_path, get_stat, scan_dir
+
+logger = logging.getLogger(__name__)
+
+# default number of seconds a file needs to remain unchanged before it is checked
+SETTLE = 5
+
+# default number of seconds between two scans when polling
+POLL_INTERVAL = 10
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def list_files(path):
+    # return all files below path, the directories are scanned like in walk_files
+    files, stack = [], [Path(path)]
+    while stack:
+        dir_files, directories = scan_dir(stack.pop())
+        stack.extend(reversed(directories))
+        files.extend(dir_files)
+    return files
+
+
+class InotifyWatcher:
+    '''
+    Watches all directories below path using the inotify API of the Linux kernel, accessed via ctypes.
+    '''
+
+    def __init__(self, path):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+        self.path = Path(path)
+        self.directories = {}
+        self.changes = set()
+
+        try:
+            self.add_directory(self.path)
+        except OSError:
+            self.close()
+            raise
+
+    def add_directory(self, path):
+        # watch the directory and its subdirectories, and report the files which are already present,
+        # since they might have been created before the watch was added
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'Could not watch {directory}: {os.strerror(ctypes.get_errno())}')
+            self.directories[wd] = directory
+
+            files, directories = scan_dir(directory)
+            stack.extend(directories)
+            self.changes.update(files)
+
+    def read_changes(self, timeout):
+        if not self.changes:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+            if readable:
+                self.read_events(os.read(self.fd, 64 * 1024))
+
+        changes, self.changes = self.changes, set()
+        return changes
+
+    def read_events(self, buffer):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, so all files need to be looked at again
+                logger.warning('Too many changes in %s, scanning all files again.', self.path)
+                self.changes.update(list_files(self.path))
+                continue
+
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self.add_directory(path)
+                    except OSError as e:
+                        logger.error(e)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    # the files below the directory are gone as well
+                    self.changes.add(path)
+            else:
+                self.changes.add(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollWatcher:
+    '''
+    Watches all files below path by scanning the directories every interval seconds and comparing the
+    size and the modification time of the files with the previous scan, e.g. for network file systems
+    where inotify does not report changes made on other hosts.
+    '''
+
+    def __init__(self, path, interval):
+        self.path = Path(path)
+        self.interval = interval
+        self.index = {}
+        self.next_scan = 0
+
+    def read_changes(self, timeout):
+        if time.monotonic() < self.next_scan:
+            time.sleep(min(timeout, self.next_scan - time.monotonic()))
+            return set()
+
+        self.next_scan = time.monotonic() + self.interval
+
+        index = {file_path: get_stat(file_path) for file_path in list_files(self.path)}
+        changes = {file_path for file_path, stat in index.items() if self.index.get(file_path) != stat}
+        changes.update(self.index.keys() - index.keys())
+        self.index = index
+        return changes
+
+    def close(self):
+        pass
+
+
+def get_watcher(path, poll=False, interval=POLL_INTERVAL):
+    if not poll:
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as e:
+            # inotify is not available on this system, or the limit of watches is reached
+            logger.warning('Could not use inotify (%s), scanning %s every %g seconds instead.', e, path, interval)
+
+    return PollWatcher(path, interval)
+
+
+def watch_files(path, include=None, exclude=None, suffixes=None, settle=SETTLE, poll=False, interval=POLL_INTERVAL):
+    '''
+    Watch the files below path and yield every file which passes the include, exclude and suffix filters,
+    once it was not changed for settle seconds, i.e. when it is completely written. Files which are present
+    when the watch starts are yielded as well. A file is yielded again if it is changed after it was checked,
+    but not for the changes made by the check itself (e.g. by --fix), or if it is created again after it was
+    removed. Hidden files are ignored, since they are usually temporary files, e.g. of rsync.
+    '''
+    watcher = get_watcher(path, poll, interval)
+    logger.info('Watching %s for new files.', path)
+
+    pending = {}  # path -> (size and modification time, time of the last change)
+    checked = {}  # path -> size and modification time after the check
+
+    try:
+        while True:
+            for file_path in watcher.read_changes(timeout=min(1, settle) if pending else interval):
+                if not file_path.name.startswith('.'):
+                    stat = get_stat(file_path)
+                    if stat == (None, None):
+                        # the file (or directory) was removed or renamed, so it is forgotten
+                        for removed_path in [p for p in checked if p == file_path or file_path in p.parents]:
+                            checked.pop(removed_path)
+
+                    pending[file_path] = (stat, time.monotonic())
+
+            for file_path, (stat, changed) in list(pending.items()):
+                if time.monotonic() - changed < settle:
+                    continue
+
+                current = get_stat(file_path)
+                if current == (None, None):
+                    # the file was removed or renamed
+                    pending.pop(file_path)
+                    continue
+                elif current != stat:
+                    # the file is still written
+                    pending[file_path] = (current, time.monotonic())
+                    continue
+
+                pending.pop(file_path)
+                if checked.get(file_path) == current:
+                    continue
+
+                if filter_file_path(file_path, include, exclude, suffixes):
+                    yield file_path
+
+                checked[file_path] = get_stat(file_path)
+    finally:
+        watcher.close()